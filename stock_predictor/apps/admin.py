@@ -1,6 +1,11 @@
 from django.contrib import admin
-from.models import Stock, StockPrice, Watchlist
+from.models import AlertEvent, AlertRule, ArimaOrder, ReplicaPin, Stock, StockPrice, StockPriceRollup, Watchlist
 # Register your models here.
 admin.site.register(Stock)
 admin.site.register(StockPrice)
 admin.site.register(Watchlist)
+admin.site.register(ArimaOrder)
+admin.site.register(StockPriceRollup)
+admin.site.register(AlertRule)
+admin.site.register(AlertEvent)
+admin.site.register(ReplicaPin)
@@ -0,0 +1,270 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import Throttled
+
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "stock_predictor:admission"
+# After a Redis error, stay on the in-memory fallback for this long before retrying Redis.
+REDIS_RETRY_SECONDS = 30.0
+
+# KEYS[1] bucket hash; ARGV: capacity, refill per second, cost, now.
+# Returns {1, 0} when the tokens were taken, else {0, seconds until they will be}.
+# A negative cost gives tokens back, up to the capacity.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= cost then
+  tokens = math.min(capacity, tokens - cost)
+  allowed = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {allowed, tostring(wait)}
+"""
+
+# KEYS[1] sorted set of leases scored by expiry; ARGV: now, limit, lease id, expiry.
+# Leases of crashed workers expire instead of holding a slot forever.
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+  redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+  redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[4]) - tonumber(ARGV[1])) + 60)
+  return 1
+end
+return 0
+"""
+
+
+class AdmissionRejected(Throttled):
+    """A 429 with Retry-After, raised before any expensive work starts."""
+    default_detail = 'Request was rejected by admission control.'
+    default_code = 'admission_rejected'
+
+    def __init__(self, reason: str, wait: float, detail: str):
+        super().__init__(wait=wait, detail=detail)
+        self.reason = reason
+
+
+class MemoryBackend:
+    """Token buckets and concurrency slots kept in this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}
+
+    def take(self, key: str, capacity: float, rate: float, cost: float) -> float:
+        """
+        Spends `cost` tokens. Returns 0 on success, else the seconds until
+        they are available. A negative cost gives tokens back, up to the capacity.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (min(capacity, tokens - cost), now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+
+    def acquire(self, key: str, limit: int, lease_seconds: float):
+        """Takes one of `limit` slots. Returns a lease to pass to release(), or None if all are taken."""
+        with self._lock:
+            if self._slots.get(key, 0) >= limit:
+                return None
+            self._slots[key] = self._slots.get(key, 0) + 1
+            return key
+
+    def release(self, key: str, lease):
+        with self._lock:
+            self._slots[key] = max(0, self._slots.get(key, 0) - 1)
+
+
+class RedisBackend:
+    """
+    Token buckets and concurrency slots shared by every worker through Redis.
+    Each check is one Lua script call, so it is atomic across processes.
+    When Redis is unreachable the in-memory backend takes over (limits then
+    apply per process) until Redis answers again.
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self._errors = (redis.RedisError,)
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self._take = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._acquire = self._redis.register_script(ACQUIRE_SLOT_SCRIPT)
+        self._fallback = MemoryBackend()
+        self._down_until = 0.0
+
+    def _call(self, method: str, *args):
+        if time.monotonic() >= self._down_until:
+            try:
+                return getattr(self, f"_redis_{method}")(*args)
+            except self._errors:
+                logger.warning("Admission control cannot reach Redis; using per-process limits for %ss",
+                               REDIS_RETRY_SECONDS, exc_info=True)
+                self._down_until = time.monotonic() + REDIS_RETRY_SECONDS
+        return getattr(self._fallback, method)(*args)
+
+    def take(self, key, capacity, rate, cost):
+        return self._call('take', key, capacity, rate, cost)
+
+    def acquire(self, key, limit, lease_seconds):
+        return self._call('acquire', key, limit, lease_seconds)
+
+    def release(self, key, lease):
+        if isinstance(lease, tuple):
+            try:
+                self._redis.zrem(key, lease[1])
+            except self._errors:
+                # The lease expires on its own after ADMISSION_LEASE_SECONDS.
+                logger.warning("Could not release admission slot %s", key, exc_info=True)
+        else:
+            self._fallback.release(key, lease)
+
+    def _redis_take(self, key, capacity, rate, cost):
+        allowed, wait = self._take(keys=[key], args=[capacity, rate, cost, time.time()])
+        return 0.0 if int(allowed) else float(wait)
+
+    def _redis_acquire(self, key, limit, lease_seconds):
+        now = time.time()
+        lease = uuid.uuid4().hex
+        if int(self._acquire(keys=[key], args=[now, limit, lease, now + lease_seconds])):
+            return ('redis', lease)
+        return None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The process-wide backend selected by settings.ADMISSION_BACKEND ("memory" or "redis")."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.ADMISSION_BACKEND == 'redis':
+                    _backend = RedisBackend(settings.ADMISSION_REDIS_URL)
+                else:
+                    _backend = MemoryBackend()
+    return _backend
+
+
+def reset_backend():
+    """Drops the process-wide backend, e.g. after changing settings in tests."""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def client_key(request) -> str:
+    """Quota identity: the user id, or the client address for anonymous requests."""
+    if request.user and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    address = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR', '')
+    return f"ip:{address}"
+
+
+def _quota(scope: str, kind: str):
+    """(capacity, refill per second, cost) for `kind` in `scope`, or None when the scope has no quota."""
+    quota = settings.ADMISSION_QUOTAS.get(scope)
+    if quota is None:
+        return None
+    capacity, per_minute = quota['capacity'], quota['refill_per_minute']
+    cost = settings.ADMISSION_COSTS.get(kind, 1)
+    if capacity <= 0 or per_minute <= 0:
+        raise ImproperlyConfigured(f"ADMISSION_QUOTAS['{scope}'] needs a positive capacity and refill_per_minute.")
+    if not 0 < cost <= capacity:
+        raise ImproperlyConfigured(
+            f"ADMISSION_COSTS['{kind}'] must be positive and at most the capacity of '{scope}' ({capacity})."
+        )
+    return capacity, per_minute / 60.0, cost
+
+
+class Admission:
+    """Yielded by admit(); refund() gives back the tokens of a computation that produced nothing."""
+
+    def __init__(self):
+        self._refund = None
+
+    def refund(self):
+        if self._refund is not None:
+            self._refund()
+            self._refund = None
+
+
+@contextmanager
+def admit(request, scope: str, kind: str):
+    """
+    Guards one expensive computation of `kind` ("ARIMA", "LSTM", "sentiment").
+
+    Takes a global concurrency slot for `kind` (ADMISSION_MAX_CONCURRENT),
+    then spends ADMISSION_COSTS[kind] tokens from the client's bucket for
+    `scope` (ADMISSION_QUOTAS). Raises AdmissionRejected (429 with
+    Retry-After) if either is exhausted; the slot is held until the block
+    exits. Wrap only the compute path, so cached answers cost nothing, and
+    call refund() on the yielded Admission when the computation ends in an
+    error response, so a bad request costs nothing either.
+    """
+    admission = Admission()
+    quota = _quota(scope, kind)
+    limit = settings.ADMISSION_MAX_CONCURRENT.get(kind)
+    if quota is None and limit is None:
+        yield admission
+        return
+
+    backend = get_backend()
+    slot_key = f"{KEY_PREFIX}:slots:{kind}"
+    lease = None
+    if limit is not None:
+        lease = backend.acquire(slot_key, limit, settings.ADMISSION_LEASE_SECONDS)
+        if lease is None:
+            ADMISSION_REJECTED.inc(scope=scope, reason='concurrency')
+            raise AdmissionRejected(
+                'concurrency', settings.ADMISSION_BUSY_RETRY_SECONDS,
+                f"Too many {kind} requests are running; try again shortly.",
+            )
+    try:
+        if quota is not None:
+            capacity, rate, cost = quota
+            bucket = f"{KEY_PREFIX}:bucket:{scope}:{client_key(request)}"
+            wait = backend.take(bucket, capacity, rate, cost)
+            if wait:
+                ADMISSION_REJECTED.inc(scope=scope, reason='quota')
+                raise AdmissionRejected(
+                    'quota', math.ceil(wait),
+                    f"{scope.capitalize()} quota exhausted ({kind} costs {cost} of {capacity} tokens).",
+                )
+            admission._refund = lambda: backend.take(bucket, capacity, rate, -cost)
+        ADMISSION_IN_FLIGHT.inc(kind=kind)
+        try:
+            yield admission
+        finally:
+            ADMISSION_IN_FLIGHT.dec(kind=kind)
+    finally:
+        if lease is not None:
+            backend.release(slot_key, lease)
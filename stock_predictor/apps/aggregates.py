@@ -0,0 +1,26 @@
+from django.db.models import Aggregate, F, TextField
+
+
+class JoinedValues(Aggregate):
+    """
+    A column's values in one group joined with commas: GROUP_CONCAT on
+    SQLite, STRING_AGG on PostgreSQL. PostgreSQL joins them in `ordering`
+    order (the date by default), so several of these in one query pair up
+    item by item. SQLite feeds every aggregate of a query the same rows in
+    the same order, which pairs them too.
+    """
+    output_field = TextField()
+
+    def __init__(self, expression, ordering='date', **extra):
+        super().__init__(expression, F(ordering), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        value, _ = self.get_source_expressions()
+        sql, params = compiler.compile(value)
+        return f"GROUP_CONCAT({sql}, ',')", params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        value, ordering = self.get_source_expressions()
+        sql, params = compiler.compile(value)
+        order_sql, order_params = compiler.compile(ordering)
+        return f"STRING_AGG(CAST({sql} AS text), ',' ORDER BY {order_sql})", (*params, *order_params)
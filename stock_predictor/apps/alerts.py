@@ -0,0 +1,163 @@
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.dispatch import receiver
+
+from .metrics import ALERTS_TRIGGERED, stage_timer
+from .models import AlertEvent, AlertRule, Prediction, StockPrice
+from .signals import prices_ingested
+
+logger = logging.getLogger(__name__)
+
+# Bars around a gap are compared with the previous bar actually stored, but a
+# backfill never reaches further back than this for it.
+PREVIOUS_BAR_LOOKBACK_DAYS = 14
+
+
+def load_new_bars(stock, dates):
+    """
+    Closes of the bars on `dates` plus, for each, the close of the bar before
+    it. Reads only the range spanned by `dates` (and a short lookback for the
+    first previous bar). Returns (dates, closes, previous closes) as arrays;
+    the previous close is NaN when there is no earlier bar.
+    """
+    first, last = min(dates), max(dates)
+    rows = list(
+        StockPrice.objects
+        .filter(stock=stock, date__gte=first - timedelta(days=PREVIOUS_BAR_LOOKBACK_DAYS), date__lte=last)
+        .order_by('date')
+        .values_list('date', 'close_price')
+    )
+    if not rows:
+        return None
+    all_dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    closes = np.array([row[1] for row in rows], dtype=np.float64)
+    previous = np.concatenate(([np.nan], closes[:-1]))
+    wanted = np.isin(all_dates, np.array(sorted(dates), dtype='datetime64[D]'))
+    return all_dates[wanted], closes[wanted], previous[wanted]
+
+
+def _forecasts(stock, dates, model_types) -> dict:
+    """{model_type: array of predicted closes aligned with `dates` (NaN where none)}."""
+    position = {day: i for i, day in enumerate(dates.tolist())}
+    predicted = {model: np.full(len(dates), np.nan) for model in model_types}
+    rows = Prediction.objects.filter(
+        stock=stock, model_type__in=model_types, predicted_date__in=list(position)
+    ).values_list('model_type', 'predicted_date', 'predicted_price')
+    for model, day, price in rows:
+        predicted[model][position[day]] = float(price)
+    return predicted
+
+
+def evaluate_rules(rules: list, dates, closes, previous, forecasts: dict):
+    """
+    Evaluates every rule against every new bar at once. `rules` are dicts
+    with kind, threshold and model_type. Returns (rule index, bar index,
+    value) arrays of the hits. Crossings fire on the bar where the close
+    moves from one side of the level to the other, not on every bar beyond it.
+    """
+    kinds = np.array([rule['kind'] for rule in rules])
+    thresholds = np.array([float(rule['threshold']) for rule in rules])[:, None]
+    hits = np.zeros((len(rules), len(dates)), dtype=bool)
+    values = np.broadcast_to(closes, hits.shape).copy()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        above = kinds == AlertRule.PRICE_ABOVE
+        hits[above] = ((previous < thresholds) & (closes >= thresholds))[above]
+        below = kinds == AlertRule.PRICE_BELOW
+        hits[below] = ((previous > thresholds) & (closes <= thresholds))[below]
+
+        move = kinds == AlertRule.PERCENT_MOVE
+        if move.any():
+            change = (closes / previous - 1.0) * 100.0
+            hits[move] = (np.abs(change) >= thresholds)[move]
+            values[move] = change
+
+        for model, predicted in forecasts.items():
+            rows = (kinds == AlertRule.FORECAST_DIVERGENCE) & (np.array([rule['model_type'] for rule in rules]) == model)
+            if rows.any():
+                divergence = (closes / predicted - 1.0) * 100.0
+                hits[rows] = (np.abs(divergence) >= thresholds)[rows]
+                values[rows] = divergence
+    rule_index, bar_index = np.nonzero(hits)
+    return rule_index, bar_index, values[rule_index, bar_index]
+
+
+def _message(rule: dict, ticker: str, value: float) -> str:
+    threshold = float(rule['threshold'])
+    if rule['kind'] == AlertRule.PRICE_ABOVE:
+        return f"{ticker} closed at {value:.2f}, crossing above {threshold:.2f}"
+    if rule['kind'] == AlertRule.PRICE_BELOW:
+        return f"{ticker} closed at {value:.2f}, crossing below {threshold:.2f}"
+    if rule['kind'] == AlertRule.PERCENT_MOVE:
+        return f"{ticker} moved {value:+.2f}% (threshold {threshold:g}%)"
+    return f"{ticker} closed {value:+.2f}% away from its {rule['model_type']} forecast (threshold {threshold:g}%)"
+
+
+def evaluate_alerts(stock, dates) -> list:
+    """
+    Checks the active rules of `stock` against the bars just ingested on
+    `dates` and records an AlertEvent for each hit. Costs one query when the
+    stock has no active rules. Otherwise it adds one query for the new bars,
+    one for forecasts if a divergence rule exists, and, when something fired,
+    a dedup lookup and one insert. None of that depends on the number of
+    rules or the length of the stored history. A rule fires at most once per
+    date, so re-ingesting the same bars records nothing new. Returns the
+    events that were created.
+    """
+    if not dates:
+        return []
+    rules = list(
+        AlertRule.objects.filter(stock=stock, is_active=True)
+        .values('id', 'kind', 'threshold', 'model_type')
+    )
+    if not rules:
+        return []
+
+    with stage_timer('alerts', 'load'):
+        bars = load_new_bars(stock, dates)
+        if bars is None:
+            return []
+        bar_dates, closes, previous = bars
+        model_types = sorted({rule['model_type'] for rule in rules
+                              if rule['kind'] == AlertRule.FORECAST_DIVERGENCE and rule['model_type']})
+        forecasts = _forecasts(stock, bar_dates, model_types) if model_types else {}
+
+    with stage_timer('alerts', 'evaluate'):
+        rule_index, bar_index, values = evaluate_rules(rules, bar_dates, closes, previous, forecasts)
+    if not len(rule_index):
+        return []
+
+    events = [
+        AlertEvent(
+            rule_id=rules[r]['id'],
+            date=bar_dates[b].item(),
+            value=round(float(value), 4),
+            message=_message(rules[r], stock.ticker, float(value)),
+        )
+        for r, b, value in zip(rule_index.tolist(), bar_index.tolist(), values.tolist())
+    ]
+    # ignore_conflicts alone would also dedupe, but could not tell which events are new.
+    existing = set(
+        AlertEvent.objects.filter(rule_id__in={event.rule_id for event in events},
+                                  date__in={event.date for event in events})
+        .values_list('rule_id', 'date')
+    )
+    events = [event for event in events if (event.rule_id, event.date) not in existing]
+    with stage_timer('alerts', 'store'):
+        AlertEvent.objects.bulk_create(events, ignore_conflicts=True)
+    kinds = {rule['id']: rule['kind'] for rule in rules}
+    for event in events:
+        ALERTS_TRIGGERED.inc(kind=kinds[event.rule_id])
+    return events
+
+
+@receiver(prices_ingested)
+def evaluate_alerts_on_ingest(sender, stock, dates, **kwargs):
+    """Runs the stock's alert rules over the bars an ingestion batch just wrote."""
+    try:
+        evaluate_alerts(stock, dates)
+    except Exception:
+        # Alerts must never fail an ingestion; the next batch is evaluated as usual.
+        logger.exception("Could not evaluate alerts for %s", stock.ticker)
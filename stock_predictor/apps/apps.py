@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps"
+
+    def ready(self):
+        # Connect the prices_ingested / forecast_stored receivers.
+        from . import alerts, db_router, indicators, rollups, search, stream  # noqa: F401
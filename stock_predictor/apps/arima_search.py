@@ -0,0 +1,158 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+# This module must stay importable without Django being set up: the pool
+# workers import it in fresh interpreters to run `_fit_candidate`.
+
+logger = logging.getLogger(__name__)
+
+MAX_P = 5
+MAX_D = 2
+MAX_Q = 3
+CRITERIA = ('aic', 'bic')
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _fit_candidate(values, order):
+    """
+    Fits one ARIMA order in a worker process.
+    Returns {"order", "aic", "bic", "params"} or None if the fit failed.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    try:
+        with warnings.catch_warnings():
+            # Non-converging candidates are ranked by their criterion like any other.
+            warnings.simplefilter('ignore')
+            fit = ARIMA(values, order=order).fit()
+    except Exception:
+        return None
+    if not np.isfinite(fit.aic) or not np.isfinite(fit.bic):
+        return None
+    return {
+        "order": tuple(order),
+        "aic": float(fit.aic),
+        "bic": float(fit.bic),
+        "params": [float(value) for value in fit.params],
+    }
+
+
+def choose_differencing(values, max_d: int = MAX_D, alpha: float = 0.05) -> int:
+    """
+    Picks d with repeated ADF unit-root tests, so the grid search only has to
+    cover (p, q). Returns the smallest d whose differenced series is stationary.
+    """
+    from statsmodels.tsa.stattools import adfuller
+
+    series = np.asarray(values, dtype=np.float64)
+    for d in range(max_d + 1):
+        if len(series) < 10 or np.ptp(series) == 0:
+            return d
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                p_value = adfuller(series, autolag='AIC')[1]
+        except Exception:
+            return d
+        if p_value < alpha:
+            return d
+        series = np.diff(series)
+    return max_d
+
+
+def candidate_levels(d: int, max_p: int = MAX_P, max_q: int = MAX_Q) -> list:
+    """
+    Groups the (p, d, q) grid by complexity p + q, simplest first. Each level
+    is fitted in parallel; later levels are only tried while they still help.
+    """
+    levels = {}
+    for p in range(max_p + 1):
+        for q in range(max_q + 1):
+            levels.setdefault(p + q, []).append((p, d, q))
+    return [levels[k] for k in sorted(levels)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared process pool, created on first use so the start-up cost is paid once per process."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: forking a process that already runs threads (Django, TensorFlow) is unsafe.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def select_order(values, criterion: str = 'aic', workers: int = 1, patience: int = 2,
+                 min_improvement: float = 1.0, timeout: float = 60.0) -> dict:
+    """
+    Searches ARIMA orders for `values` and returns the best candidate as
+    {"order", "aic", "bic", "params", "criterion", "score", "candidates_evaluated"}.
+
+    d is fixed up front by `choose_differencing`. (p, q) candidates are then
+    fitted level by level in order of complexity, `workers` at a time. The
+    search stops early once `patience` consecutive levels fail to improve the
+    best criterion by at least `min_improvement`, or when `timeout` seconds
+    have passed. Returns None if no candidate could be fitted.
+
+    The timeout bounds how long the caller waits, not the work done: fits
+    already running in the pool cannot be interrupted and finish in the
+    background (their results are discarded), only queued ones are dropped.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown criterion {criterion!r}; expected one of {', '.join(CRITERIA)}.")
+    values = np.asarray(values, dtype=np.float64)
+    d = choose_differencing(values)
+    deadline = time.monotonic() + timeout
+    pool = _get_pool(workers) if workers > 1 else None
+
+    best = None
+    evaluated = 0
+    stale_levels = 0
+    for level in candidate_levels(d):
+        if time.monotonic() >= deadline:
+            logger.info("ARIMA order search hit its %.0fs budget after %d fits", timeout, evaluated)
+            break
+        if pool is None:
+            results = [_fit_candidate(values, order) for order in level]
+        else:
+            futures = {pool.submit(_fit_candidate, values, order) for order in level}
+            done, pending = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            for future in pending:
+                # Only stops fits that have not started; running ones keep their worker until done.
+                future.cancel()
+            results = [future.result() for future in done]
+        evaluated += len(results)
+
+        previous = best[criterion] if best else np.inf
+        for result in results:
+            if result and (best is None or result[criterion] < best[criterion]):
+                best = result
+        if best and best[criterion] <= previous - min_improvement:
+            stale_levels = 0
+        else:
+            stale_levels += 1
+            if stale_levels >= patience:
+                break
+
+    if best is None:
+        return None
+    return {**best, "criterion": criterion, "score": best[criterion], "candidates_evaluated": evaluated}
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "current.json"
+META_FILE = "meta.json"
+LOCK_DIR = ".locks"
+TMP_PREFIX = ".tmp-"
+# Temp dirs left by a crashed writer are removed by GC once they are this old.
+STALE_TMP_SECONDS = 60 * 60
+
+
+class Artifact:
+    """One saved version: a directory of files plus its metadata."""
+
+    def __init__(self, name: str, version: int, path: Path, metadata: dict):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.metadata = metadata
+
+    def file(self, filename: str) -> Path:
+        return self.path / filename
+
+    def __repr__(self):
+        return f"<Artifact {self.name} v{self.version}>"
+
+
+def _write_json_atomic(path: Path, data: dict):
+    tmp = path.with_name(f"{TMP_PREFIX}{uuid.uuid4().hex}-{path.name}")
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh, default=str)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class ArtifactStore:
+    """
+    Versioned model artifacts under `root`:
+
+        root/<name>/v00001/{model files, meta.json}
+        root/<name>/current.json   -> {"version": 1, ...metadata}
+
+    A version is written into a temp directory and renamed into place, then
+    current.json is replaced atomically, so readers only ever see complete
+    versions. `lock(name)` is an exclusive cross-process file lock used to
+    make sure only one process trains a given model at a time. Only the
+    newest `keep` versions are kept.
+    """
+
+    def __init__(self, root, keep: int = 3):
+        self.root = Path(root)
+        self.keep = keep
+
+    def _dir(self, name: str) -> Path:
+        return self.root / name
+
+    @contextmanager
+    def lock(self, name: str):
+        """
+        Holds an exclusive lock for `name` across threads and processes.
+        Callers that queue up behind a training run should re-check
+        `current(name)` once they get the lock and reuse the fresh version.
+        """
+        lock_dir = self.root / LOCK_DIR
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        with open(lock_dir / f"{name}.lock", 'a+b') as fh:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            else:
+                fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ~10 seconds; keep waiting like flock does.
+                        continue
+            waited = time.perf_counter() - started
+            if waited > 1:
+                logger.info("Waited %.1fs for the %s artifact lock", waited, name)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def current(self, name: str):
+        """The latest complete version of `name`, or None."""
+        try:
+            with open(self._dir(name) / CURRENT_FILE) as fh:
+                pointer = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        version = pointer["version"]
+        path = self._dir(name) / f"v{version:05d}"
+        if not path.is_dir():
+            return None
+        return Artifact(name, version, path, pointer.get("metadata", {}))
+
+    def versions(self, name: str) -> list:
+        """Version numbers on disk for `name`, oldest first."""
+        directory = self._dir(name)
+        if not directory.is_dir():
+            return []
+        return sorted(int(entry.name[1:]) for entry in directory.iterdir()
+                      if entry.is_dir() and entry.name.startswith('v') and entry.name[1:].isdigit())
+
+    def save(self, name: str, writers: dict, metadata: dict = None) -> Artifact:
+        """
+        Writes a new version. `writers` maps file names to callables that
+        write that file given its (temporary) path, e.g.
+        {"model.pkl": lambda path: joblib.dump(fit, path, compress=3)}.
+        Returns the new Artifact once it is the current version.
+        """
+        directory = self._dir(name)
+        directory.mkdir(parents=True, exist_ok=True)
+        metadata = dict(metadata or {})
+        tmp = Path(tempfile.mkdtemp(prefix=TMP_PREFIX, dir=directory))
+        try:
+            for filename, write in writers.items():
+                write(tmp / filename)
+            existing = self.versions(name)
+            version = (existing[-1] if existing else 0) + 1
+            metadata.update({"version": version, "files": sorted(writers), "saved_at": time.time()})
+            _write_json_atomic(tmp / META_FILE, metadata)
+            while True:
+                final = directory / f"v{version:05d}"
+                try:
+                    os.rename(tmp, final)
+                    break
+                except OSError:
+                    if not final.exists():
+                        raise
+                    # Another writer took this number without holding the lock; take the next one.
+                    version += 1
+                    metadata["version"] = version
+                    _write_json_atomic(tmp / META_FILE, metadata)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        _write_json_atomic(directory / CURRENT_FILE, {"version": version, "metadata": metadata})
+        self.gc(name)
+        return Artifact(name, version, final, metadata)
+
+    def gc(self, name: str) -> int:
+        """Deletes all but the newest `keep` versions (never the current one) and stale temp dirs."""
+        directory = self._dir(name)
+        current = self.current(name)
+        removed = 0
+        for version in self.versions(name)[:-self.keep or None]:
+            if current and version == current.version:
+                continue
+            shutil.rmtree(directory / f"v{version:05d}", ignore_errors=True)
+            removed += 1
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for entry in directory.glob(f"{TMP_PREFIX}*"):
+            if entry.stat().st_mtime < cutoff:
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink(missing_ok=True)
+        return removed
+
+    def names(self) -> list:
+        if not self.root.is_dir():
+            return []
+        return sorted(entry.name for entry in self.root.iterdir()
+                      if entry.is_dir() and (entry / CURRENT_FILE).exists())
@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+
+from .models import Prediction, StockPrice, Watchlist
+from .predictor import FORECAST_STEPS, forecast_from_rows
+from .serializers import StockSerializer
+
+SENTIMENT_CACHE_KEY = "sentiment:{}"
+MODEL_TYPES = [choice for choice, _ in Prediction.MODEL_CHOICES]
+
+
+def cache_sentiment(ticker: str, analysis: dict):
+    """Stores a successful sentiment analysis for SENTIMENT_CACHE_SECONDS."""
+    cache.set(SENTIMENT_CACHE_KEY.format(ticker.upper()), analysis, settings.SENTIMENT_CACHE_SECONDS)
+
+
+def get_cached_sentiment(ticker: str):
+    return cache.get(SENTIMENT_CACHE_KEY.format(ticker.upper()))
+
+
+def get_cached_sentiments(tickers) -> dict:
+    """Cached sentiment for many tickers in one cache round trip: {ticker: analysis or None}."""
+    keys = {SENTIMENT_CACHE_KEY.format(ticker): ticker for ticker in tickers}
+    found = cache.get_many(list(keys))
+    return {ticker: found.get(key) for key, ticker in keys.items()}
+
+
+def watchlist_snapshot_queryset(user):
+    """
+    Watchlist rows with everything the snapshot needs loaded in three
+    queries, however many stocks are watched: the rows joined to their
+    stock, the last two bars per stock and the latest forecast rows per
+    stock and model. The "latest N per stock" parts are ROW_NUMBER()
+    window filters, so no per-stock query is issued.
+    """
+    latest_bars = (
+        StockPrice.objects
+        .annotate(row=Window(RowNumber(), partition_by=[F('stock_id')], order_by=F('date').desc()))
+        .filter(row__lte=2)
+        .order_by('stock_id', '-date')
+    )
+    latest_predictions = (
+        Prediction.objects
+        .annotate(row=Window(
+            RowNumber(), partition_by=[F('stock_id'), F('model_type')], order_by=F('predicted_date').desc()
+        ))
+        .filter(row__lte=FORECAST_STEPS)
+        .order_by('stock_id', 'model_type', '-predicted_date')
+    )
+    return (
+        Watchlist.objects.filter(user=user)
+        .select_related('stock')
+        .prefetch_related(
+            Prefetch('stock__prices', queryset=latest_bars, to_attr='latest_bars'),
+            Prefetch('stock__predictions', queryset=latest_predictions, to_attr='latest_predictions'),
+        )
+    )
+
+
+def _bar(price) -> dict:
+    return {
+        "date": price.date.isoformat(),
+        "open": float(price.open_price),
+        "high": float(price.high_price),
+        "low": float(price.low_price),
+        "close": float(price.close_price),
+        "volume": price.volume,
+    }
+
+
+def build_watchlist_snapshot(user) -> list:
+    """
+    One entry per watched stock with its latest OHLCV bar, the change versus
+    the previous close, the latest stored ARIMA/LSTM forecasts (None when
+    missing or stale) and the cached sentiment (None when not cached).
+    """
+    items = list(watchlist_snapshot_queryset(user))
+    sentiments = get_cached_sentiments([item.stock.ticker for item in items])
+
+    snapshot = []
+    for item in items:
+        stock = item.stock
+        bars = stock.latest_bars
+        latest = bars[0] if bars else None
+        previous = bars[1] if len(bars) > 1 else None
+        change = change_percent = None
+        if latest and previous:
+            change = float(latest.close_price - previous.close_price)
+            if previous.close_price:
+                change_percent = round(change / float(previous.close_price) * 100, 2)
+            change = round(change, 2)
+
+        predictions = {model_type: [] for model_type in MODEL_TYPES}
+        for prediction in stock.latest_predictions:
+            predictions.setdefault(prediction.model_type, []).append(prediction)
+
+        snapshot.append({
+            "id": item.id,
+            "added_at": item.added_at.isoformat(),
+            "stock": StockSerializer(stock).data,
+            "latest_bar": _bar(latest) if latest else None,
+            "change": change,
+            "change_percent": change_percent,
+            "forecasts": {
+                model_type: forecast_from_rows(stock.ticker, model_type, rows)
+                for model_type, rows in predictions.items()
+            },
+            "sentiment": sentiments[stock.ticker],
+        })
+    return snapshot
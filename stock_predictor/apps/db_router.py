@@ -0,0 +1,185 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .signals import prices_ingested
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+
+
+class RoutingState:
+    """
+    Per request (or per command run): whether reads must go to the primary,
+    whether anything was written, and a ticker whose pin is still to be
+    checked before the first read that would go to a replica.
+    """
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.wrote = False
+        self.ticker = None
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def _current_state() -> RoutingState:
+    state = _state.get()
+    if state is None:
+        # Outside a request (management commands, shell): one state for the whole context.
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def begin(pinned: bool = False):
+    """Starts a fresh routing state, e.g. for one request. Returns a token for end()."""
+    return _state.set(RoutingState(pinned))
+
+
+def end(token):
+    _state.reset(token)
+
+
+def pin_primary():
+    """Sends every further read of the current request/context to the primary."""
+    _current_state().pinned = True
+
+
+def watch_ticker(ticker: str):
+    """
+    Reads of the current request go to the primary if `ticker` is pinned.
+    The pin is looked up lazily, only when a read would otherwise go to a
+    replica, so pinned, writing or read-free requests never query it.
+    """
+    _current_state().ticker = ticker
+
+
+def is_pinned() -> bool:
+    return _current_state().pinned
+
+
+def wrote() -> bool:
+    return _current_state().wrote
+
+
+@contextmanager
+def use_primary():
+    """Reads inside the block go to the primary (e.g. right after a write elsewhere)."""
+    token = begin(pinned=True)
+    try:
+        yield
+    finally:
+        end(token)
+
+
+_down_until = {}
+_checks = threading.local()
+
+
+def replica_healthy(alias: str) -> bool:
+    """
+    Whether `alias` can take reads. A replica is probed at most every
+    REPLICA_HEALTH_CHECK_SECONDS per thread; one that fails is skipped by
+    every thread for the same period before it is tried again.
+    """
+    now = time.monotonic()
+    if _down_until.get(alias, 0) > now:
+        return False
+    checked = getattr(_checks, 'at', None)
+    if checked is None:
+        checked = _checks.at = {}
+    if now - checked.get(alias, float('-inf')) < settings.REPLICA_HEALTH_CHECK_SECONDS:
+        return True
+    checked[alias] = now
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+        if connection.is_usable():
+            return True
+    except Exception:
+        logger.warning("Replica %s is unreachable; reading from the primary", alias, exc_info=True)
+    else:
+        logger.warning("Replica %s is not usable; reading from the primary", alias)
+    connection.close()
+    _down_until[alias] = now + settings.REPLICA_HEALTH_CHECK_SECONDS
+    return False
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary ("default"); reads go to a random healthy
+    replica from settings.DATABASE_REPLICAS. Once the current request (or
+    command) has written anything, or it was pinned by the middleware, its
+    reads stay on the primary so it always sees its own writes. With no
+    replicas configured every query goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        state = _current_state()
+        if not replicas or state.pinned:
+            return PRIMARY
+        healthy = [alias for alias in replicas if replica_healthy(alias)]
+        if not healthy:
+            return PRIMARY
+        if state.ticker is not None:
+            ticker, state.ticker = state.ticker, None
+            if ticker_pinned(ticker):
+                state.pinned = True
+                return PRIMARY
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        state = _current_state()
+        state.pinned = state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any of them may be related.
+        pool = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def pin_ticker(ticker: str):
+    """
+    Sends reads for `ticker` to the primary for REPLICA_PIN_SECONDS, from
+    any client. The pin is a ReplicaPin row on the primary, so every
+    process sees it, whatever cache it has.
+    """
+    from .models import ReplicaPin
+
+    until = timezone.now() + timedelta(seconds=settings.REPLICA_PIN_SECONDS)
+    ReplicaPin.objects.using(PRIMARY).bulk_create(
+        [ReplicaPin(ticker=ticker.upper(), pinned_until=until)],
+        update_conflicts=True, unique_fields=['ticker'], update_fields=['pinned_until'],
+    )
+
+
+def ticker_pinned(ticker: str) -> bool:
+    from .models import ReplicaPin
+
+    return ReplicaPin.objects.using(PRIMARY).filter(ticker=ticker.upper(), pinned_until__gt=timezone.now()).exists()
+
+
+@receiver(prices_ingested)
+def pin_ticker_on_ingest(sender, stock, dates, **kwargs):
+    """Freshly ingested bars may not have reached the replicas yet; read that ticker from the primary for a while."""
+    if dates and settings.DATABASE_REPLICAS:
+        pin_ticker(stock.ticker)
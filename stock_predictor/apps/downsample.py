@@ -0,0 +1,157 @@
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from .metrics import stage_timer
+from .models import StockPrice, StockPriceRollup
+
+METHODS = ('ohlc', 'lttb')
+MAX_POINTS_LIMIT = 5000
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def ohlc_envelope(dates, open_, high, low, close, volume, max_points: int):
+    """
+    Merges consecutive rows into at most `max_points` OHLC bars: first open,
+    max high, min low, last close, summed volume, dated by the first row.
+    Every extreme of the original series survives, so wicks and spikes are
+    still visible. Fully vectorized with ufunc.reduceat.
+    """
+    n = len(close)
+    starts = np.unique(np.linspace(0, n, max_points, endpoint=False).astype(np.int64))
+    ends = np.append(starts[1:], n) - 1
+    return (
+        dates[starts],
+        open_[starts],
+        np.maximum.reduceat(high, starts),
+        np.minimum.reduceat(low, starts),
+        close[ends],
+        np.add.reduceat(volume, starts),
+    )
+
+
+def lttb_indices(y, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `max_points` row indices whose
+    line keeps the visual shape of `y` (x is the row position). The first
+    and last rows are always kept. The bucket scan is NumPy; only the loop
+    over buckets (at most max_points) runs in Python.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n) if max_points >= n else np.array([0, n - 1])
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    # Interior rows 1..n-2 split into max_points - 2 buckets.
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # Mean of each bucket, used as the third triangle vertex for the previous bucket.
+    sums = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    means_y = np.append(sums / counts, y[-1])
+    means_x = np.append((edges[:-1] + edges[1:] - 1) / 2.0, x[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        cx, cy = means_x[bucket + 1], means_y[bucket + 1]
+        # Twice the triangle area for every candidate row in the bucket at once.
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def load_history_arrays(stock, interval: str = 'day', start=None, end=None):
+    """
+    Loads the bars of one stock in [start, end] straight into NumPy arrays:
+    (dates, open, high, low, close, volume), sorted by date.
+    """
+    if interval == 'day':
+        rows = StockPrice.objects.filter(stock=stock)
+        date_field = 'date'
+    else:
+        rows = StockPriceRollup.objects.filter(stock=stock, interval=interval)
+        date_field = 'period_start'
+    if start is not None:
+        rows = rows.filter(**{f'{date_field}__gte': start})
+    if end is not None:
+        rows = rows.filter(**{f'{date_field}__lte': end})
+    values = list(rows.order_by(date_field).values_list(
+        date_field, 'open_price', 'high_price', 'low_price', 'close_price', 'volume'
+    ))
+    if not values:
+        return None
+    dates = np.array([row[0] for row in values], dtype=object)
+    prices = np.array([row[1:5] for row in values], dtype=np.float64)
+    volume = np.array([row[5] for row in values], dtype=np.int64)
+    return dates, prices[:, 0], prices[:, 1], prices[:, 2], prices[:, 3], volume
+
+
+def downsample(arrays, max_points: int, method: str = 'ohlc'):
+    """Reduces loaded history arrays to at most `max_points` rows with the given method."""
+    dates, open_, high, low, close, volume = arrays
+    if len(close) <= max_points:
+        return arrays
+    if method == 'lttb':
+        keep = lttb_indices(close, max_points)
+        return dates[keep], open_[keep], high[keep], low[keep], close[keep], volume[keep]
+    return ohlc_envelope(dates, open_, high, low, close, volume, max_points)
+
+
+def _rows(arrays) -> list:
+    # Same keys and 2-decimal strings as StockPriceSerializer.
+    dates, open_, high, low, close, volume = arrays
+    return [
+        {
+            "date": day.isoformat(),
+            "open_price": f"{o:.2f}",
+            "close_price": f"{c:.2f}",
+            "high_price": f"{h:.2f}",
+            "low_price": f"{l:.2f}",
+            "volume": int(v),
+        }
+        for day, o, h, l, c, v in zip(dates, open_, high, low, close, volume)
+    ]
+
+
+def price_fingerprints(tickers) -> dict:
+    """
+    {ticker: (last date, row count, sums of open, high, low, close and
+    volume)} of the stored daily bars, in one grouped query. It changes
+    whenever a bar is added, removed or has any of its values revised,
+    whichever process wrote it, so it can key caches that are not shared
+    between processes.
+    """
+    rows = (
+        StockPrice.objects.filter(stock__ticker__in=list(tickers))
+        .order_by().values('stock__ticker')
+        .annotate(last_date=Max('date'), rows=Count('id'), opens=Sum('open_price'), highs=Sum('high_price'),
+                  lows=Sum('low_price'), closes=Sum('close_price'), volume=Sum('volume'))
+        .values_list('stock__ticker', 'last_date', 'rows', 'opens', 'highs', 'lows', 'closes', 'volume')
+    )
+    return {ticker: (str(last_date), count, *map(str, sums)) for ticker, last_date, count, *sums in rows}
+
+
+def get_downsampled_history(stock, interval: str, start, end, max_points: int, method: str):
+    """
+    Cached downsampled history. The cache key covers (ticker, interval,
+    range, max_points, method) plus the fingerprint of the stored bars
+    (rollups are derived from them), so new or revised prices miss the
+    cache. Returns None if there is no data in the range.
+    """
+    fingerprint = ":".join(map(str, price_fingerprints([stock.ticker]).get(stock.ticker, ())))
+    key = f"history:{stock.ticker}:{fingerprint}:{interval}:{start}:{end}:{max_points}:{method}"
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+    with stage_timer('history', 'load'):
+        arrays = load_history_arrays(stock, interval, start, end)
+    if arrays is None:
+        return None
+    with stage_timer('history', 'downsample'):
+        rows = _rows(downsample(arrays, max_points, method))
+    cache.set(key, rows, CACHE_TIMEOUT)
+    return rows
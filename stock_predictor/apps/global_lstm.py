@@ -0,0 +1,195 @@
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .lstm_runtime import export_lstm, load_lstm
+from .metrics import stage_timer
+from .models import Stock, StockPrice
+from .predictor import FORECAST_STEPS, PREDICTION_DAYS, get_artifact_store
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_ARTIFACT = "lstm_global"
+HISTORY_DAYS = 365 * 3
+SECTOR_EMBEDDING_DIM = 4
+
+
+def is_enabled() -> bool:
+    """True when settings ask for the shared model and one has been trained."""
+    return settings.LSTM_GLOBAL_MODEL and get_artifact_store().current(GLOBAL_ARTIFACT) is not None
+
+
+def load_close_series(tickers=None, days: int = HISTORY_DAYS) -> dict:
+    """
+    Loads close prices for many tickers with a single query.
+    Returns {ticker: (dates, closes)} with both arrays sorted by date.
+    """
+    start_date = date.today() - timedelta(days=days)
+    prices = StockPrice.objects.filter(date__gte=start_date)
+    if tickers is not None:
+        prices = prices.filter(stock__ticker__in=[ticker.upper() for ticker in tickers])
+    rows = list(prices.order_by('stock__ticker', 'date').values_list('stock__ticker', 'date', 'close_price'))
+    if not rows:
+        return {}
+
+    symbols = np.array([row[0] for row in rows])
+    dates = np.array([row[1] for row in rows], dtype=object)
+    closes = np.array([float(row[2]) for row in rows], dtype=np.float64)
+    # Rows are grouped by ticker, so every boundary is where the symbol changes.
+    boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(rows)]))
+    return {str(symbols[s]): (dates[s:e], closes[s:e]) for s, e in zip(starts, ends)}
+
+
+def normalize_windows(closes: np.ndarray, window: int = PREDICTION_DAYS):
+    """
+    Builds scale-free training windows for one series: every window and its
+    next-day target are expressed relative to the window's last close, so
+    $5 and $500 stocks share one input distribution.
+    """
+    if len(closes) <= window:
+        return np.empty((0, window)), np.empty((0,))
+    windows = sliding_window_view(closes[:-1], window)
+    anchors = windows[:, -1:]
+    X = windows / anchors - 1.0
+    y = closes[window:] / anchors[:, 0] - 1.0
+    return X, y
+
+
+def sector_vocabulary() -> dict:
+    """Maps each known sector to an embedding index; 0 is reserved for unknown sectors."""
+    sectors = sorted(set(Stock.objects.exclude(sector='').values_list('sector', flat=True)))
+    return {sector: index for index, sector in enumerate(sectors, start=1)}
+
+
+def build_global_model(n_sectors: int, window: int = PREDICTION_DAYS):
+    """Same two-layer LSTM as the per-ticker model, plus a sector embedding joined before the head."""
+    from tensorflow.keras.layers import LSTM, Concatenate, Dense, Dropout, Embedding, Flatten, Input
+    from tensorflow.keras.models import Model
+
+    series_input = Input(shape=(window, 1), name="series")
+    sector_input = Input(shape=(1,), name="sector")
+
+    x = LSTM(units=50, return_sequences=True)(series_input)
+    x = Dropout(0.2)(x)
+    x = LSTM(units=50, return_sequences=False)(x)
+    x = Dropout(0.2)(x)
+    sector = Flatten()(Embedding(input_dim=n_sectors + 1, output_dim=SECTOR_EMBEDDING_DIM)(sector_input))
+    output = Dense(units=1)(Concatenate()([x, sector]))
+
+    model = Model(inputs=[series_input, sector_input], outputs=output)
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def train_global_lstm(tickers=None, epochs: int = 10, batch_size: int = 256,
+                      max_windows_per_ticker: int = 500) -> dict:
+    """
+    Trains one network on windows pooled from every ticker (or `tickers`) and
+    saves it as a new version of the "lstm_global" artifact, along with a
+    NumPy export (weights + sector vocabulary) that serving loads without
+    TensorFlow.
+    Only the most recent `max_windows_per_ticker` windows of each ticker are
+    used so no single long history dominates the pooled data.
+    """
+    with stage_timer('lstm_global', 'query'):
+        series = load_close_series(tickers)
+        vocabulary = sector_vocabulary()
+        sectors = dict(Stock.objects.filter(ticker__in=list(series)).values_list('ticker', 'sector'))
+
+    with stage_timer('lstm_global', 'windows'):
+        X_parts, y_parts, sector_parts = [], [], []
+        for ticker, (_, closes) in series.items():
+            X, y = normalize_windows(closes)
+            if not len(X):
+                continue
+            X, y = X[-max_windows_per_ticker:], y[-max_windows_per_ticker:]
+            X_parts.append(X)
+            y_parts.append(y)
+            sector_parts.append(np.full(len(X), vocabulary.get(sectors.get(ticker), 0)))
+        if not X_parts:
+            return {"error": f"Not enough historical data to train the global LSTM. Need more than {PREDICTION_DAYS} days for at least one ticker."}
+        X_train = np.concatenate(X_parts)[..., np.newaxis]
+        y_train = np.concatenate(y_parts)
+        sector_train = np.concatenate(sector_parts)
+
+    store = get_artifact_store()
+    with store.lock(GLOBAL_ARTIFACT):
+        with stage_timer('lstm_global', 'train'):
+            model = build_global_model(len(vocabulary))
+            model.fit([X_train, sector_train], y_train, epochs=epochs, batch_size=batch_size, shuffle=True, verbose=0)
+
+        meta = {
+            "window": PREDICTION_DAYS,
+            "sectors": vocabulary,
+            "tickers": len(X_parts),
+            "samples": int(len(X_train)),
+            "epochs": epochs,
+            "batch_size": batch_size,
+            "trained_at": timezone.now().isoformat(),
+        }
+        with stage_timer('lstm_global', 'save'):
+            artifact = store.save(GLOBAL_ARTIFACT, {
+                "model.keras": model.save,
+                "model.npz": lambda path: export_lstm(model, path, metadata=meta),
+            }, metadata=meta)
+    return {**meta, "path": str(artifact.path)}
+
+
+def predict_many_with_global_lstm(tickers) -> dict:
+    """
+    Forecasts every ticker in one batch through the shared model: each of the
+    7 roll-forward steps is a single forward pass over all tickers.
+    Returns {ticker: result} where result matches predict_with_lstm's output.
+    """
+    tickers = [ticker.upper() for ticker in tickers]
+    with stage_timer('lstm_global', 'load'):
+        model = load_lstm(get_artifact_store().current(GLOBAL_ARTIFACT).file("model.npz"), GLOBAL_ARTIFACT)
+    meta = model.metadata
+    window = meta["window"]
+
+    with stage_timer('lstm_global', 'query'):
+        series = load_close_series(tickers)
+        sectors = dict(Stock.objects.filter(ticker__in=tickers).values_list('ticker', 'sector'))
+
+    results = {}
+    batch = []
+    for ticker in tickers:
+        if ticker not in sectors:
+            results[ticker] = {"error": f"Stock with ticker {ticker} not found in the database."}
+        elif ticker not in series or len(series[ticker][1]) < window:
+            found = len(series[ticker][1]) if ticker in series else 0
+            results[ticker] = {"error": f"Not enough historical data for LSTM. Need at least {window} days, found {found}."}
+        else:
+            batch.append(ticker)
+    if not batch:
+        return results
+
+    with stage_timer('lstm_global', 'predict'):
+        window_prices = np.stack([series[ticker][1][-window:] for ticker in batch])
+        sector_ids = np.array([meta["sectors"].get(sectors[ticker], 0) for ticker in batch])
+        prices = np.empty((len(batch), FORECAST_STEPS))
+        for step in range(FORECAST_STEPS):
+            # Re-anchor on the latest (possibly predicted) close, exactly as during training.
+            anchors = window_prices[:, -1:]
+            X = (window_prices / anchors - 1.0)[..., np.newaxis]
+            relative = model.predict(X, sector_ids)
+            prices[:, step] = anchors[:, 0] * (1.0 + relative[:, 0])
+            window_prices = np.concatenate([window_prices[:, 1:], prices[:, step:step + 1]], axis=1)
+
+    for ticker, row in zip(batch, prices):
+        last_date = series[ticker][0][-1]
+        results[ticker] = {
+            "ticker": ticker,
+            "model_type": "LSTM",
+            "forecast": [
+                {"date": (last_date + timedelta(days=i)).strftime('%Y-%m-%d'), "predicted_price": round(float(price), 2)}
+                for i, price in enumerate(row, start=1)
+            ]
+        }
+    return results
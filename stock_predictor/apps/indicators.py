@@ -0,0 +1,350 @@
+import logging
+from collections import deque
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.dispatch import receiver
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+from .aggregates import JoinedValues
+from .metrics import stage_timer
+from .models import StockPrice
+from .signals import prices_ingested
+
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ('date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+
+# Rows kept by IndicatorState for the window-based indicators; must cover the longest window.
+TAIL_ROWS = 60
+STATE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+SERIES_CACHE_TIMEOUT = 60 * 60 * 24
+
+WINDOW_INDICATORS = (
+    'sma_20', 'sma_50', 'bb_upper', 'bb_lower', 'bb_width', 'stoch_k', 'stoch_d', 'williams_r',
+    'roc_10', 'momentum_10', 'volatility_20', 'return_1d', 'cci_20',
+)
+RECURSIVE_INDICATORS = ('ema_12', 'ema_26', 'macd', 'macd_signal', 'macd_hist', 'rsi_14', 'atr_14', 'obv')
+INDICATORS = WINDOW_INDICATORS + RECURSIVE_INDICATORS
+
+# Rows before which a recursive indicator is still warming up and reported as NaN.
+WARMUP = {
+    'ema_12': 11, 'ema_26': 25, 'macd': 25, 'macd_signal': 33, 'macd_hist': 33,
+    'rsi_14': 14, 'atr_14': 14, 'obv': 0,
+}
+
+
+# --- Vectorized kernels ---
+
+def _rolling(x: np.ndarray, window: int, func) -> np.ndarray:
+    """Applies a reduction over trailing windows; the first window-1 values are NaN."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = func(sliding_window_view(x, window), axis=-1)
+    return out
+
+
+def sma(x: np.ndarray, window: int) -> np.ndarray:
+    return _rolling(x, window, np.mean)
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    return _rolling(x, window, np.std)
+
+
+def ema(x: np.ndarray, alpha: float) -> np.ndarray:
+    """Recursive EMA seeded with the first value: y[0] = x[0], y[t] = a*x[t] + (1-a)*y[t-1]."""
+    if not len(x):
+        return np.array([], dtype=float)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return y
+
+
+def _shift(x: np.ndarray, periods: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) > periods:
+        out[periods:] = x[:-periods]
+    return out
+
+
+def _safe_divide(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b == 0, np.nan, a / b)
+
+
+def window_indicators(high, low, close) -> dict:
+    """Indicators that depend only on a trailing window of rows."""
+    out = {}
+    out['sma_20'] = middle = sma(close, 20)
+    out['sma_50'] = sma(close, 50)
+    std_20 = rolling_std(close, 20)
+    out['bb_upper'] = middle + 2 * std_20
+    out['bb_lower'] = middle - 2 * std_20
+    out['bb_width'] = _safe_divide(out['bb_upper'] - out['bb_lower'], middle)
+
+    highest = _rolling(high, 14, np.max)
+    lowest = _rolling(low, 14, np.min)
+    out['stoch_k'] = 100 * _safe_divide(close - lowest, highest - lowest)
+    out['stoch_d'] = sma(out['stoch_k'], 3)
+    out['williams_r'] = -100 * _safe_divide(highest - close, highest - lowest)
+
+    close_10 = _shift(close, 10)
+    out['roc_10'] = 100 * (_safe_divide(close, close_10) - 1)
+    out['momentum_10'] = close - close_10
+    out['return_1d'] = _safe_divide(close, _shift(close, 1)) - 1
+    out['volatility_20'] = rolling_std(out['return_1d'], 20) * np.sqrt(252)
+
+    typical = (high + low + close) / 3
+    typical_sma = sma(typical, 20)
+    mean_deviation = _rolling(typical, 20, lambda w, axis: np.mean(np.abs(w - w.mean(axis=axis, keepdims=True)), axis=axis))
+    out['cci_20'] = _safe_divide(typical - typical_sma, 0.015 * mean_deviation)
+    return out
+
+
+def _rsi(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100 - 100 / (1 + rs)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+    return rsi
+
+
+def _true_range(high, low, prev_close):
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def compute_indicators(arrays: dict) -> dict:
+    """
+    Computes every indicator for one ticker. `arrays` holds float arrays
+    'open', 'high', 'low', 'close' and 'volume' sorted by date.
+    Returns {name: array} aligned with the input rows.
+    """
+    high, low, close, volume = arrays['high'], arrays['low'], arrays['close'], arrays['volume']
+    out = window_indicators(high, low, close)
+
+    out['ema_12'] = ema(close, 2 / 13)
+    out['ema_26'] = ema(close, 2 / 27)
+    out['macd'] = out['ema_12'] - out['ema_26']
+    out['macd_signal'] = ema(out['macd'], 2 / 10)
+    out['macd_hist'] = out['macd'] - out['macd_signal']
+
+    delta = np.diff(close, prepend=close[:1])
+    out['rsi_14'] = _rsi(ema(np.maximum(delta, 0), 1 / 14), ema(np.maximum(-delta, 0), 1 / 14))
+
+    prev_close = np.concatenate((close[:1], close[:-1]))
+    true_range = _true_range(high, low, prev_close)
+    true_range[:1] = high[:1] - low[:1]
+    out['atr_14'] = ema(true_range, 1 / 14)
+    out['obv'] = np.cumsum(np.sign(delta) * volume)
+
+    for name, rows in WARMUP.items():
+        out[name][:rows] = np.nan
+    return out
+
+
+# --- Incremental updates ---
+
+class IndicatorState:
+    """
+    Per-ticker state that advances every indicator by one bar in O(1): the
+    recursive indicators (EMAs, Wilder averages, OBV) keep their last value
+    and the window-based ones are recomputed over a fixed-size tail.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_date = None
+        self.tail = {field: deque(maxlen=TAIL_ROWS) for field in ('high', 'low', 'close')}
+        self.recursive = {}
+        self.latest = {}
+
+    @classmethod
+    def from_history(cls, dates, arrays: dict, computed: dict = None):
+        computed = computed if computed is not None else compute_indicators(arrays)
+        state = cls()
+        state.count = len(dates)
+        state.last_date = dates[-1]
+        for field, values in state.tail.items():
+            values.extend(arrays[field][-TAIL_ROWS:].tolist())
+        close, volume = arrays['close'], arrays['volume']
+        delta = np.diff(close, prepend=close[:1])
+        # Re-derive the unmasked recursive values from the final row of each series.
+        state.recursive = {
+            'ema_12': float(ema(close, 2 / 13)[-1]),
+            'ema_26': float(ema(close, 2 / 27)[-1]),
+            'macd_signal': float(ema(ema(close, 2 / 13) - ema(close, 2 / 27), 2 / 10)[-1]),
+            'avg_gain': float(ema(np.maximum(delta, 0), 1 / 14)[-1]),
+            'avg_loss': float(ema(np.maximum(-delta, 0), 1 / 14)[-1]),
+            'atr_14': None,
+            'obv': float(np.cumsum(np.sign(delta) * volume)[-1]),
+        }
+        prev_close = np.concatenate((close[:1], close[:-1]))
+        true_range = _true_range(arrays['high'], arrays['low'], prev_close)
+        true_range[:1] = arrays['high'][:1] - arrays['low'][:1]
+        state.recursive['atr_14'] = float(ema(true_range, 1 / 14)[-1])
+        state.latest = {name: _clean(values[-1]) for name, values in computed.items()}
+        return state
+
+    def update(self, bar_date, high: float, low: float, close: float, volume: float) -> dict:
+        """Advances the state by one bar and returns the latest indicator values."""
+        prev_close = self.tail['close'][-1]
+        self.tail['high'].append(high)
+        self.tail['low'].append(low)
+        self.tail['close'].append(close)
+        self.count += 1
+        self.last_date = bar_date
+
+        r = self.recursive
+        r['ema_12'] += 2 / 13 * (close - r['ema_12'])
+        r['ema_26'] += 2 / 27 * (close - r['ema_26'])
+        macd = r['ema_12'] - r['ema_26']
+        r['macd_signal'] += 2 / 10 * (macd - r['macd_signal'])
+        delta = close - prev_close
+        r['avg_gain'] += 1 / 14 * (max(delta, 0.0) - r['avg_gain'])
+        r['avg_loss'] += 1 / 14 * (max(-delta, 0.0) - r['avg_loss'])
+        r['atr_14'] += 1 / 14 * (float(_true_range(high, low, prev_close)) - r['atr_14'])
+        r['obv'] += np.sign(delta) * volume
+
+        tail = {field: np.fromiter(values, dtype=float) for field, values in self.tail.items()}
+        latest = {name: values[-1] for name, values in window_indicators(tail['high'], tail['low'], tail['close']).items()}
+        latest.update({
+            'ema_12': r['ema_12'],
+            'ema_26': r['ema_26'],
+            'macd': macd,
+            'macd_signal': r['macd_signal'],
+            'macd_hist': macd - r['macd_signal'],
+            'rsi_14': float(_rsi(np.array(r['avg_gain']), np.array(r['avg_loss']))),
+            'atr_14': r['atr_14'],
+            'obv': r['obv'],
+        })
+        for name, rows in WARMUP.items():
+            if self.count <= rows:
+                latest[name] = np.nan
+        self.latest = {name: _clean(value) for name, value in latest.items()}
+        return self.latest
+
+
+def _clean(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+# --- Data access and caching ---
+
+def _state_key(ticker: str) -> str:
+    return f"indicators:state:{ticker}"
+
+
+def load_ohlcv(tickers) -> dict:
+    """
+    Loads OHLCV rows for many tickers in one query.
+    Returns {ticker: (dates, arrays)} sorted by date.
+
+    Each ticker comes back as one row of comma-joined columns that NumPy
+    parses in C; building a Decimal per value for every fetched row made
+    the query most of the cost of a bulk run.
+    """
+    columns = OHLCV_FIELDS[1:]
+    groups = (
+        StockPrice.objects.filter(stock__ticker__in=list(tickers))
+        .order_by().values('stock__ticker')
+        .annotate(dates=JoinedValues('date'), **{field: JoinedValues(field) for field in columns})
+        .values_list('stock__ticker', 'dates', *columns)
+    )
+    result = {}
+    for ticker, dates, *values in groups:
+        days = np.array(dates.split(','), dtype='datetime64[D]')
+        order = np.argsort(days, kind='stable')
+        matrix = [np.fromstring(joined, dtype=np.float64, sep=',')[order] for joined in values]
+        result[ticker] = (days[order].astype(object), {
+            'open': matrix[0], 'high': matrix[1], 'low': matrix[2], 'close': matrix[3], 'volume': matrix[4],
+        })
+    return result
+
+
+def _price_summary(ticker: str):
+    """(last date, row count) of a ticker's stored bars, in one query."""
+    summary = StockPrice.objects.filter(stock__ticker=ticker).aggregate(last_date=Max('date'), rows=Count('id'))
+    return summary['last_date'], summary['rows']
+
+
+def get_indicator_series(ticker: str, summary=None):
+    """
+    Returns (dates, {name: array}) for a ticker, cached until new rows are ingested.
+    The cache key includes the last date and row count so a new bar invalidates it.
+    """
+    ticker = ticker.upper()
+    last_date, rows = summary or _price_summary(ticker)
+    if last_date is None:
+        return None, {}
+    key = f"indicators:series:{ticker}:{last_date.isoformat()}:{rows}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    with stage_timer('indicators', 'compute'):
+        dates, arrays = load_ohlcv([ticker])[ticker]
+        computed = compute_indicators(arrays)
+    cache.set(key, (dates, computed), SERIES_CACHE_TIMEOUT)
+    cache.set(_state_key(ticker), IndicatorState.from_history(dates, arrays, computed), STATE_CACHE_TIMEOUT)
+    return dates, computed
+
+
+def compute_indicators_bulk(tickers) -> dict:
+    """
+    Computes indicators for many tickers from a single query and primes the
+    incremental state cache. Returns {ticker: latest indicator values}.
+    """
+    with stage_timer('indicators', 'bulk_query'):
+        histories = load_ohlcv(tickers)
+    latest = {}
+    states = {}
+    with stage_timer('indicators', 'bulk_compute'):
+        for ticker, (dates, arrays) in histories.items():
+            state = IndicatorState.from_history(dates, arrays)
+            states[_state_key(ticker)] = state
+            latest[ticker] = {'date': dates[-1].isoformat(), **state.latest}
+    cache.set_many(states, STATE_CACHE_TIMEOUT)
+    return latest
+
+
+def get_latest_indicators(ticker: str) -> dict:
+    """
+    Latest indicator values. The cached incremental state is used only while
+    it matches the stored bars (last date and row count): ingestion may have
+    run in another process whose cache this one does not share. Otherwise
+    the values come from the full series, which also rebuilds the state.
+    """
+    ticker = ticker.upper()
+    summary = _price_summary(ticker)
+    if summary[0] is None:
+        return {}
+    state = cache.get(_state_key(ticker))
+    if state is not None and (state.last_date, state.count) == summary:
+        return {'date': state.last_date.isoformat(), **state.latest}
+    dates, computed = get_indicator_series(ticker, summary)
+    return {'date': dates[-1].isoformat(), **{name: _clean(values[-1]) for name, values in computed.items()}}
+
+
+@receiver(prices_ingested)
+def update_indicators_on_ingest(sender, stock, dates, **kwargs):
+    """
+    Advances the cached indicator state with newly ingested bars. Bars that
+    are not strictly after the state's last date (backfills, corrections)
+    drop the state so it is rebuilt from the DB on next use.
+    """
+    key = _state_key(stock.ticker)
+    state = cache.get(key)
+    if state is None:
+        return
+    new_dates = sorted(d for d in dates if d > state.last_date)
+    if len(new_dates) != len(set(dates)):
+        cache.delete(key)
+        return
+    bars = StockPrice.objects.filter(stock=stock, date__in=new_dates).order_by('date').values_list(*OHLCV_FIELDS)
+    with stage_timer('indicators', 'incremental'):
+        for bar_date, _, high, low, close, volume in bars:
+            state.update(bar_date, float(high), float(low), float(close), float(volume))
+    cache.set(key, state, STATE_CACHE_TIMEOUT)
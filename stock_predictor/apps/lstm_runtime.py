@@ -0,0 +1,183 @@
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# One entry per model name, least recently used evicted first.
+MAX_CACHED_MODELS = 64
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'tanh': np.tanh,
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+}
+
+
+def export_lstm(model, path, scaler=None, metadata: dict = None) -> Path:
+    """
+    Extracts weights from a trained Keras model built by `build_lstm_model`
+    or `build_global_model` and saves them to `path` (.npz) together with the
+    fitted scaler, so `load_lstm` can forecast without importing TensorFlow.
+    Dropout layers are skipped since they are inactive at inference time.
+    `metadata` must include the input "window" length.
+    """
+    arrays = {}
+    spec = {'lstm': [], 'embedding': False, 'dense': None}
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+        if kind == 'LSTM':
+            index = len(spec['lstm'])
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            arrays[f'lstm_{index}_kernel'] = kernel
+            arrays[f'lstm_{index}_recurrent_kernel'] = recurrent_kernel
+            arrays[f'lstm_{index}_bias'] = bias
+            spec['lstm'].append({
+                'units': config['units'],
+                'activation': config.get('activation', 'tanh'),
+                'recurrent_activation': config.get('recurrent_activation', 'sigmoid'),
+                'return_sequences': config.get('return_sequences', False),
+            })
+        elif kind == 'Embedding':
+            arrays['embedding'] = layer.get_weights()[0]
+            spec['embedding'] = True
+        elif kind == 'Dense':
+            kernel, bias = layer.get_weights()
+            arrays['dense_kernel'] = kernel
+            arrays['dense_bias'] = bias
+            spec['dense'] = {'activation': config.get('activation') or 'linear'}
+    if not spec['lstm'] or spec['dense'] is None:
+        raise ValueError("Model has no LSTM/Dense layers to export.")
+
+    if scaler is not None:
+        arrays['scaler_min'] = np.asarray(scaler.min_, dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+
+    header = {'spec': spec, 'metadata': metadata or {}}
+    path = Path(path)
+    with open(path, 'wb') as fh:
+        np.savez_compressed(fh, header=np.array(json.dumps(header)), **arrays)
+    return path
+
+
+class NumpyLSTM:
+    """Forward pass of an exported LSTM stack, batched over the first axis."""
+
+    def __init__(self, arrays: dict, spec: dict, metadata: dict):
+        self.spec = spec
+        self.metadata = metadata
+        self.dtype = np.float32
+        self.layers = []
+        for index, layer in enumerate(spec['lstm']):
+            self.layers.append({
+                'kernel': arrays[f'lstm_{index}_kernel'].astype(self.dtype),
+                'recurrent_kernel': arrays[f'lstm_{index}_recurrent_kernel'].astype(self.dtype),
+                'bias': arrays[f'lstm_{index}_bias'].astype(self.dtype),
+                'units': layer['units'],
+                'activation': ACTIVATIONS[layer['activation']],
+                'recurrent_activation': ACTIVATIONS[layer['recurrent_activation']],
+                'return_sequences': layer['return_sequences'],
+            })
+        self.embedding = arrays['embedding'].astype(self.dtype) if spec['embedding'] else None
+        self.dense_kernel = arrays['dense_kernel'].astype(self.dtype)
+        self.dense_bias = arrays['dense_bias'].astype(self.dtype)
+        self.dense_activation = ACTIVATIONS[spec['dense']['activation']]
+        self.scaler_min = arrays.get('scaler_min')
+        self.scaler_scale = arrays.get('scaler_scale')
+
+    def _lstm(self, layer, x):
+        batch, timesteps, _ = x.shape
+        units = layer['units']
+        h = np.zeros((batch, units), dtype=self.dtype)
+        c = np.zeros((batch, units), dtype=self.dtype)
+        # Input projections for every timestep in one matmul; only the recurrence is sequential.
+        projected = x @ layer['kernel'] + layer['bias']
+        outputs = []
+        for t in range(timesteps):
+            z = projected[:, t, :] + h @ layer['recurrent_kernel']
+            # Keras gate order: input, forget, cell candidate, output.
+            i = layer['recurrent_activation'](z[:, :units])
+            f = layer['recurrent_activation'](z[:, units:2 * units])
+            g = layer['activation'](z[:, 2 * units:3 * units])
+            o = layer['recurrent_activation'](z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * layer['activation'](c)
+            if layer['return_sequences']:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if layer['return_sequences'] else h
+
+    def predict(self, X, sector_ids=None):
+        """
+        X has shape (batch, window, features); sector_ids (batch,) is required
+        for models exported with a sector embedding. Returns (batch, 1).
+        """
+        x = np.asarray(X, dtype=self.dtype)
+        for layer in self.layers:
+            x = self._lstm(layer, x)
+        if self.embedding is not None:
+            ids = np.asarray(sector_ids, dtype=np.int64).reshape(-1)
+            x = np.concatenate([x, self.embedding[ids]], axis=1)
+        return self.dense_activation(x @ self.dense_kernel + self.dense_bias)
+
+    def inverse_transform(self, values):
+        """Undoes the MinMaxScaler exported with the model."""
+        if self.scaler_min is None:
+            raise ValueError("This model was exported without a scaler.")
+        return (np.asarray(values) - self.scaler_min) / self.scaler_scale
+
+    def transform(self, values):
+        if self.scaler_min is None:
+            raise ValueError("This model was exported without a scaler.")
+        return np.asarray(values) * self.scaler_scale + self.scaler_min
+
+    def forecast(self, scaled_data, steps: int) -> list:
+        """NumPy equivalent of predictor.forecast_lstm for a single series."""
+        window = self.metadata['window']
+        sequence = np.asarray(scaled_data, dtype=self.dtype).reshape(-1)[-window:]
+        predicted = []
+        for _ in range(steps):
+            value = self.predict(sequence.reshape(1, window, 1))[0, 0]
+            predicted.append(float(self.inverse_transform([[value]])[0][0]))
+            sequence = np.append(sequence[1:], value)
+        return predicted
+
+
+def load_lstm(path, key: str = None) -> NumpyLSTM:
+    """
+    Loads an exported model, reusing the in-process copy until the file
+    changes. `key` (the artifact name; default the path) identifies the
+    model, so a new version replaces the cached copy of the previous one.
+    """
+    path = Path(path)
+    key = key or str(path)
+    mtime = path.stat().st_mtime
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == (path, mtime):
+            _cache.move_to_end(key)
+            return cached[1]
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data['header']))
+        arrays = {key: data[key] for key in data.files if key != 'header'}
+    model = NumpyLSTM(arrays, header['spec'], header['metadata'])
+    with _cache_lock:
+        _cache[key] = ((path, mtime), model)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_MODELS:
+            _cache.popitem(last=False)
+    return model
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.models import Stock
+from apps.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the weekly/monthly OHLCV rollups from daily prices (ingestion keeps them current afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tickers', nargs='*', help='Tickers to rebuild (default: every stock).')
+
+    def handle(self, *args, **options):
+        stocks = Stock.objects.all()
+        if options['tickers']:
+            stocks = stocks.filter(ticker__in=[ticker.upper() for ticker in options['tickers']])
+        if not stocks.exists():
+            raise CommandError('No matching stocks found in the database.')
+
+        for stock in stocks:
+            bars = rebuild_rollups(stock)
+            self.stdout.write(f"{stock.ticker}: {bars} weekly/monthly bar(s)")
+        self.stdout.write(self.style.SUCCESS('Rollups rebuilt.'))
@@ -1,7 +1,21 @@
 from django.core.management.base import BaseCommand,CommandError
+from apps.indicators import compute_indicators_bulk
 from apps.models import Stock, StockPrice
 from apps.utils import fetch_stock_data
+from apps.metrics import INGESTED_ROWS, stage_timer
+from apps.signals import prices_ingested
 from datetime import datetime, timedelta
+from decimal import Decimal
+
+PRICE_FIELDS = ('open_price', 'high_price', 'low_price', 'close_price')
+CENT = Decimal('0.01')
+
+
+def _bar(row) -> tuple:
+    """A fetched row as the (open, high, low, close, volume) the database stores."""
+    prices = tuple(Decimal(str(row[column])).quantize(CENT) for column in ('open', 'high', 'low', 'close'))
+    return prices + (int(row['volume']),)
+
 
 class Command(BaseCommand):
     help = 'Fetch historical stock data for all stocks in the database'
@@ -12,6 +26,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('No stocks found in the database.'))
             return
 
+        changed_tickers = []
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365)  # Fetch last year by default
 
@@ -23,17 +38,36 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING(f"No data found for {stock.ticker}."))
                 continue
 
-            # Save to DB
-            for _, row in history_df.iterrows():
-                StockPrice.objects.update_or_create(
-                    stock=stock,
-                    date=row['date'],
-                    defaults={
-                        'open_price': row['open'],
-                        'high_price': row['high'],
-                        'low_price': row['low'],
-                        'close_price': row['close'],
-                        'volume': row['volume']
-                    }
-                )
-            self.stdout.write(self.style.SUCCESS(f"Data for {stock.ticker} updated successfully.")) 
\ No newline at end of file
+            # Save to DB. Only bars that are new or differ from the stored ones
+            # (a corrected close, today's partial bar re-fetched) are written, and
+            # every one of them is announced so derived data follows.
+            stored = {
+                row[0]: row[1:]
+                for row in StockPrice.objects.filter(
+                    stock=stock, date__gte=history_df['date'].min().date(), date__lte=history_df['date'].max().date()
+                ).values_list('date', *PRICE_FIELDS, 'volume')
+            }
+            changed_dates = []
+            with stage_timer('ingestion', 'store'):
+                for _, row in history_df.iterrows():
+                    day = row['date'].date()
+                    bar = _bar(row)
+                    if stored.get(day) == bar:
+                        continue
+                    StockPrice.objects.update_or_create(
+                        stock=stock,
+                        date=day,
+                        defaults=dict(zip(PRICE_FIELDS + ('volume',), bar)),
+                    )
+                    changed_dates.append(day)
+            if changed_dates:
+                changed_tickers.append(stock.ticker)
+            INGESTED_ROWS.inc(len(history_df), source='fetch_history')
+            prices_ingested.send(sender=self.__class__, stock=stock, dates=changed_dates, source='fetch_history')
+            self.stdout.write(self.style.SUCCESS(f"Data for {stock.ticker} updated successfully.")) 
+
+        if changed_tickers:
+            # One query and one vectorized pass for every ticker that changed, so
+            # the indicator endpoints start from a warm state.
+            compute_indicators_bulk(changed_tickers)
+            self.stdout.write(f"Indicators refreshed for {len(changed_tickers)} stock(s).")
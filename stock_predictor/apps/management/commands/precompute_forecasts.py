@@ -0,0 +1,190 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models import Count, Max
+
+from apps import global_lstm
+from apps.models import Stock, StockPrice
+from apps.predictor import get_stored_forecast, predict_with_arima, predict_with_lstm, store_forecast
+
+PREDICTORS = {
+    'arima': predict_with_arima,
+    'lstm': predict_with_lstm,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Pre-compute ARIMA/LSTM forecasts for every watchlisted stock (most watched first) '
+        'and store them as Prediction rows so the predict endpoints can serve them read-only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', default='arima,lstm',
+                            help='Comma separated models to run (default: arima,lstm).')
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Size of the worker pool (default: 2).')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Only process the N most watched stocks.')
+        parser.add_argument('--ingest', action='store_true',
+                            help='Run fetch_history first so forecasts use the latest prices.')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompute forecasts that are still fresh.')
+        parser.add_argument('--daily-at', metavar='HH:MM',
+                            help='Keep running and repeat every day at this local time.')
+
+    def handle(self, *args, **options):
+        models = [name.strip().lower() for name in options['models'].split(',') if name.strip()]
+        unknown = set(models) - set(PREDICTORS)
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(sorted(unknown))}")
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        if not options['daily_at']:
+            self.run_once(models, options)
+            return
+
+        try:
+            run_at = datetime.strptime(options['daily_at'], '%H:%M').time()
+        except ValueError:
+            raise CommandError('--daily-at must be in HH:MM format.')
+
+        while True:
+            now = datetime.now()
+            next_run = datetime.combine(now.date(), run_at)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            self.stdout.write(f"Next run scheduled for {next_run:%Y-%m-%d %H:%M}.")
+            time.sleep((next_run - now).total_seconds())
+            try:
+                self.run_once(models, options)
+            except Exception as e:
+                # A failed night must not kill the scheduler; tomorrow's run retries.
+                self.stderr.write(self.style.ERROR(f"Pre-computation run failed: {e}"))
+            finally:
+                close_old_connections()
+
+    def run_once(self, models, options):
+        if options['ingest']:
+            self.stdout.write('Running ingestion before pre-computing forecasts...')
+            call_command('fetch_history', stdout=self.stdout, stderr=self.stderr)
+
+        stocks = (
+            Stock.objects.annotate(watchers=Count('watchlisted_by'))
+            .filter(watchers__gt=0)
+            .order_by('-watchers', 'ticker')
+            .values_list('ticker', 'watchers')
+        )
+        if options['limit']:
+            stocks = stocks[:options['limit']]
+        stocks = list(stocks)
+        if not stocks:
+            self.stdout.write(self.style.WARNING('No watchlisted stocks to pre-compute.'))
+            return
+
+        started = time.perf_counter()
+        durations = {model: [] for model in models}
+        failures = []
+
+        # A stored forecast that already starts after the newest bar would be recomputed identically.
+        jobs = [(ticker, model) for ticker, _ in stocks for model in models]
+        skipped = [] if options['force'] else [job for job in jobs if self.is_fresh(*job)]
+        if skipped:
+            self.stdout.write(f"Skipping {len(skipped)} forecast(s) that are still fresh (use --force to recompute).")
+        jobs = [job for job in jobs if job not in skipped]
+
+        # The shared LSTM forecasts every stock in one batched pass instead of a job per ticker.
+        if 'lstm' in models and global_lstm.is_enabled():
+            lstm_tickers = [ticker for ticker, model in jobs if model == 'lstm']
+            jobs = [job for job in jobs if job[1] != 'lstm']
+            if lstm_tickers:
+                failures.extend(self.compute_global_lstm(lstm_tickers, durations))
+
+        # Jobs are submitted in priority order; the pool size bounds concurrent training runs.
+        if jobs:
+            total = len(jobs)
+            self.stdout.write(
+                f"Pre-computing {total} forecast(s) for {len(stocks)} stock(s) with {options['workers']} worker(s)..."
+            )
+
+            # Training runs in parallel; writes are serialized so SQLite does not hit lock timeouts.
+            self.write_lock = threading.Lock()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                futures = {pool.submit(self.compute, ticker, model): (ticker, model) for ticker, model in jobs}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    ticker, model = futures[future]
+                    error, elapsed = future.result()
+                    durations[model].append(elapsed)
+                    if error:
+                        failures.append((ticker, model, error))
+                        self.stdout.write(self.style.WARNING(
+                            f"[{done}/{total}] {ticker} {model.upper()} failed after {elapsed:.1f}s: {error}"
+                        ))
+                    else:
+                        self.stdout.write(f"[{done}/{total}] {ticker} {model.upper()} done in {elapsed:.1f}s")
+
+        wall = time.perf_counter() - started
+        total = sum(len(samples) for samples in durations.values())
+        succeeded = total - len(failures)
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished {succeeded}/{total} forecast(s) in {wall:.1f}s "
+            f"({succeeded / wall * 60 if wall else 0:.1f} forecasts/min), {len(skipped)} skipped as fresh."
+        ))
+        for model, samples in durations.items():
+            if samples:
+                self.stdout.write(
+                    f"  {model.upper()}: {len(samples)} run(s), mean {sum(samples) / len(samples):.1f}s, "
+                    f"max {max(samples):.1f}s"
+                )
+        if failures:
+            self.stdout.write(self.style.WARNING(f"  {len(failures)} failure(s)."))
+
+    def is_fresh(self, ticker: str, model: str) -> bool:
+        """Whether the stored forecast is within FORECAST_MAX_AGE_HOURS and starts the day after the newest bar."""
+        stored = get_stored_forecast(ticker, model.upper())
+        if stored is None:
+            return False
+        last_date = StockPrice.objects.filter(stock__ticker=ticker).aggregate(last=Max('date'))['last']
+        return last_date is not None and stored['forecast'][0]['date'] == (last_date + timedelta(days=1)).isoformat()
+
+    def compute_global_lstm(self, tickers, durations) -> list:
+        """Forecasts all tickers through the shared LSTM in one batch and stores the results."""
+        self.stdout.write(f"Forecasting {len(tickers)} stock(s) with the global LSTM in one batch...")
+        start = time.perf_counter()
+        results = global_lstm.predict_many_with_global_lstm(tickers)
+        failures = []
+        for ticker in tickers:
+            result = results[ticker]
+            if "error" in result:
+                failures.append((ticker, 'lstm', result["error"]))
+                self.stdout.write(self.style.WARNING(f"{ticker} LSTM failed: {result['error']}"))
+            else:
+                store_forecast(result)
+        elapsed = time.perf_counter() - start
+        # Report the amortized per-ticker cost so the summary stays comparable with per-ticker runs.
+        durations['lstm'].extend([elapsed / len(tickers)] * len(tickers))
+        self.stdout.write(f"Global LSTM batch done in {elapsed:.1f}s")
+        return failures
+
+    def compute(self, ticker: str, model: str):
+        """Runs one forecast in a worker thread and returns (error, seconds)."""
+        predict = PREDICTORS[model]
+        start = time.perf_counter()
+        try:
+            result = predict(ticker)
+            if "error" in result:
+                return result["error"], time.perf_counter() - start
+            with self.write_lock:
+                store_forecast(result)
+            return None, time.perf_counter() - start
+        except Exception as e:
+            return str(e), time.perf_counter() - start
+        finally:
+            # Each worker thread opens its own DB connection; release it once done.
+            connection.close()
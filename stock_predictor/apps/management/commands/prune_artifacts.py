@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.predictor import get_artifact_store
+
+
+class Command(BaseCommand):
+    help = 'Delete old versions of saved models, keeping the newest ones (and always the current one)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Artifact names, e.g. lstm_AAPL (default: all).')
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Versions to keep per model (default: ARTIFACT_KEEP_VERSIONS).')
+
+    def handle(self, *args, **options):
+        store = get_artifact_store()
+        if options['keep'] is not None:
+            if options['keep'] < 1:
+                raise CommandError('--keep must be at least 1.')
+            store.keep = options['keep']
+
+        removed = 0
+        for name in options['names'] or store.names():
+            with store.lock(name):
+                removed += store.gc(name)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} old model version(s)."))
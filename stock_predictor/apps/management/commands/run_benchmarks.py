@@ -0,0 +1,483 @@
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.models import Stock, StockPrice
+
+MANAGE_DIR = Path(settings.BASE_DIR)
+# Goal for a cold analytics request over 500 tickers x 10 years.
+ANALYTICS_TARGET_SECONDS = 1.0
+
+
+def synthetic_history(ticker: str, days: int, end: date = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a business-day OHLCV frame shaped like the output of
+    `fetch_stock_data`, ending at `end` (today by default).
+    The series is a seeded geometric random walk so runs are reproducible.
+    """
+    end = end or date.today()
+    dates = pd.bdate_range(end=end, periods=days)
+    rng = np.random.default_rng(seed + sum(map(ord, ticker)))
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, size=days)))
+    open_ = close * (1 + rng.normal(0, 0.005, size=days))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, size=days))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, size=days))
+    volume = rng.integers(1_000_000, 50_000_000, size=days)
+    return pd.DataFrame({
+        'date': dates,
+        'open': open_.round(2),
+        'high': high.round(2),
+        'low': low.round(2),
+        'close': close.round(2),
+        'volume': volume,
+    })
+
+
+def synthetic_symbols(count: int, seed: int = 0) -> list:
+    """`count` unique (id, ticker, company name, sector) rows, as SymbolIndex takes them."""
+    rng = random.Random(seed)
+    words = ['Apple', 'Micro', 'Global', 'Energy', 'Holdings', 'Capital', 'Bio', 'Systems',
+             'Bank', 'Pharma', 'Motors', 'Foods', 'Networks', 'Industries', 'Group', 'Resources']
+    sectors = ['Technology', 'Energy', 'Healthcare', 'Financial Services']
+    symbols, seen = [], set()
+    while len(symbols) < count:
+        ticker = ''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(1, 5)))
+        if ticker not in seen:
+            seen.add(ticker)
+            symbols.append((len(symbols) + 1, ticker, ' '.join(rng.sample(words, 2)) + ' Inc', rng.choice(sectors)))
+    return symbols
+
+
+def summarize(samples: list) -> dict:
+    """Reduces a list of timings (seconds) to summary statistics."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'n': len(ordered),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'p95': p95,
+        'max': ordered[-1],
+    }
+
+
+def timeit(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def seed_prices(ticker: str, days: int) -> Stock:
+    stock, _ = Stock.objects.get_or_create(
+        ticker=ticker, defaults={'company_name': ticker, 'sector': 'Benchmark'}
+    )
+    df = synthetic_history(ticker, days)
+    StockPrice.objects.bulk_create([
+        StockPrice(
+            stock=stock,
+            date=row.date.date(),
+            open_price=row.open,
+            high_price=row.high,
+            low_price=row.low,
+            close_price=row.close,
+            volume=row.volume,
+        ) for row in df.itertuples(index=False)
+    ], ignore_conflicts=True)
+    return stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the offline benchmark suite (ingestion, history serving, ARIMA, LSTM, startup) '
+        'against synthetic price data in a throwaway test database and emit JSON results.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Write the JSON report to this path instead of stdout.')
+        parser.add_argument('--compare', help='Baseline JSON report to compare against.')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='Ratio over the baseline median that counts as a regression (default: 1.2).')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per case (default: 5).')
+        parser.add_argument('--history-sizes', default='250,1000,5000',
+                            help='Comma separated history lengths for the serialization benchmark.')
+        parser.add_argument('--ingest-tickers', type=int, default=5,
+                            help='Number of synthetic tickers ingested by fetch_history (default: 5).')
+        parser.add_argument('--ingest-days', type=int, default=250,
+                            help='Rows per ticker ingested by fetch_history (default: 250).')
+        parser.add_argument('--only', default='',
+                            help='Comma separated subset of: ingestion,history,arima,lstm,indicators,search,analytics,startup.')
+        parser.add_argument('--analytics-tickers', type=int, default=500,
+                            help='Tickers in the analytics benchmark (default: 500).')
+        parser.add_argument('--analytics-days', type=int, default=2520,
+                            help='Business days of history per ticker in the analytics benchmark (default: 2520).')
+        parser.add_argument('--indicator-tickers', type=int, default=3000,
+                            help='Tickers in the bulk indicator benchmark (default: 3000).')
+        parser.add_argument('--indicator-days', type=int, default=250,
+                            help='Business days of history per ticker in the bulk indicator benchmark (default: 250).')
+        parser.add_argument('--search-symbols', type=int, default=50000,
+                            help='Synthetic symbols in the search index benchmark (default: 50000).')
+
+    def handle(self, *args, **options):
+        suites = {
+            'ingestion': self.bench_ingestion,
+            'history': self.bench_history,
+            'arima': self.bench_arima,
+            'lstm': self.bench_lstm,
+            'indicators': self.bench_indicators,
+            'search': self.bench_search,
+            'analytics': self.bench_analytics,
+            'startup': self.bench_startup,
+        }
+        selected = [name for name in options['only'].split(',') if name] or list(suites)
+        unknown = set(selected) - set(suites)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+        report = {
+            'meta': self.environment(),
+            'results': {},
+        }
+
+        # Everything runs against a fresh test database so no real data is touched.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for name in selected:
+                self.stderr.write(f"Running {name} benchmarks...")
+                report['results'][name] = suites[name](options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        payload = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            Path(options['output']).write_text(payload)
+            self.stderr.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            self.compare(report, json.loads(Path(options['compare']).read_text()), options['threshold'])
+
+    # --- Environment ---
+
+    def environment(self) -> dict:
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=MANAGE_DIR, capture_output=True, text=True, timeout=10
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        }
+
+    # --- Benchmarks ---
+
+    def bench_ingestion(self, options) -> dict:
+        """Throughput of the fetch_history command with yfinance replaced by synthetic frames."""
+        tickers = [f"ING{i}" for i in range(options['ingest_tickers'])]
+        days = options['ingest_days']
+        for ticker in tickers:
+            Stock.objects.get_or_create(ticker=ticker, defaults={'company_name': ticker, 'sector': 'Benchmark'})
+        frames = {ticker: synthetic_history(ticker, days) for ticker in tickers}
+
+        def fake_fetch(ticker_symbol, start_date, end_date):
+            return frames.get(ticker_symbol, pd.DataFrame())
+
+        results = {}
+        # The first pass inserts every row, the second re-fetches the same rows, which are compared and skipped.
+        for phase in ('insert', 'update'):
+            with mock.patch('apps.management.commands.fetch_history.fetch_stock_data', side_effect=fake_fetch):
+                start = time.perf_counter()
+                call_command('fetch_history', stdout=io.StringIO())
+                elapsed = time.perf_counter() - start
+            rows = len(tickers) * days
+            results[phase] = {
+                'tickers': len(tickers),
+                'rows': rows,
+                'seconds': elapsed,
+                'rows_per_second': rows / elapsed if elapsed else None,
+            }
+        Stock.objects.filter(ticker__in=tickers).delete()
+        return results
+
+    def bench_history(self, options) -> dict:
+        """Latency of StockHistoryAPIView (query + serialization + JSON render) by history length."""
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from apps.views import StockHistoryAPIView
+
+        user, _ = User.objects.get_or_create(username='benchmark')
+        factory = APIRequestFactory()
+        view = StockHistoryAPIView.as_view()
+        sizes = [int(size) for size in options['history_sizes'].split(',') if size]
+
+        results = {}
+        for size in sizes:
+            ticker = f"HIST{size}"
+            seed_prices(ticker, size)
+
+            def call():
+                request = factory.get(f'/api/apps/{ticker}/history/')
+                force_authenticate(request, user=user)
+                response = view(request, ticker=ticker)
+                response.render()
+                return response
+
+            payload_bytes = len(call().content)
+            stats = timeit(call, options['repeat'])
+            stats['rows'] = size
+            stats['payload_bytes'] = payload_bytes
+            stats['rows_per_second'] = size / stats['median'] if stats['median'] else None
+            results[str(size)] = stats
+        return results
+
+    def bench_arima(self, options) -> dict:
+        """
+        ARIMA(5,1,0) fit and 7-step forecast, in isolation and through
+        predict_with_arima (which reuses the order stored by the first call),
+        plus a serial (p,d,q) order search.
+        """
+        from statsmodels.tsa.arima.model import ARIMA
+        from apps import predictor
+        from apps.arima_search import select_order
+
+        stock = seed_prices('ARIMA', 60)
+        series = pd.Series(
+            [float(p) for p in StockPrice.objects.filter(stock=stock).order_by('date')
+             .values_list('close_price', flat=True)]
+        )
+
+        fitted = {}
+
+        def fit():
+            fitted['model'] = ARIMA(series, order=(5, 1, 0)).fit()
+
+        fit_stats = timeit(fit, options['repeat'])
+        forecast_stats = timeit(lambda: fitted['model'].forecast(steps=7), options['repeat'])
+        search_stats = timeit(lambda: select_order(series.values, workers=1), options['repeat'])
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(predictor, 'MODEL_DIR', Path(tmp)):
+            result = predictor.predict_with_arima('ARIMA')
+            if 'error' in result:
+                raise CommandError(f"predict_with_arima failed on synthetic data: {result['error']}")
+            end_to_end = timeit(lambda: predictor.predict_with_arima('ARIMA'), options['repeat'])
+
+        return {
+            'observations': len(series),
+            'fit': fit_stats,
+            'forecast': forecast_stats,
+            'order_search': search_stats,
+            'predict_with_arima': end_to_end,
+        }
+
+    def bench_lstm(self, options) -> dict:
+        """LSTM window building and 7-step inference (Keras and NumPy runtime); training is excluded on purpose."""
+        from sklearn.preprocessing import MinMaxScaler
+        from apps import predictor
+        from apps.lstm_runtime import export_lstm, load_lstm
+
+        results = {}
+        for days in (250, 750):
+            close = synthetic_history('LSTM', days)['close'].to_numpy().reshape(-1, 1)
+            scaler = MinMaxScaler(feature_range=(0, 1))
+            scaled = scaler.fit_transform(close)
+            stats = timeit(lambda: predictor.build_lstm_windows(scaled), options['repeat'])
+            stats['windows'] = max(days - predictor.PREDICTION_DAYS, 0)
+            results[f"windows_{days}"] = stats
+
+        try:
+            model = predictor.build_lstm_model()
+        except ImportError as e:
+            results['skipped'] = f"TensorFlow unavailable: {e}"
+            return results
+        start = time.perf_counter()
+        predictor.forecast_lstm(model, scaled, scaler, steps=7)  # First call includes graph tracing.
+        results['inference_first_call_seconds'] = time.perf_counter() - start
+        results['inference_7_steps'] = timeit(
+            lambda: predictor.forecast_lstm(model, scaled, scaler, steps=7), options['repeat']
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = export_lstm(model, Path(tmp) / 'bench.npz', scaler=scaler,
+                               metadata={'window': predictor.PREDICTION_DAYS})
+            runtime = load_lstm(path)
+            results['numpy_inference_7_steps'] = timeit(
+                lambda: runtime.forecast(scaled, steps=7), options['repeat']
+            )
+        return results
+
+    def bench_indicators(self, options) -> dict:
+        """Every indicator for N tickers with compute_indicators_bulk: one query plus the vectorized passes."""
+        from django.core.cache import cache
+        from apps import indicators
+
+        tickers = [f"IND{i:04d}" for i in range(options['indicator_tickers'])]
+        for ticker in tickers:
+            seed_prices(ticker, options['indicator_days'])
+
+        load = timeit(lambda: indicators.load_ohlcv(tickers), options['repeat'])
+        bulk = timeit(lambda: indicators.compute_indicators_bulk(tickers), options['repeat'])
+        cache.clear()
+        return {
+            'tickers': len(tickers),
+            'days': options['indicator_days'],
+            'indicators': len(indicators.INDICATORS),
+            'load': load,
+            'bulk': bulk,
+        }
+
+    def bench_analytics(self, options) -> dict:
+        """
+        Price matrix load and correlation/volatility/beta for N tickers, cold
+        and cached. `meets_target` records whether a cold request through
+        get_analytics (cache check included) stays within ANALYTICS_TARGET_SECONDS.
+        """
+        from django.core.cache import cache
+        from apps import analytics
+
+        tickers = [f"AN{i:03d}" for i in range(options['analytics_tickers'])]
+        for ticker in tickers:
+            seed_prices(ticker, options['analytics_days'])
+
+        def request_cold():
+            cache.clear()
+            analytics.get_analytics(tickers)
+
+        load = timeit(lambda: analytics.load_price_matrix(tickers), options['repeat'])
+        cold = timeit(lambda: analytics.compute_analytics(tickers), options['repeat'])
+        request = timeit(request_cold, options['repeat'])
+        analytics.get_analytics(tickers)
+        cached = timeit(lambda: analytics.get_analytics(tickers), options['repeat'])
+        return {
+            'tickers': len(tickers),
+            'days': options['analytics_days'],
+            'load': load,
+            'compute_cold': cold,
+            'request_cold': request,
+            'cached': cached,
+            'target_seconds': ANALYTICS_TARGET_SECONDS,
+            'meets_target': request['median'] <= ANALYTICS_TARGET_SECONDS,
+        }
+
+    def bench_search(self, options) -> dict:
+        """Index build time and per-query autocomplete latency over synthetic symbols."""
+        from apps.search import SymbolIndex
+
+        symbols = synthetic_symbols(options['search_symbols'])
+        start = time.perf_counter()
+        index = SymbolIndex(symbols)
+        build_seconds = time.perf_counter() - start
+
+        cases = {
+            'ticker_prefix': ('AP', {}),
+            'name_prefix': ('glob cap', {}),
+            'sector_filter': ('A', {'sector': 'Energy'}),
+            'fuzzy': ('helth', {}),
+        }
+        results = {'symbols': len(symbols), 'build_seconds': build_seconds}
+        for name, (query, kwargs) in cases.items():
+            # Single queries are far below timer resolution; time batches of 100.
+            stats = timeit(lambda: [index.search(query, **kwargs) for _ in range(100)], options['repeat'])
+            results[name] = {key: value / 100 if key != 'n' else value for key, value in stats.items()}
+        return results
+
+    def bench_startup(self, options) -> dict:
+        """Import cost of Django setup and of the modules pulled in by the web process."""
+        targets = {
+            'django_setup': '',
+            'apps.utils': 'import apps.utils',
+            'apps.lstm_runtime': 'import apps.lstm_runtime',
+            'apps.predictor': 'import apps.predictor',
+            'apps.views': 'import apps.views',
+        }
+        results = {}
+        for name, statement in targets.items():
+            code = (
+                "import time, json\n"
+                "start = time.perf_counter()\n"
+                "import django\n"
+                "django.setup()\n"
+                "setup = time.perf_counter()\n"
+                f"{statement}\n"
+                "end = time.perf_counter()\n"
+                "print(json.dumps({'setup': setup - start, 'import': end - setup}))\n"
+            )
+            env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'stock_predictor.settings'),
+                   'TF_CPP_MIN_LOG_LEVEL': '3'}
+            wall = time.perf_counter()
+            proc = subprocess.run([sys.executable, '-c', code], cwd=MANAGE_DIR, env=env,
+                                  capture_output=True, text=True)
+            wall = time.perf_counter() - wall
+            if proc.returncode != 0:
+                results[name] = {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+                continue
+            timings = json.loads(proc.stdout.strip().splitlines()[-1])
+            results[name] = {
+                'django_setup_seconds': timings['setup'],
+                'import_seconds': timings['import'],
+                'process_wall_seconds': wall,
+            }
+        return results
+
+    # --- Regression comparison ---
+
+    def compare(self, current: dict, baseline: dict, threshold: float):
+        regressions = []
+        for path, value in _flatten_medians(current['results']).items():
+            previous = _flatten_medians(baseline.get('results', {})).get(path)
+            if not previous:
+                continue
+            ratio = value / previous
+            line = f"{path}: {previous:.6f}s -> {value:.6f}s ({ratio:.2f}x)"
+            if ratio > threshold:
+                regressions.append(line)
+                self.stderr.write(self.style.ERROR(line))
+            else:
+                self.stderr.write(line)
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed beyond {threshold:.2f}x the baseline.")
+
+
+def _flatten_medians(results: dict, prefix: str = '') -> dict:
+    """Maps 'suite.case' paths to their median timing so two reports can be diffed."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if 'median' in value:
+                flat[path] = value['median']
+            elif 'seconds' in value:
+                flat[path] = value['seconds']
+            elif 'import_seconds' in value:
+                flat[path] = value['import_seconds']
+            else:
+                flat.update(_flatten_medians(value, f"{path}."))
+    return flat
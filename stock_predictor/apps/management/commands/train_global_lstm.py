@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.global_lstm import train_global_lstm
+
+
+class Command(BaseCommand):
+    help = 'Train the shared cross-ticker LSTM used when LSTM_GLOBAL_MODEL is enabled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tickers', nargs='*', help='Tickers to train on (default: every stock).')
+        parser.add_argument('--epochs', type=int, default=10, help='Training epochs (default: 10).')
+        parser.add_argument('--batch-size', type=int, default=256, help='Training batch size (default: 256).')
+        parser.add_argument('--max-windows', type=int, default=500,
+                            help='Most recent training windows kept per ticker (default: 500).')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Training global LSTM...')
+        result = train_global_lstm(
+            tickers=options['tickers'] or None,
+            epochs=options['epochs'],
+            batch_size=options['batch_size'],
+            max_windows_per_ticker=options['max_windows'],
+        )
+        if "error" in result:
+            raise CommandError(result["error"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {result['samples']} windows from {result['tickers']} tickers; saved to {result['path']}."
+        ))
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Buckets (seconds) wide enough for a 2ms ORM query and a multi-minute LSTM training run.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    """Base class for in-process metrics rendered in the Prometheus text format."""
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (non-cumulative) plus a final +Inf slot, sum and count.
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels) -> dict:
+        state = self._values.get(self._key(labels))
+        if state is None:
+            return {'count': 0, 'sum': 0.0}
+        return {'count': state[2], 'sum': state[1]}
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    'stock_pipeline_stage_seconds',
+    'Time spent in each stage of the prediction, ingestion and sentiment pipelines.',
+    labelnames=('pipeline', 'stage'),
+)
+PIPELINE_ERRORS = Counter(
+    'stock_pipeline_errors_total',
+    'Pipeline runs that ended with an error, by the stage that failed.',
+    labelnames=('pipeline', 'stage'),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'stock_http_request_seconds',
+    'Wall-clock latency of HTTP requests by view.',
+    labelnames=('view', 'method', 'status'),
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    'stock_http_request_db_queries',
+    'Number of database queries executed per HTTP request by view.',
+    labelnames=('view',),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+INGESTED_ROWS = Counter(
+    'stock_ingested_rows_total',
+    'StockPrice rows written by ingestion, by source.',
+    labelnames=('source',),
+)
+STREAM_CONNECTIONS = Gauge(
+    'stock_stream_connections',
+    'Open server-sent event connections.',
+)
+STREAM_EVENTS = Counter(
+    'stock_stream_events_total',
+    'Events published to the push channel, by event type.',
+    labelnames=('event',),
+)
+STREAM_DROPPED = Counter(
+    'stock_stream_dropped_events_total',
+    'Events dropped because a subscriber queue was full, and subscribers disconnected for falling behind.',
+    labelnames=('reason',),
+)
+ALERTS_TRIGGERED = Counter(
+    'stock_alerts_triggered_total',
+    'Alert events recorded by the ingestion-time alert engine, by rule kind.',
+    labelnames=('kind',),
+)
+ADMISSION_REJECTED = Counter(
+    'stock_admission_rejected_total',
+    'Expensive requests answered with 429, by quota scope and reason (quota or concurrency).',
+    labelnames=('scope', 'reason'),
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'stock_admission_in_flight',
+    'Admitted expensive computations currently running in this process, by kind.',
+    labelnames=('kind',),
+)
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str):
+    """
+    Times a block of code and records it under (pipeline, stage).
+    Exceptions are counted against the stage and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PIPELINE_ERRORS.inc(pipeline=pipeline, stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        PIPELINE_STAGE_SECONDS.observe(elapsed, pipeline=pipeline, stage=stage)
+        logger.debug("%s.%s took %.4fs", pipeline, stage, elapsed)
+
+
+def render_prometheus() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,130 @@
+import cProfile
+import logging
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router
+from .metrics import HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts queries run through a connection.
+    Install it with `connection.execute_wrapper(counter)`.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _view_label(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-request latency and the number of database queries into the
+    histograms exported by the /metrics endpoint.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = _view_label(request)
+        HTTP_REQUEST_SECONDS.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        HTTP_REQUEST_DB_QUERIES.observe(counter.count, view=view)
+        response['X-DB-Query-Count'] = str(counter.count)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes for the replica router. Each request starts with a
+    fresh routing state and reads from the primary when:
+      - it is not a safe method (it is about to write),
+      - the client wrote within the last REPLICA_PIN_SECONDS (pin cookie),
+      - its URL names a ticker that was ingested within that window.
+    A request that wrote sets the pin cookie on its response.
+    """
+    cookie_name = 'db_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or self.cookie_name in request.COOKIES
+        token = db_router.begin(pinned=pinned)
+        try:
+            response = self.get_response(request)
+            if db_router.wrote():
+                response.set_cookie(self.cookie_name, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                    httponly=True, samesite='Lax')
+        finally:
+            db_router.end(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        ticker = view_kwargs.get('ticker')
+        if settings.DATABASE_REPLICAS and ticker:
+            db_router.watch_ticker(ticker)
+        return None
+
+
+class SlowRequestProfilerMiddleware:
+    """
+    Opt-in profiler: when settings.SLOW_REQUEST_PROFILE_SECONDS is set, every
+    request runs under cProfile and requests slower than the threshold have
+    their stats dumped to settings.SLOW_REQUEST_PROFILE_DIR for `snakeviz`/`pstats`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SLOW_REQUEST_PROFILE_SECONDS', None)
+        self.output_dir = Path(getattr(settings, 'SLOW_REQUEST_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+    def __call__(self, request):
+        if self.threshold is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= self.threshold:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            view = _view_label(request).replace(':', '_').replace('/', '_')
+            path = self.output_dir / f"{datetime.now():%Y%m%dT%H%M%S}_{view}_{int(elapsed * 1000)}ms.prof"
+            profiler.dump_stats(path)
+            logger.warning("Slow request %s %s took %.2fs; profile written to %s",
+                           request.method, request.path, elapsed, path)
+        return response
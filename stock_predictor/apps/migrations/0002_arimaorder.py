@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArimaOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('p', models.PositiveSmallIntegerField(help_text='Autoregressive order')),
+                ('d', models.PositiveSmallIntegerField(help_text='Differencing order')),
+                ('q', models.PositiveSmallIntegerField(help_text='Moving-average order')),
+                ('criterion', models.CharField(help_text='Information criterion used to rank candidates (aic/bic)', max_length=3)),
+                ('score', models.FloatField(help_text='Criterion value of the chosen order')),
+                ('params', models.JSONField(default=list, help_text='Latest fitted parameters, used to warm-start the next fit')),
+                ('candidates_evaluated', models.PositiveIntegerField(default=0, help_text='Number of orders fitted during the search')),
+                ('searched_at', models.DateTimeField(help_text='When the order search last ran')),
+                ('stock', models.OneToOneField(help_text='Related stock', on_delete=django.db.models.deletion.CASCADE, related_name='arima_order', to='apps.stock')),
+            ],
+        ),
+    ]
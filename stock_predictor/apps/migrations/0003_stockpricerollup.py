@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0002_arimaorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(choices=[('week', 'Weekly'), ('month', 'Monthly')], help_text='Bar size', max_length=5)),
+                ('period_start', models.DateField(help_text='First calendar day of the week (Monday) or month')),
+                ('period_end', models.DateField(help_text='Last trading day included in the bar')),
+                ('open_price', models.DecimalField(decimal_places=2, help_text='Opening price of the first trading day', max_digits=10)),
+                ('close_price', models.DecimalField(decimal_places=2, help_text='Closing price of the last trading day', max_digits=10)),
+                ('high_price', models.DecimalField(decimal_places=2, help_text='Highest price in the period', max_digits=10)),
+                ('low_price', models.DecimalField(decimal_places=2, help_text='Lowest price in the period', max_digits=10)),
+                ('volume', models.BigIntegerField(help_text='Total trading volume in the period')),
+                ('trading_days', models.PositiveSmallIntegerField(help_text='Number of daily bars aggregated')),
+                ('stock', models.ForeignKey(help_text='Related stock', on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='apps.stock')),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'unique_together': {('stock', 'interval', 'period_start')},
+            },
+        ),
+    ]
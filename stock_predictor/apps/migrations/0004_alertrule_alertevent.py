@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('apps', '0003_stockpricerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('price_above', 'Close crosses above the threshold'), ('price_below', 'Close crosses below the threshold'), ('percent_move', 'Daily close-to-close move of at least threshold %'), ('forecast_divergence', 'Close differs from the stored forecast by at least threshold %')], help_text='Condition checked on each new bar', max_length=20)),
+                ('threshold', models.DecimalField(decimal_places=4, help_text='Price level, or percentage for moves and divergence', max_digits=12)),
+                ('model_type', models.CharField(blank=True, choices=[('ARIMA', 'ARIMA'), ('LSTM', 'Long Short-Term Memory')], help_text='Forecast model compared against (forecast divergence only)', max_length=10)),
+                ('is_active', models.BooleanField(default=True, help_text='Inactive rules are not evaluated')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the rule was created')),
+                ('stock', models.ForeignKey(help_text='Stock the rule watches', on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to='apps.stock')),
+                ('user', models.ForeignKey(help_text='User who owns the rule', on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Date of the bar that triggered the rule')),
+                ('value', models.DecimalField(decimal_places=4, help_text='Observed close, or percentage for moves and divergence', max_digits=12)),
+                ('message', models.CharField(help_text='Human-readable description', max_length=255)),
+                ('triggered_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the alert was recorded')),
+                ('rule', models.ForeignKey(help_text='Rule that fired', on_delete=django.db.models.deletion.CASCADE, related_name='events', to='apps.alertrule')),
+            ],
+            options={
+                'ordering': ['-triggered_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='alertrule',
+            index=models.Index(fields=['stock', 'is_active'], name='alertrule_stock_active_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='alertevent',
+            unique_together={('rule', 'date')},
+        ),
+    ]
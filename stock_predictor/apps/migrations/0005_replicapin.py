@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0004_alertrule_alertevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaPin',
+            fields=[
+                ('ticker', models.CharField(help_text='Pinned stock ticker symbol', max_length=10, primary_key=True, serialize=False)),
+                ('pinned_until', models.DateTimeField(help_text='Reads of the ticker use the primary until this time')),
+            ],
+        ),
+    ]
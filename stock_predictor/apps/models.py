@@ -31,6 +31,34 @@ class StockPrice(models.Model):
         unique_together = ('stock', 'date')
         ordering = ['-date']
 
+class StockPriceRollup(models.Model):
+
+    "weekly or monthly OHLCV bar aggregated from StockPrice, kept up to date by ingestion (see apps/rollups.py)"
+
+    INTERVAL_CHOICES = [
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    ]
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='rollups', help_text="Related stock")
+    interval = models.CharField(max_length=5, choices=INTERVAL_CHOICES, help_text="Bar size")
+    period_start = models.DateField(help_text="First calendar day of the week (Monday) or month")
+    period_end = models.DateField(help_text="Last trading day included in the bar")
+    open_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Opening price of the first trading day")
+    close_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Closing price of the last trading day")
+    high_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Highest price in the period")
+    low_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Lowest price in the period")
+    volume = models.BigIntegerField(help_text="Total trading volume in the period")
+    trading_days = models.PositiveSmallIntegerField(help_text="Number of daily bars aggregated")
+
+    def __str__(self):
+        return f"{self.stock.ticker} - {self.interval} {self.period_start} - Close: {self.close_price}"
+
+    class Meta:
+        unique_together = ('stock', 'interval', 'period_start')
+        ordering = ['-period_start']
+
+
 class Prediction(models.Model):
 
     "stores a price prediction made by machine learning model"
@@ -54,6 +82,39 @@ class Prediction(models.Model):
         ordering = ['-predicted_date']
 
 
+class ArimaOrder(models.Model):
+
+    "ARIMA (p,d,q) chosen by the order search for one stock, reused until the next scheduled search"
+
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, related_name='arima_order', help_text="Related stock")
+    p = models.PositiveSmallIntegerField(help_text="Autoregressive order")
+    d = models.PositiveSmallIntegerField(help_text="Differencing order")
+    q = models.PositiveSmallIntegerField(help_text="Moving-average order")
+    criterion = models.CharField(max_length=3, help_text="Information criterion used to rank candidates (aic/bic)")
+    score = models.FloatField(help_text="Criterion value of the chosen order")
+    params = models.JSONField(default=list, help_text="Latest fitted parameters, used to warm-start the next fit")
+    candidates_evaluated = models.PositiveIntegerField(default=0, help_text="Number of orders fitted during the search")
+    searched_at = models.DateTimeField(help_text="When the order search last ran")
+
+    @property
+    def order(self):
+        return (self.p, self.d, self.q)
+
+    def __str__(self):
+        return f"{self.stock.ticker} - ARIMA{self.order} ({self.criterion}={self.score:.2f})"
+
+
+class ReplicaPin(models.Model):
+
+    "reads for a ticker go to the primary database until `pinned_until` (set by ingestion, see apps/db_router.py)"
+
+    ticker = models.CharField(max_length=10, primary_key=True, help_text="Pinned stock ticker symbol")
+    pinned_until = models.DateTimeField(help_text="Reads of the ticker use the primary until this time")
+
+    def __str__(self):
+        return f"{self.ticker} - pinned until {self.pinned_until}"
+
+
 class Watchlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watchlists', help_text="User who owns the watchlist")
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='watchlisted_by', help_text="Stock added to the watchlist")
@@ -64,4 +125,53 @@ class Watchlist(models.Model):
     
     class Meta:
         unique_together = ('user', 'stock')
-        ordering = ['-added_at']
\ No newline at end of file
+        ordering = ['-added_at']
+
+
+class AlertRule(models.Model):
+
+    "a user's alert condition on a watched stock, evaluated against each newly ingested bar"
+
+    PRICE_ABOVE = 'price_above'
+    PRICE_BELOW = 'price_below'
+    PERCENT_MOVE = 'percent_move'
+    FORECAST_DIVERGENCE = 'forecast_divergence'
+    KIND_CHOICES = [
+        (PRICE_ABOVE, 'Close crosses above the threshold'),
+        (PRICE_BELOW, 'Close crosses below the threshold'),
+        (PERCENT_MOVE, 'Daily close-to-close move of at least threshold %'),
+        (FORECAST_DIVERGENCE, 'Close differs from the stored forecast by at least threshold %'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alert_rules', help_text="User who owns the rule")
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='alert_rules', help_text="Stock the rule watches")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, help_text="Condition checked on each new bar")
+    threshold = models.DecimalField(max_digits=12, decimal_places=4, help_text="Price level, or percentage for moves and divergence")
+    model_type = models.CharField(max_length=10, choices=Prediction.MODEL_CHOICES, blank=True, help_text="Forecast model compared against (forecast divergence only)")
+    is_active = models.BooleanField(default=True, help_text="Inactive rules are not evaluated")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the rule was created")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.stock.ticker} {self.kind} {self.threshold}"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['stock', 'is_active'], name='alertrule_stock_active_idx')]
+
+
+class AlertEvent(models.Model):
+
+    "one firing of an alert rule for one bar; a rule fires at most once per date"
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='events', help_text="Rule that fired")
+    date = models.DateField(help_text="Date of the bar that triggered the rule")
+    value = models.DecimalField(max_digits=12, decimal_places=4, help_text="Observed close, or percentage for moves and divergence")
+    message = models.CharField(max_length=255, help_text="Human-readable description")
+    triggered_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the alert was recorded")
+
+    def __str__(self):
+        return f"{self.rule} on {self.date}"
+
+    class Meta:
+        unique_together = ('rule', 'date')
+        ordering = ['-triggered_at']
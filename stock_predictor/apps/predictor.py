@@ -1,17 +1,32 @@
+import logging
 import pandas as pd
 import numpy as np
 import joblib
 from pathlib import Path
 from datetime import date,timedelta
+from decimal import Decimal
+from numpy.lib.stride_tricks import sliding_window_view
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
 from statsmodels.tsa.arima.model import  ARIMA
 
 # LSTM Imports
+# TensorFlow is imported lazily inside build_lstm_model: serving forecasts from
+# exported weights (see lstm_runtime) must not pay its import cost.
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 
-from.models import Stock, StockPrice
+from.models import ArimaOrder, Prediction, Stock, StockPrice
+from .metrics import stage_timer
+from .signals import forecast_stored
+from .arima_search import select_order
+from .lstm_runtime import export_lstm, load_lstm
+from .artifacts import ArtifactStore
+from .indicators import OHLCV_FIELDS, IndicatorState, compute_indicators
+
+logger = logging.getLogger(__name__)
 
 #define directory to store our trained models
 BASE_DIR = Path(__file__).resolve().parent
@@ -19,51 +34,226 @@ MODEL_DIR = BASE_DIR / "ml_models"
 MODEL_DIR.mkdir(exist_ok=True)
 
 
+def get_artifact_store() -> ArtifactStore:
+    """Versioned, lock-protected store for trained models under MODEL_DIR."""
+    return ArtifactStore(MODEL_DIR, keep=settings.ARTIFACT_KEEP_VERSIONS)
+
+FORECAST_STEPS = 7
+DEFAULT_ARIMA_ORDER = (5, 1, 0) # Used when no order could be selected for a ticker
+
+
+def store_forecast(forecast_result: dict) -> list:
+    """
+    Persists a forecast returned by predict_with_arima/predict_with_lstm as
+    Prediction rows. Earlier predictions for the same stock, model and dates
+    are replaced so each (stock, model, date) keeps only its latest forecast.
+    """
+    stock = Stock.objects.get(ticker=forecast_result["ticker"])
+    model_type = forecast_result["model_type"]
+    rows = [
+        Prediction(
+            stock=stock,
+            model_type=model_type,
+            predicted_date=date.fromisoformat(point["date"]),
+            predicted_price=Decimal(str(point["predicted_price"])),
+        )
+        for point in forecast_result["forecast"]
+    ]
+    with transaction.atomic():
+        Prediction.objects.filter(
+            stock=stock,
+            model_type=model_type,
+            predicted_date__in=[row.predicted_date for row in rows],
+        ).delete()
+        created = Prediction.objects.bulk_create(rows)
+    forecast_stored.send(sender=Prediction, stock=stock, forecast=forecast_result)
+    return created
+
+
+def get_stored_forecast(ticker: str, model_type: str, max_age=None):
+    """
+    Returns the most recent stored forecast for a ticker in the same shape as
+    the predict_with_* functions, or None if there is no forecast newer than
+    `max_age` (defaults to settings.FORECAST_MAX_AGE_HOURS).
+    """
+    ticker = ticker.upper()
+    # store_forecast replaces overlapping dates, so the latest run owns the furthest dates.
+    rows = list(
+        Prediction.objects.filter(stock__ticker=ticker, model_type=model_type)
+        .order_by('-predicted_date')[:FORECAST_STEPS]
+    )
+    return forecast_from_rows(ticker, model_type, rows, max_age)
+
+
+def forecast_from_rows(ticker: str, model_type: str, rows, max_age=None):
+    """
+    Builds the get_stored_forecast payload from the latest FORECAST_STEPS
+    Prediction rows of one stock and model, newest first. Split out so
+    callers that already fetched the rows in bulk can reuse it.
+    """
+    if max_age is None:
+        max_age = timedelta(hours=settings.FORECAST_MAX_AGE_HOURS)
+    if len(rows) < FORECAST_STEPS:
+        return None
+    generated_at = min(row.created_at for row in rows)
+    if generated_at < timezone.now() - max_age:
+        return None
+    return {
+        "ticker": ticker,
+        "model_type": model_type,
+        "generated_at": generated_at.isoformat(),
+        "forecast": [
+            {"date": row.predicted_date.strftime('%Y-%m-%d'), "predicted_price": float(row.predicted_price)}
+            for row in reversed(rows)
+        ]
+    }
+
+
+def get_arima_order(stock, time_series, force: bool = False):
+    """
+    Returns the stored ArimaOrder for a stock, running a new order search
+    (and saving its result) when there is none, when it is older than
+    settings.ARIMA_ORDER_MAX_AGE_DAYS, when it was ranked by a different
+    criterion, or when `force` is set. Returns None if no order could be
+    fitted at all; a stale order is kept if the new search fails.
+    """
+    criterion = settings.ARIMA_ORDER_CRITERION
+    max_age = timedelta(days=settings.ARIMA_ORDER_MAX_AGE_DAYS)
+
+    def fresh_record():
+        record = ArimaOrder.objects.filter(stock=stock).first()
+        if (record and not force and record.criterion == criterion
+                and record.searched_at >= timezone.now() - max_age):
+            return record, True
+        return record, False
+
+    record, fresh = fresh_record()
+    if fresh:
+        return record
+
+    # One search per ticker at a time; whoever waited reuses the result.
+    with get_artifact_store().lock(f"arima_order_{stock.ticker}"):
+        record, fresh = fresh_record()
+        if fresh:
+            return record
+
+        with stage_timer('arima', 'order_search'):
+            best = select_order(time_series.values, criterion=criterion, workers=settings.ARIMA_SEARCH_WORKERS)
+        if best is None:
+            logger.warning("ARIMA order search found no usable order for %s", stock.ticker)
+            return record
+
+        p, d, q = best["order"]
+        record, _ = ArimaOrder.objects.update_or_create(stock=stock, defaults={
+            "p": p,
+            "d": d,
+            "q": q,
+            "criterion": criterion,
+            "score": best["score"],
+            "params": best["params"],
+            "candidates_evaluated": best["candidates_evaluated"],
+            "searched_at": timezone.now(),
+        })
+    logger.info("Selected ARIMA%s for %s after %d fits", record.order, stock.ticker, record.candidates_evaluated)
+    return record
+
+
 def predict_with_arima(ticker: str) -> dict:
     """
     Trains an ARIMA model on the last 60 days of stock data,
     saves the model, and predicts the next 7 days.
+    The (p,d,q) order comes from `get_arima_order`, so the order search
+    only runs when the stored order for the ticker is missing or stale.
+    The saved model is reused while no new data has arrived, and fitting
+    runs under the artifact lock so concurrent requests fit only once.
     """
     ticker = ticker.upper()
     try:
-        stock = Stock.objects.get(ticker=ticker)
-        end_date = date.today()
-        start_date = end_date - timedelta(days=60)
-        prices_qs = StockPrice.objects.filter(
-            stock=stock,
-            date__range=[start_date, end_date]
-        ).order_by('date')
+        with stage_timer('arima', 'query'):
+            stock = Stock.objects.get(ticker=ticker)
+            end_date = date.today()
+            start_date = end_date - timedelta(days=60)
+            prices_qs = StockPrice.objects.filter(
+                stock=stock,
+                date__range=[start_date, end_date]
+            ).order_by('date')
 
-        if prices_qs.count() < 30:
-            return {"error": "Not enough data to train the model."}
+            if prices_qs.count() < 30:
+                return {"error": "Not enough data to train the model."}
+
+            data = list(prices_qs.values('date', 'close_price'))
 
         # Convert queryset to DataFrame
-        data = list(prices_qs.values('date', 'close_price'))
-        df = pd.DataFrame(data).set_index('date')
+        with stage_timer('arima', 'dataframe'):
+            df = pd.DataFrame(data).set_index('date')
 
-        # Ensure numeric dtype and handle missing values
-        df['close_price'] = pd.to_numeric(df['close_price'], errors='coerce')
-        df['close_price'].fillna(method='ffill', inplace=True)
+            # Ensure numeric dtype and handle missing values
+            df['close_price'] = pd.to_numeric(df['close_price'], errors='coerce')
+            df['close_price'] = df['close_price'].ffill()
 
-        time_series = df['close_price'].astype(float)
+            time_series = df['close_price'].astype(float)
 
     except Stock.DoesNotExist:
         return {"error": f"Stock with ticker {ticker} does not exist."}
     except Exception as e:
+        logger.exception("Error fetching data for ARIMA (%s)", ticker)
         return {"error": f"Error fetching data for ARIMA: {e}"}
 
     # Train and forecast
     try:
-        model = ARIMA(time_series, order=(5, 1, 0))
-        model_fit = model.fit()
+        order_record = get_arima_order(stock, time_series)
+        order = order_record.order if order_record else DEFAULT_ARIMA_ORDER
+        store = get_artifact_store()
+        artifact_name = f"arima_{ticker}"
+        data_end_date = time_series.index[-1].isoformat()
+
+        def load_current():
+            artifact = store.current(artifact_name)
+            if artifact is None:
+                return None
+            if (artifact.metadata.get('data_end_date') != data_end_date
+                    or artifact.metadata.get('rows') != len(time_series)
+                    or artifact.metadata.get('order') != list(order)):
+                return None
+            with stage_timer('arima', 'load'):
+                return joblib.load(artifact.file("model.pkl"))
 
-        model_path = MODEL_DIR / f"{ticker}_arima_model.pkl"
-        joblib.dump(model_fit, model_path)
+        model_fit = load_current()
+        if model_fit is None:
+            with store.lock(artifact_name):
+                # Another request or process may have fitted this exact model while we waited.
+                model_fit = load_current()
+                if model_fit is None:
+                    with stage_timer('arima', 'fit'):
+                        model = ARIMA(time_series, order=order)
+                        # Warm-start from the stored parameters; they are close to the optimum on overlapping data.
+                        start_params = order_record.params if order_record else None
+                        if start_params is not None and len(start_params) != len(model.param_names):
+                            start_params = None
+                        model_fit = model.fit(start_params=start_params)
+                    if order_record is not None:
+                        # Keep the warm start close to the newest data.
+                        ArimaOrder.objects.filter(pk=order_record.pk).update(
+                            params=[float(value) for value in model_fit.params]
+                        )
 
-        forecast = model_fit.forecast(steps=7)
+                    with stage_timer('arima', 'save'):
+                        store.save(
+                            artifact_name,
+                            {"model.pkl": lambda path: joblib.dump(model_fit, path, compress=3)},
+                            metadata={
+                                "order": list(order),
+                                "data_end_date": data_end_date,
+                                "rows": len(time_series),
+                                "trained_at": timezone.now().isoformat(),
+                            },
+                        )
+
+        with stage_timer('arima', 'forecast'):
+            forecast = model_fit.forecast(steps=FORECAST_STEPS)
 
         last_date = time_series.index[-1]
-        forecast_dates = [last_date + timedelta(days=i) for i in range(1, 8)]
+        forecast_dates = [last_date + timedelta(days=i) for i in range(1, FORECAST_STEPS + 1)]
 
         forecast_result = {
             "ticker": ticker,
@@ -79,53 +269,39 @@ def predict_with_arima(ticker: str) -> dict:
         return forecast_result
 
     except Exception as e:
+        logger.exception("Error training/predicting with ARIMA (%s)", ticker)
         return {"error": f"Error training/predicting with ARIMA: {e}"}
 
 
 
-def predict_with_lstm(ticker: str) -> dict:
+PREDICTION_DAYS = 60 # Use last 60 days to predict
+
+
+def build_lstm_windows(scaled_data, prediction_days: int = PREDICTION_DAYS):
     """
-    Trains an LSTM model on historical stock data to predict the next 7 days.
+    Slices a scaled (n, features) series into overlapping training windows.
+    Returns X with shape (samples, prediction_days, features) and y with shape
+    (samples,), where y is the next value of the first column (the close).
     """
-    ticker = ticker.upper()
-    model_path = MODEL_DIR / f"lstm_{ticker}.h5"
-    
-    # --- 1. Fetch Data ---
-    try:
-        stock = Stock.objects.get(ticker=ticker)
-        # LSTMs benefit from more data, let's try to get up to 3 years.
-        end_date = date.today()
-        start_date = end_date - timedelta(days=365 * 3)
-        prices_qs = StockPrice.objects.filter(stock=stock, date__gte=start_date).order_by('date')
-        
-        if prices_qs.count() < 60: # We need at least 60 days for the sequence
-            return {"error": f"Not enough historical data for LSTM. Need at least 60 days, found {prices_qs.count()}."}
-        
-        df = pd.DataFrame(list(prices_qs.values('date', 'close_price')))
-        df.set_index('date', inplace=True)
+    scaled_data = np.asarray(scaled_data)
+    if len(scaled_data) <= prediction_days:
+        return np.empty((0, prediction_days, scaled_data.shape[1])), np.empty((0,))
+    # (samples, features, window) view over the history, without copying row by row.
+    windows = sliding_window_view(scaled_data[:-1], prediction_days, axis=0)
+    X_train = np.ascontiguousarray(windows.transpose(0, 2, 1))
+    y_train = scaled_data[prediction_days:, 0].copy()
+    return X_train, y_train
 
-    except Stock.DoesNotExist:
-        return {"error": f"Stock with ticker {ticker} not found in the database."}
-    
-    # --- 2. Preprocess Data ---
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(df['close_price'].values.reshape(-1,1))
-    
-    prediction_days = 60 # Use last 60 days to predict
-    
-    X_train, y_train = [], []
-    for x in range(prediction_days, len(scaled_data)):
-        X_train.append(scaled_data[x-prediction_days:x, 0])
-        y_train.append(scaled_data[x, 0])
-        
-    X_train, y_train = np.array(X_train), np.array(y_train)
-    X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
 
-    # --- 3. Build and Train LSTM Model ---
-    # NOTE: Training is computationally expensive and is done on every API call.
-    # In production, this should be an offline process.
+def build_lstm_model(prediction_days: int = PREDICTION_DAYS, n_features: int = 1):
+    """
+    Builds and compiles the two-layer LSTM network used for forecasting.
+    """
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
     model = Sequential([
-        LSTM(units=50, return_sequences=True, input_shape=(X_train.shape[1], 1)),
+        LSTM(units=50, return_sequences=True, input_shape=(prediction_days, n_features)),
         Dropout(0.2),
         LSTM(units=50, return_sequences=False),
         Dropout(0.2),
@@ -133,26 +309,303 @@ def predict_with_lstm(ticker: str) -> dict:
     ])
     
     model.compile(optimizer='adam', loss='mean_squared_error')
-    model.fit(X_train, y_train, epochs=25, batch_size=32, verbose=0) # verbose=0 to avoid printing logs
-    model.save(model_path)
-    
-    # --- 4. Generate 7-Day Forecast ---
-    last_60_days = scaled_data[-60:]
-    X_test = np.reshape(last_60_days, (1, prediction_days, 1))
+    return model
+
+
+def forecast_lstm(model, scaled_data, scaler, steps: int = 7) -> list:
+    """
+    Rolls the model forward `steps` days, feeding each prediction back into
+    the input window. Returns prices in the original (unscaled) units.
+    """
+    prediction_days = model.input_shape[1]
+    X_test = np.reshape(scaled_data[-prediction_days:], (1, prediction_days, 1))
     
     predicted_prices = []
     
-    for _ in range(7):
-        predicted_stock_price = model.predict(X_test)
+    for _ in range(steps):
+        predicted_stock_price = model.predict(X_test, verbose=0)
         predicted_prices.append(scaler.inverse_transform(predicted_stock_price)[0][0])
         
         # Update X_test to include the new prediction for the next loop
         new_sequence = np.append(X_test[0][1:], predicted_stock_price)
         X_test = np.reshape(new_sequence, (1, prediction_days, 1))
+    return predicted_prices
+
+
+def _add_indicator_features(df, features):
+    """
+    Appends the requested technical indicators as columns next to close_price
+    and drops the warm-up rows where any of them is still undefined. Also
+    returns the IndicatorState at the last row so forecasts can extend the
+    indicators with each predicted close.
+    """
+    arrays = {
+        'open': df['open_price'].astype(float).to_numpy(),
+        'high': df['high_price'].astype(float).to_numpy(),
+        'low': df['low_price'].astype(float).to_numpy(),
+        'close': df['close_price'].astype(float).to_numpy(),
+        'volume': df['volume'].astype(float).to_numpy(),
+    }
+    computed = compute_indicators(arrays)
+    state = IndicatorState.from_history(df.index.to_numpy(), arrays, computed)
+    frame = df[['close_price', 'volume']].astype(float)
+    for name in features:
+        frame[name] = computed[name]
+    return frame.dropna(), state
+
+
+def _forecast_with_indicators(runtime, scaled_data, state, features, last_volume, steps):
+    """
+    Multi-feature roll-forward: each predicted close is pushed through the
+    incremental indicator state to produce the next input row.
+    """
+    window = runtime.metadata['window']
+    sequence = np.asarray(scaled_data[-window:], dtype=np.float64)
+    predicted_prices = []
+    for _ in range(steps):
+        value = runtime.predict(sequence[np.newaxis])[0, 0]
+        price = float((value - runtime.scaler_min[0]) / runtime.scaler_scale[0])
+        predicted_prices.append(price)
+        latest = state.update(None, price, price, price, last_volume)
+        next_row = runtime.transform([price] + [latest[name] for name in features])
+        sequence = np.vstack([sequence[1:], next_row])
+    return predicted_prices
+
+
+def predict_with_lstm(ticker: str) -> dict:
+    """
+    Trains an LSTM model on historical stock data to predict the next 7 days.
+    Inputs are the close plus any indicators listed in settings.LSTM_FEATURES.
+    If the weights exported by the last training run were fitted on exactly
+    the data currently in the DB, they are reused through the NumPy runtime
+    and nothing is retrained. Otherwise the previous version is fine-tuned on
+    recent data (see `_fine_tune_lstm`), with a full retrain as fallback. Training holds the ticker's artifact lock, so
+    concurrent callers wait and then reuse the model just trained. When settings.LSTM_GLOBAL_MODEL is on and a
+    shared cross-ticker model has been trained (see `train_global_lstm`),
+    that model is used instead and nothing is trained per ticker.
+    """
+    ticker = ticker.upper()
+
+    from .global_lstm import is_enabled, predict_many_with_global_lstm
+    if is_enabled():
+        return predict_many_with_global_lstm([ticker])[ticker]
+
+    store = get_artifact_store()
+    artifact_name = f"lstm_{ticker}"
+    features = list(settings.LSTM_FEATURES)
+    columns = ['close_price'] + features
+    
+    # --- 1. Fetch Data ---
+    try:
+        with stage_timer('lstm', 'query'):
+            stock = Stock.objects.get(ticker=ticker)
+            # LSTMs benefit from more data, let's try to get up to 3 years.
+            end_date = date.today()
+            start_date = end_date - timedelta(days=365 * 3)
+            prices_qs = StockPrice.objects.filter(stock=stock, date__gte=start_date).order_by('date')
+            rows = list(prices_qs.values(*OHLCV_FIELDS) if features else prices_qs.values('date', 'close_price'))
+        
+        with stage_timer('lstm', 'dataframe'):
+            df = pd.DataFrame(rows)
+            if rows:
+                df.set_index('date', inplace=True)
+            state = None
+            if features and rows:
+                df, state = _add_indicator_features(df, features)
+
+        if len(df) < 60: # We need at least 60 days for the sequence
+            return {"error": f"Not enough historical data for LSTM. Need at least 60 days, found {len(df)}."}
+
+    except Stock.DoesNotExist:
+        return {"error": f"Stock with ticker {ticker} not found in the database."}
 
-    # --- 5. Format Output ---
     last_date = df.index[-1]
-    forecast_dates = [last_date + timedelta(days=i) for i in range(1, 8)]
+
+    def forecast(runtime, scaled_data):
+        if not features:
+            return runtime.forecast(scaled_data, steps=FORECAST_STEPS)
+        return _forecast_with_indicators(
+            runtime, scaled_data, state, features, float(df['volume'].iloc[-1]), FORECAST_STEPS
+        )
+
+    def reuse_current():
+        artifact = store.current(artifact_name)
+        if artifact is None:
+            return None
+        if (artifact.metadata.get('data_end_date') != last_date.isoformat()
+                or artifact.metadata.get('rows') != len(df)
+                or artifact.metadata.get('features', []) != features):
+            return None
+        runtime = load_lstm(artifact.file("model.npz"), artifact.name)
+        with stage_timer('lstm', 'predict'):
+            scaled_data = runtime.transform(df[columns].astype(float).values)
+            predicted_prices = forecast(runtime, scaled_data)
+        return _format_lstm_forecast(ticker, last_date, predicted_prices)
+
+    # --- 2. Reuse the exported model if no new data has arrived since it was trained ---
+    result = reuse_current()
+    if result is not None:
+        return result
+
+    with store.lock(artifact_name):
+        # Another request or process may have trained this exact model while we waited.
+        result = reuse_current()
+        if result is not None:
+            return result
+
+        # --- 3. Train: fine-tune yesterday's model if possible, else train from scratch ---
+        # NOTE: Training is computationally expensive and is done whenever new data has arrived.
+        # In production, this should be an offline process.
+        values = df[columns].astype(float).values
+        trained = None
+        previous = store.current(artifact_name)
+        if settings.LSTM_FINE_TUNE and previous is not None:
+            trained = _fine_tune_lstm(ticker, previous, values, features)
+        if trained is None:
+            trained = _train_lstm_full(values)
+        model, scaler, scaled_data, training = trained
+
+        with stage_timer('lstm', 'save'):
+            metadata = {
+                "window": PREDICTION_DAYS,
+                "features": features,
+                "data_end_date": last_date.isoformat(),
+                "rows": len(df),
+                **training,
+                "trained_at": timezone.now().isoformat(),
+            }
+            artifact = store.save(artifact_name, {
+                "model.keras": model.save,
+                "model.npz": lambda path: export_lstm(model, path, scaler=scaler, metadata=metadata),
+            }, metadata=metadata)
+    
+    # --- 5. Generate 7-Day Forecast ---
+    # The exported NumPy runtime avoids 7 Keras predict() round trips.
+    with stage_timer('lstm', 'predict'):
+        predicted_prices = forecast(load_lstm(artifact.file("model.npz"), artifact.name), scaled_data)
+
+    return _format_lstm_forecast(ticker, last_date, predicted_prices)
+
+
+def _train_lstm_full(values):
+    """
+    Fits a new scaler and a freshly initialised model on the whole history.
+    Returns (model, scaler, scaled_data, training metadata).
+    """
+    with stage_timer('lstm', 'scale'):
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled_data = scaler.fit_transform(values)
+
+    with stage_timer('lstm', 'windows'):
+        X_train, y_train = build_lstm_windows(scaled_data, PREDICTION_DAYS)
+
+    epochs, batch_size = 25, 32
+    with stage_timer('lstm', 'train'):
+        model = build_lstm_model(X_train.shape[1], n_features=values.shape[1])
+        model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, verbose=0) # verbose=0 to avoid printing logs
+    return model, scaler, scaled_data, {
+        "mode": "full",
+        "epochs": epochs,
+        "batch_size": batch_size,
+        "samples": len(X_train),
+        "fine_tunes_since_full": 0,
+        "reference_val_loss": None,
+        "val_loss": None,
+    }
+
+
+def _fine_tune_lstm(ticker: str, previous, values, features):
+    """
+    Warm-starts from the previous version of a ticker's model: keeps its
+    scaler and weights and trains only on the windows of the last
+    LSTM_FINE_TUNE_DAYS days, holding out the newest of them for validation
+    and stopping early once validation loss stops improving. The held-out
+    windows are the new data that triggered training, so once the checks
+    below pass the kept weights are refit for LSTM_FINE_TUNE_REFIT_EPOCHS
+    over every recent window, held-out ones included.
+
+    Returns None, meaning "retrain from scratch", when the previous version
+    has a different shape or features, has already been fine-tuned
+    LSTM_MAX_FINE_TUNES times in a row, when recent prices fall outside its
+    scaler's range by more than LSTM_FINE_TUNE_RANGE_MARGIN, or when the
+    validation loss ends up above LSTM_FINE_TUNE_MAX_DEGRADATION times the
+    reference loss (the first validation loss measured after the last full
+    retrain).
+    """
+    meta = previous.metadata
+    if (meta.get('window') != PREDICTION_DAYS or meta.get('features', []) != features
+            or not previous.file("model.keras").exists()):
+        return None
+    fine_tunes = meta.get('fine_tunes_since_full', 0)
+    if fine_tunes >= settings.LSTM_MAX_FINE_TUNES:
+        logger.info("LSTM %s: %s fine-tunes since the last full retrain; retraining", ticker, fine_tunes)
+        return None
+
+    runtime = load_lstm(previous.file("model.npz"), previous.name)
+    scaled_data = runtime.transform(values)
+    recent = scaled_data[-(settings.LSTM_FINE_TUNE_DAYS + PREDICTION_DAYS):]
+    margin = settings.LSTM_FINE_TUNE_RANGE_MARGIN
+    if recent.min() < -margin or recent.max() > 1 + margin:
+        logger.info("LSTM %s: prices left the scaler's range; retraining", ticker)
+        return None
+
+    with stage_timer('lstm', 'windows'):
+        X, y = build_lstm_windows(recent, PREDICTION_DAYS)
+    n_val = max(1, int(len(X) * settings.LSTM_FINE_TUNE_VALIDATION))
+    if len(X) - n_val < 1:
+        return None
+    X_train, y_train, X_val, y_val = X[:-n_val], y[:-n_val], X[-n_val:], y[-n_val:]
+
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.models import load_model
+
+    batch_size = 32
+    with stage_timer('lstm', 'fine_tune'):
+        model = load_model(previous.file("model.keras"))
+        initial_weights = model.get_weights()
+        initial_loss = float(model.evaluate(X_val, y_val, batch_size=batch_size, verbose=0))
+        history = model.fit(
+            X_train, y_train,
+            validation_data=(X_val, y_val),
+            epochs=settings.LSTM_FINE_TUNE_EPOCHS,
+            batch_size=batch_size,
+            callbacks=[EarlyStopping(monitor='val_loss', patience=settings.LSTM_FINE_TUNE_PATIENCE,
+                                     restore_best_weights=True)],
+            verbose=0,
+        )
+        val_loss = min(history.history['val_loss'])
+        if initial_loss <= val_loss:
+            # Fine-tuning did not help on held-out days; keep yesterday's weights.
+            model.set_weights(initial_weights)
+            val_loss = initial_loss
+
+    reference = meta.get('reference_val_loss') or initial_loss
+    if val_loss > reference * settings.LSTM_FINE_TUNE_MAX_DEGRADATION:
+        logger.info("LSTM %s: validation loss %.3g degraded past %.3g; retraining",
+                    ticker, val_loss, reference * settings.LSTM_FINE_TUNE_MAX_DEGRADATION)
+        return None
+
+    refit_epochs = settings.LSTM_FINE_TUNE_REFIT_EPOCHS
+    if refit_epochs:
+        with stage_timer('lstm', 'refit'):
+            model.fit(X, y, epochs=refit_epochs, batch_size=batch_size, verbose=0)
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaler.min_, scaler.scale_ = runtime.scaler_min, runtime.scaler_scale
+    return model, scaler, scaled_data, {
+        "mode": "fine_tune",
+        "epochs": len(history.history['loss']),
+        "refit_epochs": refit_epochs,
+        "batch_size": batch_size,
+        "samples": len(X),
+        "fine_tunes_since_full": fine_tunes + 1,
+        "reference_val_loss": reference,
+        "val_loss": val_loss,
+    }
+
+
+def _format_lstm_forecast(ticker: str, last_date, predicted_prices) -> dict:
+    forecast_dates = [last_date + timedelta(days=i) for i in range(1, FORECAST_STEPS + 1)]
     
     forecast_result = {
         "ticker": ticker,
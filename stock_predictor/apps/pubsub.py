@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .metrics import STREAM_DROPPED, STREAM_EVENTS
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL = "stock_predictor:events"
+
+
+def format_event(event: str, data: dict) -> bytes:
+    """Encodes one server-sent event. Done once per publish, not once per subscriber."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n".encode()
+
+
+class Subscription:
+    """
+    One connection's view of the broker: a bounded queue of encoded events
+    for the tickers it follows. Lives on the event loop that created it.
+
+    Backpressure: when the queue is full the oldest event is dropped and
+    `dropped` is bumped so the stream can tell the client to resync. A
+    subscriber that drops more than `max_dropped` events is closed.
+    """
+
+    def __init__(self, broker, tickers, loop, maxsize: int, max_dropped: int):
+        self.broker = broker
+        self.tickers = frozenset(tickers)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.total_dropped = 0
+        self.closed = False
+
+    def offer(self, message: bytes):
+        """Enqueues without ever blocking the publisher. Must run on `self.loop`."""
+        if self.closed:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.total_dropped += 1
+            STREAM_DROPPED.inc(reason='queue_full')
+            if self.total_dropped > self.max_dropped:
+                self.close()
+                STREAM_DROPPED.inc(reason='slow_consumer')
+                return
+        self.queue.put_nowait(message)
+
+    def close(self):
+        """Stops delivery and wakes the reader with the None sentinel."""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        """Next encoded event, or None once the subscription has been closed."""
+        return await self.queue.get()
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class LocalBroker:
+    """
+    In-process pub/sub keyed by ticker. Publishers may run in any thread
+    (ingestion commands, sync views); delivery is handed to each
+    subscriber's event loop with one call_soon_threadsafe per loop, so the
+    cost of a publish does not grow with the number of threads involved.
+    """
+
+    def __init__(self, queue_size: int = 100, max_dropped: int = 1000):
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, tickers) -> Subscription:
+        """Registers a subscription; call from the event loop that will read it."""
+        subscription = Subscription(
+            self, tickers, asyncio.get_running_loop(), self.queue_size, self.max_dropped
+        )
+        with self._lock:
+            for ticker in subscription.tickers:
+                self._subscribers.setdefault(ticker, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for ticker in subscription.tickers:
+                subscribers = self._subscribers.get(ticker)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[ticker]
+
+    def subscriber_count(self, ticker: str = None) -> int:
+        with self._lock:
+            if ticker is not None:
+                return len(self._subscribers.get(ticker, ()))
+            return len({sub for subscribers in self._subscribers.values() for sub in subscribers})
+
+    def has_subscribers(self, ticker: str) -> bool:
+        """Whether publishing an event for `ticker` can reach anyone."""
+        return self.subscriber_count(ticker) > 0
+
+    def publish(self, ticker: str, event: str, data: dict):
+        STREAM_EVENTS.inc(event=event)
+        self.deliver(ticker, format_event(event, data))
+
+    def deliver(self, ticker: str, message: bytes):
+        """Fans an encoded event out to this process's subscribers of `ticker`."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(ticker, ()))
+        by_loop = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_offer_all, group, message)
+            except RuntimeError:
+                # The loop has shut down; its connections are gone with it.
+                for subscription in group:
+                    self.unsubscribe(subscription)
+
+
+def _offer_all(subscriptions, message: bytes):
+    for subscription in subscriptions:
+        subscription.offer(message)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes through a Redis channel so every process (each ASGI worker)
+    receives every event; each process then fans out locally. One listener
+    thread per process, started with the first subscription.
+    """
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self, tickers) -> Subscription:
+        self._ensure_listener()
+        return super().subscribe(tickers)
+
+    def has_subscribers(self, ticker: str) -> bool:
+        # Subscribers may be connected to any process.
+        return True
+
+    def publish(self, ticker: str, event: str, data: dict):
+        STREAM_EVENTS.inc(event=event)
+        message = format_event(event, data)
+        try:
+            self._redis.publish(REDIS_CHANNEL, json.dumps({"ticker": ticker, "message": message.decode()}))
+        except Exception:
+            # Redis being down must not break ingestion; at least serve this process.
+            logger.exception("Could not publish %s event for %s to Redis", event, ticker)
+            self.deliver(ticker, message)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="stream-redis-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_CHANNEL)
+                backoff = 1
+                for item in pubsub.listen():
+                    payload = json.loads(item["data"])
+                    self.deliver(payload["ticker"], payload["message"].encode())
+            except Exception:
+                logger.exception("Redis event listener failed; reconnecting in %ss", backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> LocalBroker:
+    """
+    The process-wide broker selected by settings.STREAM_BACKEND ("memory" or
+    "redis"). The memory broker only reaches streams served by this process,
+    so events published elsewhere (fetch_history, precompute_forecasts, other
+    workers) are lost; a warning says so when it is created.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            options = {
+                "queue_size": settings.STREAM_QUEUE_SIZE,
+                "max_dropped": settings.STREAM_MAX_DROPPED_EVENTS,
+            }
+            if settings.STREAM_BACKEND == 'redis':
+                _broker = RedisBroker(settings.STREAM_REDIS_URL, **options)
+            else:
+                logger.warning(
+                    "STREAM_BACKEND is 'memory': streams only receive events published by this process, "
+                    "not by fetch_history or other workers. Set REDIS_URL or STREAM_BACKEND=redis to relay them."
+                )
+                _broker = LocalBroker(**options)
+        return _broker
+
+
+def has_subscribers(ticker: str) -> bool:
+    """
+    False when nobody can receive events for `ticker`, so publishers can
+    skip building them: with the memory backend, when this process has no
+    stream open for it (or no broker at all).
+    """
+    broker = _broker
+    if broker is None:
+        return settings.STREAM_BACKEND == 'redis'
+    return broker.has_subscribers(ticker.upper())
+
+
+def publish(ticker: str, event: str, data: dict):
+    get_broker().publish(ticker.upper(), event, data)
@@ -0,0 +1,127 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from .metrics import stage_timer
+from .models import StockPrice, StockPriceRollup
+from .signals import prices_ingested
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = [choice for choice, _ in StockPriceRollup.INTERVAL_CHOICES]
+ROLLUP_FIELDS = ['period_end', 'open_price', 'close_price', 'high_price', 'low_price', 'volume', 'trading_days']
+
+
+def period_start(day, interval: str):
+    """First calendar day of the week (Monday) or month containing `day`."""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown rollup interval {interval!r}.")
+
+
+def period_end(start, interval: str):
+    """Last calendar day of the period beginning at `start`."""
+    if interval == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def aggregate(stock, rows, interval: str) -> list:
+    """
+    Folds daily rows (sorted by date) into unsaved StockPriceRollup objects:
+    first open, max high, min low, last close, summed volume.
+    """
+    bars = []
+    current = None
+    for row in rows:
+        start = period_start(row['date'], interval)
+        if current is None or current.period_start != start:
+            current = StockPriceRollup(
+                stock=stock, interval=interval, period_start=start, period_end=row['date'],
+                open_price=row['open_price'], close_price=row['close_price'],
+                high_price=row['high_price'], low_price=row['low_price'],
+                volume=row['volume'], trading_days=1,
+            )
+            bars.append(current)
+            continue
+        current.period_end = row['date']
+        current.close_price = row['close_price']
+        current.high_price = max(current.high_price, row['high_price'])
+        current.low_price = min(current.low_price, row['low_price'])
+        current.volume += row['volume']
+        current.trading_days += 1
+    return bars
+
+
+def _daily_rows(stock, start=None, end=None):
+    prices = StockPrice.objects.filter(stock=stock)
+    if start is not None:
+        prices = prices.filter(date__range=[start, end])
+    return prices.order_by('date').values('date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+
+
+def _upsert(bars):
+    StockPriceRollup.objects.bulk_create(
+        bars,
+        update_conflicts=True,
+        unique_fields=['stock', 'interval', 'period_start'],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+def rebuild_rollups(stock) -> int:
+    """Recomputes every weekly and monthly bar of a stock from its daily rows. Returns the bar count."""
+    with stage_timer('rollups', 'rebuild'):
+        rows = list(_daily_rows(stock))
+        bars = [bar for interval in INTERVALS for bar in aggregate(stock, rows, interval)]
+        with transaction.atomic():
+            StockPriceRollup.objects.filter(stock=stock).delete()
+            StockPriceRollup.objects.bulk_create(bars)
+    return len(bars)
+
+
+def update_rollups(stock, dates) -> int:
+    """
+    Recomputes only the weekly and monthly bars whose period contains one of
+    `dates`, reading just the daily rows of those periods. Returns the number
+    of bars written.
+    """
+    if not dates:
+        return 0
+    written = 0
+    with stage_timer('rollups', 'update'):
+        with transaction.atomic():
+            for interval in INTERVALS:
+                starts = sorted({period_start(day, interval) for day in dates})
+                rows = list(_daily_rows(stock, starts[0], period_end(starts[-1], interval)))
+                wanted = set(starts)
+                bars = [bar for bar in aggregate(stock, rows, interval) if bar.period_start in wanted]
+                _upsert(bars)
+                written += len(bars)
+    return written
+
+
+def ensure_rollups(stock) -> bool:
+    """Builds the rollups of a stock that has daily data but none yet (e.g. ingested before rollups existed)."""
+    if StockPriceRollup.objects.filter(stock=stock).exists():
+        return False
+    if not StockPrice.objects.filter(stock=stock).exists():
+        return False
+    rebuild_rollups(stock)
+    return True
+
+
+@receiver(prices_ingested)
+def update_rollups_on_ingest(sender, stock, dates, **kwargs):
+    """Keeps the weekly/monthly bars in step with newly ingested daily rows."""
+    try:
+        if not ensure_rollups(stock):
+            update_rollups(stock, dates)
+    except Exception:
+        # Rollups are derived data; `build_rollups` can always rebuild them.
+        logger.exception("Could not update rollups for %s", stock.ticker)
@@ -0,0 +1,208 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Stock
+
+VERSION_KEY = "search_index_version"
+# How often a process checks the shared version, and the longest an index is
+# trusted at all (bulk_create/update() do not send the signals that bump it).
+VERSION_CHECK_SECONDS = 1.0
+MAX_INDEX_AGE_SECONDS = 300.0
+MAX_LIMIT = 50
+
+# Match kinds, best first; results are ordered by kind, then by ticker length and ticker.
+EXACT, TICKER_PREFIX, NAME_PREFIX, FUZZY = range(4)
+MATCH_NAMES = {EXACT: 'exact', TICKER_PREFIX: 'ticker_prefix', NAME_PREFIX: 'name_prefix', FUZZY: 'fuzzy'}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    """
+    Immutable in-memory search index over (ticker, company_name, sector).
+
+    Rows are stored in rank order (shorter tickers first, then
+    alphabetical), so "best k matches" is "first k hits".
+    Prefix matching uses sorted key arrays and binary search: one sorted
+    array of tickers and one of (company name word, row) pairs, so a prefix
+    is two bisects plus a NumPy slice, turned into a boolean hit mask that
+    dedups, combines with sector masks and yields hits in rank order. Fuzzy matching (typos, infixes) scores trigram
+    overlap with np.bincount over trigram posting lists.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (len(row[1]), row[1].upper()))
+        self.ids = [row[0] for row in rows]
+        self.tickers = [row[1].upper() for row in rows]
+        self.names = [row[2] or '' for row in rows]
+        self.sectors = [row[3] or '' for row in rows]
+        self.size = len(rows)
+
+        order = sorted(range(self.size), key=self.tickers.__getitem__)
+        self.ticker_keys = [self.tickers[i] for i in order]
+        self.ticker_rows = np.array(order, dtype=np.int64)
+
+        words = sorted(
+            (word, i) for i, name in enumerate(self.names) for word in set(_WORD.findall(name.lower()))
+        )
+        self.word_keys = [word for word, _ in words]
+        self.word_rows = np.array([i for _, i in words], dtype=np.int64)
+
+        postings = {}
+        for i, (ticker, name) in enumerate(zip(self.tickers, self.names)):
+            for gram in _trigrams(ticker) | _trigrams(name):
+                postings.setdefault(gram, []).append(i)
+        self.trigrams = {gram: np.array(rows_, dtype=np.int64) for gram, rows_ in postings.items()}
+        self.gram_counts = np.zeros(self.size, dtype=np.int64)
+        for rows_ in self.trigrams.values():
+            self.gram_counts[rows_] += 1
+
+        sectors = np.array([sector.lower() for sector in self.sectors], dtype=object)
+        self.sector_masks = {sector: sectors == sector for sector in set(sectors)}
+
+    @classmethod
+    def from_db(cls):
+        return cls(Stock.objects.values_list('id', 'ticker', 'company_name', 'sector').iterator())
+
+    @staticmethod
+    def _prefix(keys, rows, prefix: str) -> np.ndarray:
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\uffff', lo=start)
+        return rows[start:end]
+
+    def _hit_mask(self, rows: np.ndarray) -> np.ndarray:
+        # A boolean mask over all rows dedups hits and keeps them in rank order in one pass.
+        hits = np.zeros(self.size, dtype=bool)
+        hits[rows] = True
+        return hits
+
+    def _fuzzy(self, query: str, mask, exclude, limit: int) -> list:
+        query_grams = _trigrams(query)
+        grams = [self.trigrams[gram] for gram in query_grams if gram in self.trigrams]
+        if not grams:
+            return []
+        hits = np.bincount(np.concatenate(grams), minlength=self.size)
+        # Dice coefficient between the query's trigrams and each symbol's.
+        scores = 2.0 * hits / (len(query_grams) + self.gram_counts)
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+        k = min(limit + len(exclude), self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(int(i), float(scores[i])) for i in top if scores[i] >= 0.3 and i not in exclude][:limit]
+
+    def search(self, query: str, sector: str = None, limit: int = 10, fuzzy: bool = True) -> list:
+        """
+        Returns up to `limit` matches as dicts (id, ticker, company_name,
+        sector, match). Exact ticker first, then ticker prefixes, then
+        company-name word prefixes; fuzzy matches fill any remaining slots.
+        Within a kind, shorter tickers come first.
+        """
+        query = query.strip()
+        mask = None
+        if sector:
+            mask = self.sector_masks.get(sector.lower())
+            if mask is None:
+                return []
+        found = {}
+
+        def add(hits, kind):
+            if mask is not None:
+                hits &= mask
+            for i in np.flatnonzero(hits)[:limit + len(found)].tolist():
+                found.setdefault(i, kind)
+
+        if query:
+            upper = query.upper()
+            ticker_hits = self._prefix(self.ticker_keys, self.ticker_rows, upper)
+            # The shortest ticker starting with the query is the query itself, if it exists.
+            if len(ticker_hits) and self.tickers[int(ticker_hits.min())] == upper:
+                add(self._hit_mask(ticker_hits.min()), EXACT)
+            add(self._hit_mask(ticker_hits), TICKER_PREFIX)
+            words = _WORD.findall(query.lower())
+            if words:
+                # Every query word must prefix-match some word of the company name.
+                name_hits = self._hit_mask(self._prefix(self.word_keys, self.word_rows, words[0]))
+                for word in words[1:]:
+                    name_hits &= self._hit_mask(self._prefix(self.word_keys, self.word_rows, word))
+                add(name_hits, NAME_PREFIX)
+        elif mask is not None:
+            add(mask.copy(), TICKER_PREFIX)
+
+        ranked = sorted(found, key=lambda i: (found[i], i))[:limit]
+        results = [self._result(i, found[i]) for i in ranked]
+        if fuzzy and len(query) >= 3 and len(results) < limit:
+            for i, score in self._fuzzy(query, mask, set(found), limit - len(results)):
+                results.append({**self._result(i, FUZZY), "score": round(score, 3)})
+        return results
+
+    def _result(self, i: int, kind: int) -> dict:
+        return {
+            "id": self.ids[i],
+            "ticker": self.tickers[i],
+            "company_name": self.names[i],
+            "sector": self.sectors[i],
+            "match": MATCH_NAMES[kind],
+        }
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index() -> SymbolIndex:
+    """
+    The process-wide index, rebuilt when a Stock changed (in any process,
+    via the shared cache version) or when it is older than MAX_INDEX_AGE_SECONDS.
+    """
+    global _index, _index_version, _index_built_at, _checked_at
+    now = time.monotonic()
+    # One read of the global: a rebuild in another thread may replace it meanwhile.
+    index = _index
+    if index is not None and now - _checked_at < VERSION_CHECK_SECONDS:
+        return index
+    with _lock:
+        version = cache.get(VERSION_KEY, 0)
+        _checked_at = now
+        if _index is None or version != _index_version or now - _index_built_at > MAX_INDEX_AGE_SECONDS:
+            _index = SymbolIndex.from_db()
+            _index_version = version
+            _index_built_at = now
+        return _index
+
+
+def invalidate_index():
+    """
+    Marks the index stale here and, through the shared version, in every
+    other process. The old index keeps serving until the next rebuild.
+    """
+    global _index_version, _checked_at
+    with _lock:
+        _index_version = None
+        _checked_at = 0.0
+    if not cache.add(VERSION_KEY, 1, None):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_index_on_stock_change(sender, **kwargs):
+    invalidate_index()
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Stock, StockPrice, Watchlist
+from .models import AlertEvent, AlertRule, Stock, StockPrice, StockPriceRollup, Watchlist
 
 class StockSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,6 +14,15 @@ class StockPriceSerializer(serializers.ModelSerializer):
         fields = [ 'date', 'open_price', 'close_price', 'high_price', 'low_price', 'volume']
 
 
+class StockPriceRollupSerializer(serializers.ModelSerializer):
+    # Same shape as StockPriceSerializer so charts can switch interval without changes.
+    date = serializers.DateField(source='period_start')
+
+    class Meta:
+        model = StockPriceRollup
+        fields = ['date', 'period_end', 'open_price', 'close_price', 'high_price', 'low_price', 'volume', 'trading_days']
+
+
 class WatchlistSerializer(serializers.ModelSerializer):
     stock = StockSerializer(read_only=True)
 
@@ -46,4 +55,43 @@ class WatchlistSerializer(serializers.ModelSerializer):
         if not created:
             raise serializers.ValidationError("This stock is already in your watchlist.")
             
-        return watchlist_item
\ No newline at end of file
+        return watchlist_item
+
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    stock = StockSerializer(read_only=True)
+    ticker = serializers.CharField(write_only=True)
+
+    class Meta:
+        model = AlertRule
+        fields = ['id', 'stock', 'ticker', 'kind', 'threshold', 'model_type', 'is_active', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate(self, attrs):
+        """
+        Rules can only be set on stocks in the user's watchlist, and a
+        forecast divergence rule must name the forecast model.
+        """
+        user = self.context['request'].user
+        ticker = attrs.pop('ticker').strip().upper()
+        watch = Watchlist.objects.filter(user=user, stock__ticker=ticker).select_related('stock').first()
+        if watch is None:
+            raise serializers.ValidationError({"ticker": f"{ticker} is not in your watchlist."})
+        attrs['stock'] = watch.stock
+        if attrs['kind'] == AlertRule.FORECAST_DIVERGENCE and not attrs.get('model_type'):
+            raise serializers.ValidationError({"model_type": "Required for forecast divergence rules."})
+        if attrs['threshold'] <= 0:
+            raise serializers.ValidationError({"threshold": "Must be positive."})
+        return attrs
+
+    def create(self, validated_data):
+        return AlertRule.objects.create(user=self.context['request'].user, **validated_data)
+
+
+class AlertEventSerializer(serializers.ModelSerializer):
+    ticker = serializers.CharField(source='rule.stock.ticker', read_only=True)
+    kind = serializers.CharField(source='rule.kind', read_only=True)
+
+    class Meta:
+        model = AlertEvent
+        fields = ['id', 'rule', 'ticker', 'kind', 'date', 'value', 'message', 'triggered_at']
@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+# Sent by the ingestion paths (the fetch_history command and the
+# StockHistoryAPIView yfinance fallback) after StockPrice rows are written.
+# Receivers get `stock`, `dates` (dates of the newly inserted rows) and
+# `source` ("fetch_history" or "history_api").
+prices_ingested = Signal()
+
+# Sent by predictor.store_forecast after a forecast is saved as Prediction
+# rows. Receivers get `stock` and `forecast` (the predict_with_* result dict).
+forecast_stored = Signal()
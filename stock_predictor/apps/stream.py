@@ -0,0 +1,170 @@
+import asyncio
+import io
+import json
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+from .metrics import STREAM_CONNECTIONS
+from .models import StockPrice, Watchlist
+from .pubsub import get_broker, has_subscribers, publish
+from .signals import forecast_stored, prices_ingested
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = "/api/stream/"
+MAX_TICKERS = 50
+
+
+@receiver(prices_ingested)
+def publish_prices_on_ingest(sender, stock, dates, source, **kwargs):
+    """
+    Pushes a "prices" event with the newest bar once the ingestion
+    transaction commits. Nothing is queried when nobody is subscribed.
+    """
+    if not dates:
+        return
+    ticker = stock.ticker
+
+    def send():
+        if not has_subscribers(ticker):
+            return
+        latest = (
+            StockPrice.objects.filter(stock=stock).order_by('-date')
+            .values('date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume').first()
+        )
+        publish(ticker, "prices", {
+            "ticker": ticker,
+            "source": source,
+            "dates": sorted(day.isoformat() for day in dates),
+            "latest": latest,
+        })
+
+    transaction.on_commit(send)
+
+
+@receiver(forecast_stored)
+def publish_forecast_on_store(sender, stock, forecast, **kwargs):
+    """Pushes a "forecast" event carrying the stored forecast."""
+    transaction.on_commit(lambda: publish(stock.ticker, "forecast", forecast))
+
+
+def _authenticate(scope):
+    """Resolves the Django session user for a raw ASGI scope (sync; run in a thread)."""
+    from importlib import import_module
+    from django.contrib.auth import get_user
+    from django.core.handlers.asgi import ASGIRequest
+
+    request = ASGIRequest(scope, io.BytesIO())
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    user = get_user(request)
+    return user if user.is_authenticated else None
+
+
+def _watchlist_tickers(user) -> list:
+    return list(Watchlist.objects.filter(user=user).values_list('stock__ticker', flat=True))
+
+
+class EventStreamApp:
+    """
+    ASGI wrapper that serves GET /api/stream/ as a server-sent event stream
+    and hands every other request to the Django application.
+
+    ?tickers=AAA,BBB selects the tickers (default: the user's watchlist).
+    Events are "prices" and "forecast"; "lagged" tells a slow client how
+    many events it missed so it can resync through the snapshot endpoint.
+    The connection is handled outside Django's request cycle so thousands of
+    idle streams cost one queue each, not a worker thread each.
+    """
+
+    def __init__(self, django_app, path: str = STREAM_PATH):
+        self.django_app = django_app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path:
+            await self.stream(scope, receive, send)
+        else:
+            await self.django_app(scope, receive, send)
+
+    async def respond(self, send, status_code: int, body: dict):
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+    async def stream(self, scope, receive, send):
+        if scope["method"] != "GET":
+            await self.respond(send, 405, {"error": "Method not allowed."})
+            return
+        user = await sync_to_async(_authenticate)(scope)
+        if user is None:
+            await self.respond(send, 403, {"detail": "Authentication credentials were not provided."})
+            return
+
+        query = parse_qs(scope.get("query_string", b"").decode())
+        tickers = [t.strip().upper() for t in ",".join(query.get("tickers", [])).split(",") if t.strip()]
+        if not tickers:
+            tickers = await sync_to_async(_watchlist_tickers)(user)
+        if not tickers:
+            await self.respond(send, 400, {"error": "No tickers given and the watchlist is empty."})
+            return
+        if len(tickers) > MAX_TICKERS:
+            await self.respond(send, 400, {"error": f"At most {MAX_TICKERS} tickers per stream."})
+            return
+
+        broker = get_broker()
+        subscription = broker.subscribe(tickers)
+        STREAM_CONNECTIONS.inc()
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    subscription.close()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            })
+            hello = {"tickers": sorted(subscription.tickers)}
+            await send({
+                "type": "http.response.body",
+                "body": f"retry: 5000\nevent: subscribed\ndata: {json.dumps(hello)}\n\n".encode(),
+                "more_body": True,
+            })
+            while not disconnected.is_set():
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line; keeps proxies from closing an idle connection.
+                    message = b": ping\n\n"
+                if message is None:
+                    break
+                dropped = subscription.take_dropped()
+                if dropped:
+                    message = f"event: lagged\ndata: {json.dumps({'dropped': dropped})}\n\n".encode() + message
+                await send({"type": "http.response.body", "body": message, "more_body": True})
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            watcher.cancel()
+            broker.unsubscribe(subscription)
+            STREAM_CONNECTIONS.dec()
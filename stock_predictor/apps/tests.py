@@ -1,3 +1,1224 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from rest_framework.test import APIClient
+
+from . import analytics, arima_search, db_router, indicators, metrics, pubsub, search
+from .alerts import evaluate_alerts
+from .admission import reset_backend
+from .dashboard import cache_sentiment
+from .downsample import get_downsampled_history, lttb_indices, ohlc_envelope
+from . import lstm_runtime
+from .lstm_runtime import export_lstm, load_lstm
+from .models import AlertEvent, AlertRule, ArimaOrder, Stock, StockPrice, StockPriceRollup, Watchlist
+from . import predictor
+from .artifacts import ArtifactStore
+from .predictor import FORECAST_STEPS, store_forecast
+from .signals import prices_ingested
+
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+
+
+@unittest.skipUnless(HAS_TENSORFLOW, "TensorFlow is required to build the reference Keras models.")
+class LSTMRuntimeParityTests(SimpleTestCase):
+    """The NumPy runtime must reproduce the Keras forward pass from exported weights."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.rng = np.random.default_rng(0)
+
+    def test_per_ticker_model_matches_keras(self):
+        from sklearn.preprocessing import MinMaxScaler
+        from .predictor import PREDICTION_DAYS, build_lstm_model, forecast_lstm
+
+        model = build_lstm_model()
+        prices = 100 + np.cumsum(self.rng.normal(0, 1, size=(200, 1)), axis=0)
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled = scaler.fit_transform(prices)
+        path = export_lstm(model, Path(self.tmp.name) / "model.npz", scaler=scaler,
+                           metadata={"window": PREDICTION_DAYS})
+        runtime = load_lstm(path)
+
+        X = self.rng.uniform(0, 1, size=(8, PREDICTION_DAYS, 1)).astype(np.float32)
+        np.testing.assert_allclose(runtime.predict(X), model.predict(X, verbose=0), rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(
+            runtime.forecast(scaled, steps=7), forecast_lstm(model, scaled, scaler, steps=7), rtol=1e-4
+        )
+
+    def test_global_model_with_sector_embedding_matches_keras(self):
+        from .global_lstm import build_global_model
+        from .predictor import PREDICTION_DAYS
+
+        model = build_global_model(n_sectors=3)
+        path = export_lstm(model, Path(self.tmp.name) / "global.npz", metadata={"window": PREDICTION_DAYS})
+        runtime = load_lstm(path)
+
+        X = self.rng.normal(0, 0.05, size=(6, PREDICTION_DAYS, 1)).astype(np.float32)
+        sectors = np.array([0, 1, 2, 3, 1, 0])
+        expected = model.predict([X, sectors], verbose=0)
+        np.testing.assert_allclose(runtime.predict(X, sectors), expected, rtol=1e-4, atol=1e-5)
+
+    def test_new_version_replaces_the_cached_model(self):
+        from .predictor import PREDICTION_DAYS, build_lstm_model
+
+        lstm_runtime._cache.clear()
+        paths = [export_lstm(build_lstm_model(), Path(self.tmp.name) / f"v{i}.npz", metadata={"window": PREDICTION_DAYS})
+                 for i in (1, 2)]
+        first = load_lstm(paths[0], 'lstm_AAA')
+        self.assertIs(load_lstm(paths[0], 'lstm_AAA'), first)
+        second = load_lstm(paths[1], 'lstm_AAA')
+        self.assertIsNot(second, first)
+        self.assertEqual(list(lstm_runtime._cache), ['lstm_AAA'])
+
+        with mock.patch.object(lstm_runtime, 'MAX_CACHED_MODELS', 2):
+            load_lstm(paths[0], 'lstm_BBB')
+            load_lstm(paths[1], 'lstm_CCC')
+        self.assertEqual(list(lstm_runtime._cache), ['lstm_BBB', 'lstm_CCC'])
+
+
+class LSTMRuntimeImportTests(SimpleTestCase):
+
+    def test_serving_modules_do_not_import_tensorflow(self):
+        code = (
+            "import sys, django\n"
+            "django.setup()\n"
+            "import apps.views, apps.lstm_runtime\n"
+            "print('tensorflow' in sys.modules)\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'stock_predictor.settings'},
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip().splitlines()[-1], 'False')
+
+
+class WatchlistSnapshotQueryTests(TestCase):
+    """The watchlist endpoints must not issue a query per watched stock."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='trader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def watch(self, ticker):
+        stock = Stock.objects.create(ticker=ticker, company_name=ticker, sector='Tech')
+        today = date.today()
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=stock, date=today - timedelta(days=offset), open_price=Decimal('10'),
+                       high_price=Decimal('12'), low_price=Decimal('9'),
+                       close_price=Decimal(100 - offset), volume=1000)
+            for offset in range(5)
+        ])
+        store_forecast({
+            "ticker": ticker,
+            "model_type": "ARIMA",
+            "forecast": [
+                {"date": (today + timedelta(days=i)).isoformat(), "predicted_price": 100 + i}
+                for i in range(1, FORECAST_STEPS + 1)
+            ],
+        })
+        cache_sentiment(ticker, {"summary": "ok", "sentiment": "Bullish"})
+        Watchlist.objects.create(user=self.user, stock=stock)
+
+    def test_snapshot_query_count_is_constant(self):
+        self.watch('AAA')
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/watchlist/snapshot/')
+        self.assertEqual(response.status_code, 200)
+
+        for ticker in ('BBB', 'CCC', 'DDD'):
+            self.watch(ticker)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/watchlist/snapshot/')
+
+        self.assertEqual(len(response.data), 4)
+        item = next(row for row in response.data if row['stock']['ticker'] == 'AAA')
+        self.assertEqual(item['latest_bar']['close'], 100.0)
+        self.assertEqual(item['change'], 1.0)
+        self.assertEqual(len(item['forecasts']['ARIMA']['forecast']), FORECAST_STEPS)
+        self.assertIsNone(item['forecasts']['LSTM'])
+        self.assertEqual(item['sentiment']['sentiment'], 'Bullish')
+
+    def test_watchlist_list_query_count_is_constant(self):
+        for ticker in ('AAA', 'BBB', 'CCC'):
+            self.watch(ticker)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/watchlist/')
+        self.assertEqual(len(response.data), 3)
+
+
+@override_settings(
+    ADMISSION_BACKEND='memory',
+    ADMISSION_QUOTAS={'forecast': {'capacity': 25, 'refill_per_minute': 1}},
+    ADMISSION_COSTS={'ARIMA': 2, 'LSTM': 20},
+    ADMISSION_MAX_CONCURRENT={'ARIMA': 1},
+)
+class AdmissionControlTests(TestCase):
+    """Expensive computations are weighted against a per-user bucket; cached answers are free."""
+
+    def setUp(self):
+        reset_backend()
+        self.addCleanup(reset_backend)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('trader', password='pw'))
+        self.predict = mock.patch('apps.views.predict_with_lstm', side_effect=self.forecast).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def forecast(self, ticker):
+        if not Stock.objects.filter(ticker=ticker).exists():
+            return {"error": f"No data for {ticker}."}
+        return {
+            "ticker": ticker,
+            "model_type": "LSTM",
+            "forecast": [{"date": (date.today() + timedelta(days=1)).isoformat(), "predicted_price": 100}],
+        }
+
+    def test_quota_is_spent_by_weight_and_rejects_with_retry_after(self):
+        for ticker in ('AAA', 'BBB'):
+            Stock.objects.create(ticker=ticker, company_name=ticker)
+        self.assertEqual(self.client.get('/api/apps/AAA/predict/lstm/').status_code, 200)
+        response = self.client.get('/api/apps/BBB/predict/lstm/')
+        self.assertEqual(response.status_code, 429)
+        # 5 tokens left of the 20 needed, at one token a minute.
+        self.assertEqual(response['Retry-After'], '900')
+
+    def test_error_responses_are_refunded(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/apps/ZZZ/predict/lstm/').status_code, 400)
+        Stock.objects.create(ticker='AAA', company_name='AAA')
+        self.assertEqual(self.client.get('/api/apps/AAA/predict/lstm/').status_code, 200)
+        self.assertEqual(self.predict.call_count, 4)
+
+    def test_quotas_must_be_positive(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        with self.settings(ADMISSION_QUOTAS={'forecast': {'capacity': 25, 'refill_per_minute': 0}}):
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.get('/api/apps/AAA/predict/lstm/')
+
+    def test_stored_forecast_does_not_spend_tokens(self):
+        stock = Stock.objects.create(ticker='AAA', company_name='AAA Inc')
+        store_forecast({
+            "ticker": stock.ticker,
+            "model_type": "LSTM",
+            "forecast": [
+                {"date": (date.today() + timedelta(days=i)).isoformat(), "predicted_price": 100 + i}
+                for i in range(1, FORECAST_STEPS + 1)
+            ],
+        })
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/apps/AAA/predict/lstm/').status_code, 200)
+        self.assertEqual(self.client.get('/api/apps/BBB/predict/lstm/').status_code, 400)
+
+    def test_concurrency_cap_rejects_while_a_slot_is_held(self):
+        from .admission import AdmissionRejected, admit
+
+        request = mock.Mock(user=User.objects.get(username='trader'))
+        with admit(request, 'forecast', 'ARIMA'):
+            with self.assertRaises(AdmissionRejected) as ctx:
+                with admit(request, 'forecast', 'ARIMA'):
+                    pass
+        self.assertEqual(ctx.exception.reason, 'concurrency')
+        with admit(request, 'forecast', 'ARIMA'):
+            pass
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Reads go to a healthy replica until the current context writes; then they stay on the primary."""
+
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        token = db_router.begin()
+        self.addCleanup(db_router.end, token)
+        patcher = mock.patch.object(db_router, 'replica_healthy', return_value=True)
+        self.healthy = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_are_pinned_to_the_primary_after_a_write(self):
+        self.assertEqual(self.router.db_for_read(Stock), 'replica1')
+        self.assertEqual(self.router.db_for_write(Stock), 'default')
+        self.assertTrue(db_router.wrote())
+        self.assertEqual(self.router.db_for_read(Stock), 'default')
+
+    def test_unhealthy_replica_and_use_primary_fall_back_to_the_primary(self):
+        with db_router.use_primary():
+            self.assertEqual(self.router.db_for_read(Stock), 'default')
+        self.assertEqual(self.router.db_for_read(Stock), 'replica1')
+        self.healthy.return_value = False
+        self.assertEqual(self.router.db_for_read(Stock), 'default')
+
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=5)
+class TickerPinTests(TestCase):
+    """An ingestion in any process pins the ticker's reads to the primary for every worker."""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.router = db_router.PrimaryReplicaRouter()
+        patcher = mock.patch.object(db_router, 'replica_healthy', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ingest(self):
+        # Like a real ingestion, which has written and so reads from the primary.
+        with db_router.use_primary():
+            prices_ingested.send(sender=self.__class__, stock=self.stock, dates=[date(2024, 1, 1)], source='test')
+
+    def test_ingestion_pins_the_ticker_through_the_database(self):
+        last_updated = self.stock.last_updated
+        self.assertFalse(db_router.ticker_pinned('aaa'))
+
+        self.ingest()
+        # Nothing process-local is involved: a cleared cache still sees the pin.
+        cache.clear()
+        self.assertTrue(db_router.ticker_pinned('aaa'))
+        self.assertFalse(db_router.ticker_pinned('BBB'))
+        # The pin leaves the stock itself alone.
+        self.assertEqual(Stock.objects.get(pk=self.stock.pk).last_updated, last_updated)
+
+    def read_with_watched_ticker(self, pinned=False):
+        token = db_router.begin(pinned=pinned)
+        self.addCleanup(db_router.end, token)
+        db_router.watch_ticker('aaa')
+        return self.router.db_for_read(StockPrice)
+
+    def test_pin_is_checked_once_and_only_for_replica_reads(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.read_with_watched_ticker(), 'replica1')
+            self.assertEqual(self.router.db_for_read(StockPrice), 'replica1')
+
+        self.ingest()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.read_with_watched_ticker(), 'default')
+            self.assertEqual(self.router.db_for_read(StockPrice), 'default')
+        # A request already on the primary never looks the pin up.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.read_with_watched_ticker(pinned=True), 'default')
+
+
+class SymbolSearchTests(SimpleTestCase):
+    """Prefix, fuzzy and sector-filtered lookups on the in-memory symbol index."""
+
+    def setUp(self):
+        self.index = search.SymbolIndex([
+            (1, 'AAPL', 'Apple Inc.', 'Technology'),
+            (2, 'AA', 'Alcoa Corp', 'Basic Materials'),
+            (3, 'AAP', 'Advance Auto Parts', 'Consumer Cyclical'),
+            (4, 'MSFT', 'Microsoft Corp', 'Technology'),
+            (5, 'XOM', 'Exxon Mobil', 'Energy'),
+            (6, 'UNH', 'UnitedHealth Group', 'Healthcare'),
+        ])
+
+    def matches(self, query, **kwargs):
+        return [(row['ticker'], row['match']) for row in self.index.search(query, **kwargs)]
+
+    def test_ticker_and_name_prefixes(self):
+        self.assertEqual(self.matches('aa', fuzzy=False),
+                         [('AA', 'exact'), ('AAP', 'ticker_prefix'), ('AAPL', 'ticker_prefix')])
+        self.assertEqual(self.matches('micro'), [('MSFT', 'name_prefix')])
+        # Every query word must prefix a word of the company name.
+        self.assertEqual(self.matches('auto par'), [('AAP', 'name_prefix')])
+        self.assertEqual(self.matches('aa', limit=2, fuzzy=False), [('AA', 'exact'), ('AAP', 'ticker_prefix')])
+
+    def test_fuzzy_matches_fill_the_remaining_slots(self):
+        self.assertEqual(self.matches('Microsfot'), [('MSFT', 'fuzzy')])
+        self.assertEqual(self.matches('unitedhelth'), [('UNH', 'fuzzy')])
+        self.assertEqual(self.matches('Microsfot', fuzzy=False), [])
+        self.assertEqual(self.matches('zzzzz'), [])
+
+    def test_sector_filter(self):
+        self.assertEqual(self.matches('a', sector='technology'), [('AAPL', 'ticker_prefix')])
+        self.assertEqual(self.matches('', sector='Technology'), [('AAPL', 'ticker_prefix'), ('MSFT', 'ticker_prefix')])
+        self.assertEqual(self.matches('a', sector='Utilities'), [])
+
+    def test_queries_over_50k_symbols_take_under_a_millisecond(self):
+        from .management.commands.run_benchmarks import synthetic_symbols
+
+        index = search.SymbolIndex(synthetic_symbols(50000))
+        cases = [('AP', {}), ('glob cap', {}), ('A', {'sector': 'Energy'}), ('Holdngs', {})]
+        for query, kwargs in cases:
+            self.assertTrue(index.search(query, **kwargs))
+            best = min(self.batch_seconds(index, query, kwargs) for _ in range(5))
+            self.assertLess(best / 100, 0.001, query)
+
+    @staticmethod
+    def batch_seconds(index, query, kwargs):
+        start = time.perf_counter()
+        for _ in range(100):
+            index.search(query, **kwargs)
+        return time.perf_counter() - start
+
+
+class SymbolIndexLifecycleTests(TestCase):
+    """The process-wide index follows Stock changes; the search and list endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        search.invalidate_index()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='trader'))
+        for i, sector in enumerate(['Tech', 'Tech', 'Energy', 'Tech', 'Energy']):
+            Stock.objects.create(ticker=f'T{i}', company_name=f'Company {i}', sector=sector)
+
+    def test_saved_and_deleted_stocks_update_the_index(self):
+        self.assertEqual(len(search.get_index().search('T', fuzzy=False)), 5)
+        Stock.objects.create(ticker='NEW', company_name='Newcomer', sector='Tech')
+        self.assertEqual(search.get_index().search('new')[0]['ticker'], 'NEW')
+        Stock.objects.get(ticker='NEW').delete()
+        self.assertEqual(search.get_index().search('new', fuzzy=False), [])
+
+    def test_invalidation_keeps_serving_the_old_index_until_the_rebuild(self):
+        index = search.get_index()
+        search.invalidate_index()
+        self.assertIs(search._index, index)
+        self.assertIsNot(search.get_index(), index)
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/apps/search/', {'q': 't1', 'fuzzy': 'false'})
+        self.assertEqual([row['ticker'] for row in response.data['results']], ['T1'])
+        self.assertEqual(self.client.get('/api/apps/search/').status_code, 400)
+
+    def test_stock_list_is_paginated_and_filtered_by_sector(self):
+        response = self.client.get('/api/apps/', {'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get('/api/apps/', {'page_size': 2, 'page': 3})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        response = self.client.get('/api/apps/', {'sector': 'energy'})
+        self.assertEqual(sorted(row['ticker'] for row in response.data['results']), ['T2', 'T4'])
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Counters, gauges and histograms render in the Prometheus text format."""
+
+    def metric(self, cls, *args, **kwargs):
+        metric = cls(*args, **kwargs)
+        self.addCleanup(metrics.REGISTRY.remove, metric)
+        return metric
+
+    def test_counter_and_gauge(self):
+        counter = self.metric(metrics.Counter, 'test_total', 'Test counter.', labelnames=('kind',))
+        counter.inc(kind='a')
+        counter.inc(2, kind='say "hi"\n')
+        self.assertEqual(counter.value(kind='a'), 1)
+        self.assertEqual(counter.render(), [
+            '# HELP test_total Test counter.', '# TYPE test_total counter',
+            'test_total{kind="a"} 1', 'test_total{kind="say \\"hi\\"\\n"} 2',
+        ])
+        with self.assertRaises(ValueError):
+            counter.inc(other='a')
+        gauge = self.metric(metrics.Gauge, 'test_open', 'Test gauge.')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(gauge.render()[2:], ['test_open 1'])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.metric(metrics.Histogram, 'test_seconds', 'Test histogram.', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{le="0.1"} 2', 'test_seconds_bucket{le="1.0"} 3', 'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_sum 3.65', 'test_seconds_count 4',
+        ])
+        self.assertEqual(histogram.snapshot(), {'count': 4, 'sum': 3.65})
+
+
+class MetricsEndpointTests(TestCase):
+    """/metrics exposes the request middleware's timings, to allowed addresses only."""
+
+    SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+    def scrape(self, **extra):
+        response = self.client.get('/metrics', **extra)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line.startswith('#'):
+                continue
+            match = self.SAMPLE.match(line)
+            self.assertIsNotNone(match, line)
+            samples[match.group(1) + (match.group(2) or '')] = float(match.group(3))
+        return response, samples
+
+    def test_one_request_is_timed_and_counted(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='trader'))
+        Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        labels = '{view="apps:stock-list-create",method="GET",status="200"}'
+        _, before = self.scrape()
+
+        response = client.get('/api/apps/')
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        response, after = self.scrape()
+
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertEqual(after[f'stock_http_request_seconds_count{labels}'],
+                         before.get(f'stock_http_request_seconds_count{labels}', 0) + 1)
+        self.assertEqual(after[f'stock_http_request_seconds_bucket{labels[:-1]},le="+Inf"}}'],
+                         after[f'stock_http_request_seconds_count{labels}'])
+        self.assertGreater(after['stock_http_request_db_queries_sum{view="apps:stock-list-create"}'], 0)
+
+    def test_other_addresses_are_refused(self):
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8']):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=['*']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9').status_code, 200)
+
+
+class AnalyticsMathTests(SimpleTestCase):
+    """The vectorized statistics must agree with pandas, including tickers with gaps."""
+
+    def setUp(self):
+        import pandas as pd
+
+        rng = np.random.default_rng(0)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(300, 4)), axis=0))
+        closes[:40, 1] = np.nan      # listed later
+        closes[150:155, 2] = np.nan  # trading halt
+        self.frame = pd.DataFrame(closes).pct_change(fill_method=None).iloc[1:]
+        self.returns = analytics.simple_returns(closes)
+
+    def test_pairwise_covariance_matches_pandas(self):
+        cov, corr, _ = analytics.pairwise_covariance(self.returns)
+        np.testing.assert_allclose(cov, self.frame.cov().to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(corr, self.frame.corr().to_numpy(), rtol=1e-9)
+
+    def test_rolling_volatility_matches_pandas(self):
+        expected = self.frame.rolling(21, min_periods=10).std().to_numpy()[20:] * np.sqrt(analytics.TRADING_DAYS)
+        np.testing.assert_allclose(analytics.rolling_volatility(self.returns, 21), expected, rtol=1e-7)
+
+
+class AlertEngineTests(TestCase):
+    """Alert rules run over the bars an ingestion just wrote, once per rule and date."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='trader')
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.start = date(2024, 1, 1)
+        self.ingest([100, 101, 102])
+
+    def ingest(self, closes, offset=0):
+        bars = [
+            StockPrice(stock=self.stock, date=self.start + timedelta(days=offset + i), open_price=Decimal('1'),
+                       high_price=Decimal('1'), low_price=Decimal('1'), close_price=Decimal(close), volume=1)
+            for i, close in enumerate(closes)
+        ]
+        StockPrice.objects.bulk_create(bars, ignore_conflicts=True)
+        dates = [bar.date for bar in bars]
+        prices_ingested.send(sender=self.__class__, stock=self.stock, dates=dates, source='test')
+        return dates
+
+    def rule(self, kind, threshold, model_type=''):
+        return AlertRule.objects.create(user=self.user, stock=self.stock, kind=kind,
+                                        threshold=Decimal(threshold), model_type=model_type)
+
+    def test_rules_fire_on_ingestion_once_per_date(self):
+        above = self.rule(AlertRule.PRICE_ABOVE, '105')
+        below = self.rule(AlertRule.PRICE_BELOW, '95')
+        move = self.rule(AlertRule.PERCENT_MOVE, '5')
+        dates = self.ingest([103, 106, 107, 94], offset=3)
+
+        self.assertEqual(list(above.events.values_list('date', flat=True)), [dates[1]])
+        self.assertEqual(list(below.events.values_list('date', flat=True)), [dates[3]])
+        self.assertEqual(list(move.events.values_list('date', flat=True)), [dates[3]])
+        self.assertAlmostEqual(float(move.events.get().value), (94 / 107 - 1) * 100, places=3)
+
+        self.ingest([103, 106, 107, 94], offset=3)
+        self.assertEqual(AlertEvent.objects.count(), 3)
+
+    def test_forecast_divergence_uses_the_stored_forecast(self):
+        rule = self.rule(AlertRule.FORECAST_DIVERGENCE, '10', model_type='ARIMA')
+        next_day = self.start + timedelta(days=3)
+        store_forecast({
+            "ticker": 'AAA',
+            "model_type": "ARIMA",
+            "forecast": [{"date": next_day.isoformat(), "predicted_price": 100}],
+        })
+        self.ingest([120], offset=3)
+        event = rule.events.get()
+        self.assertEqual(event.date, next_day)
+        self.assertAlmostEqual(float(event.value), 20.0, places=3)
+
+    def test_query_count_does_not_grow_with_rules(self):
+        for threshold in range(50):
+            self.rule(AlertRule.PRICE_ABOVE, str(200 + threshold))
+        # Rules, new bars; nothing fires, so no dedup lookup or insert.
+        with self.assertNumQueries(2):
+            evaluate_alerts(self.stock, [self.start + timedelta(days=2)])
+
+
+class FetchHistoryIngestionTests(TestCase):
+    """fetch_history announces every bar it creates or changes, and nothing else."""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.frame = pd.DataFrame({
+            'date': pd.bdate_range('2024-01-01', periods=5),
+            'open': [10.0] * 5, 'high': [11.0] * 5, 'low': [9.0] * 5,
+            'close': [10.111, 10.2, 10.3, 10.4, 10.5], 'volume': [100] * 5,
+        })
+        self.announced = []
+        prices_ingested.connect(self.record)
+        self.addCleanup(prices_ingested.disconnect, self.record)
+
+    def record(self, sender, stock, dates, **kwargs):
+        self.announced.append(sorted(dates))
+
+    def fetch(self, frame):
+        with mock.patch('apps.management.commands.fetch_history.fetch_stock_data', return_value=frame):
+            call_command('fetch_history', stdout=StringIO())
+        return self.announced[-1]
+
+    def test_new_and_revised_bars_are_announced(self):
+        self.assertEqual(len(self.fetch(self.frame)), 5)
+        self.assertEqual(self.fetch(self.frame), [])
+
+        revised = self.frame.copy()
+        revised.loc[4, 'close'] = 10.9
+        self.assertEqual(self.fetch(revised), [date(2024, 1, 5)])
+        self.assertEqual(StockPrice.objects.get(stock=self.stock, date=date(2024, 1, 5)).close_price, Decimal('10.90'))
+
+
+class PriceStreamTests(TestCase):
+    """Ingested prices reach stream subscribers once, after the transaction commits."""
+
+    def setUp(self):
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.broker = pubsub.LocalBroker()
+        for target in ('apps.pubsub.get_broker', 'apps.stream.get_broker'):
+            patcher = mock.patch(target, return_value=self.broker)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(pubsub, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def subscribe(self, tickers):
+        async def subscribe():
+            return self.broker.subscribe(tickers)
+        return self.loop.run_until_complete(subscribe())
+
+    def received(self, subscription):
+        # Runs the deliveries handed to the loop, then empties the queue.
+        self.loop.run_until_complete(asyncio.sleep(0))
+        messages = []
+        while not subscription.queue.empty():
+            messages.append(subscription.queue.get_nowait())
+        return messages
+
+    def test_ingest_delivers_one_event_after_commit(self):
+        subscription, other = self.subscribe(['AAA']), self.subscribe(['BBB'])
+        frame = pd.DataFrame({
+            'date': pd.bdate_range('2024-01-01', periods=5), 'open': [10.0] * 5, 'high': [11.0] * 5,
+            'low': [9.0] * 5, 'close': [10.0, 10.2, 10.3, 10.4, 10.5], 'volume': [100] * 5,
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('apps.management.commands.fetch_history.fetch_stock_data', return_value=frame):
+                call_command('fetch_history', stdout=StringIO())
+            self.assertEqual(self.received(subscription), [])
+
+        messages = self.received(subscription)
+        self.assertEqual(len(messages), 1)
+        event, data = messages[0].decode().strip().split('\n')
+        self.assertEqual(event, 'event: prices')
+        data = json.loads(data.removeprefix('data: '))
+        self.assertEqual(data['dates'], [day.date().isoformat() for day in frame['date']])
+        self.assertEqual((data['latest']['date'], data['latest']['close_price']), ('2024-01-05', '10.50'))
+        self.assertEqual(self.received(other), [])
+
+    def test_no_query_without_subscribers(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            prices_ingested.send(sender=None, stock=self.stock, dates=[date(2024, 1, 1)], source='test')
+        send, = [callback for callback in callbacks if callback.__qualname__.startswith('publish_prices_on_ingest')]
+        with self.assertNumQueries(0), mock.patch.object(self.broker, 'publish') as publish:
+            send()
+        publish.assert_not_called()
+
+
+class StreamBackendTests(SimpleTestCase):
+    """The in-process broker cannot hear other processes and says so."""
+
+    @override_settings(STREAM_BACKEND='memory')
+    def test_memory_backend_warns_that_other_processes_are_not_heard(self):
+        with mock.patch.object(pubsub, '_broker', None):
+            self.assertFalse(pubsub.has_subscribers('AAA'))
+            with self.assertLogs('apps.pubsub', 'WARNING') as logs:
+                self.assertIsInstance(pubsub.get_broker(), pubsub.LocalBroker)
+            self.assertIn('fetch_history', logs.output[0])
+            self.assertFalse(pubsub.has_subscribers('AAA'))
+
+
+class RollupTests(TestCase):
+    """Weekly and monthly bars equal a resample of the daily bars and follow re-ingests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='trader'))
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        rng = np.random.default_rng(0)
+        days = pd.bdate_range('2024-01-01', periods=70)
+        close = np.round(100 + np.cumsum(rng.normal(0, 1, size=len(days))), 2)
+        self.ingest([
+            StockPrice(stock=self.stock, date=day.date(), open_price=Decimal(str(c - 0.5)),
+                       high_price=Decimal(str(c + rng.integers(1, 5))), low_price=Decimal(str(c - rng.integers(1, 5))),
+                       close_price=Decimal(str(c)), volume=int(rng.integers(100, 1000)))
+            for day, c in zip(days, close)
+        ])
+
+    def ingest(self, bars):
+        StockPrice.objects.bulk_create(bars, update_conflicts=True, unique_fields=['stock', 'date'],
+                                       update_fields=['open_price', 'high_price', 'low_price', 'close_price', 'volume'])
+        prices_ingested.send(sender=None, stock=self.stock, dates=[bar.date for bar in bars], source='test')
+
+    def assert_matches_resample(self):
+        daily = pd.DataFrame(StockPrice.objects.filter(stock=self.stock).order_by('date').values(
+            'date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume'))
+        daily = daily.set_index(pd.to_datetime(daily.pop('date'))).astype(float)
+        rules = {'open_price': 'first', 'high_price': 'max', 'low_price': 'min', 'close_price': 'last', 'volume': 'sum'}
+        for interval, frequency in (('week', 'W-MON'), ('month', 'MS')):
+            expected = daily.resample(frequency, closed='left', label='left').agg(rules).dropna()
+            rollups = pd.DataFrame(StockPriceRollup.objects.filter(stock=self.stock, interval=interval)
+                                   .order_by('period_start').values('period_start', *rules))
+            rollups = rollups.set_index(pd.to_datetime(rollups.pop('period_start'))).astype(float)
+            pd.testing.assert_frame_equal(rollups, expected, check_names=False, check_freq=False)
+
+    def test_rollups_match_a_resample_of_the_daily_bars(self):
+        self.assertEqual(StockPriceRollup.objects.filter(interval='month').count(), 4)
+        self.assert_matches_resample()
+
+    def test_reingested_bars_update_their_periods(self):
+        revised = StockPrice.objects.get(stock=self.stock, date=date(2024, 1, 10))
+        revised.high_price, revised.volume = Decimal('500'), 10 ** 6
+        new = StockPrice(stock=self.stock, date=date(2024, 4, 8), open_price=Decimal('1'), high_price=Decimal('2'),
+                         low_price=Decimal('0.5'), close_price=Decimal('1.5'), volume=7)
+        self.ingest([revised, new])
+        self.assert_matches_resample()
+        self.assertEqual(StockPriceRollup.objects.get(interval='week', period_start=date(2024, 1, 8)).high_price,
+                         Decimal('500'))
+
+    def test_history_endpoint_does_not_write_rollups(self):
+        StockPriceRollup.objects.all().delete()
+        response = self.client.get('/api/apps/AAA/history/', {'interval': 'week'})
+        self.assertEqual((response.status_code, response.data), (200, []))
+        self.assertFalse(StockPriceRollup.objects.exists())
+        call_command('build_rollups', 'AAA', stdout=StringIO())
+        response = self.client.get('/api/apps/AAA/history/', {'interval': 'week'})
+        self.assertEqual(len(response.data), 14)
+
+
+class LatestIndicatorsTests(TestCase):
+    """?latest=true must not serve an incremental state older than the stored bars."""
+
+    def setUp(self):
+        cache.clear()
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.add_bars(date(2024, 1, 1), 60)
+
+    def add_bars(self, start, days):
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=self.stock, date=start + timedelta(days=i), open_price=Decimal('10'),
+                       high_price=Decimal(11 + i % 3), low_price=Decimal('9'), close_price=Decimal(10 + i % 5),
+                       volume=1000)
+            for i in range(days)
+        ])
+
+    def test_state_written_by_another_process_is_not_trusted(self):
+        first = indicators.get_latest_indicators('AAA')
+        self.assertEqual(first['date'], '2024-02-29')
+
+        # Ingested elsewhere: no prices_ingested receiver ran in this process.
+        self.add_bars(date(2024, 3, 1), 1)
+        latest = indicators.get_latest_indicators('AAA')
+        self.assertEqual(latest['date'], '2024-03-01')
+        dates, series = indicators.get_indicator_series('AAA')
+        self.assertAlmostEqual(latest['rsi_14'], series['rsi_14'][-1])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(indicators.get_latest_indicators('AAA'), latest)
+
+
+class DownsampledHistoryCacheTests(TestCase):
+    """The history cache must notice bars written by another process (no signal reaches this one)."""
+
+    def setUp(self):
+        cache.clear()
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=self.stock, date=date(2024, 1, 1) + timedelta(days=i), open_price=Decimal('10'),
+                       high_price=Decimal('11'), low_price=Decimal('9'), close_price=Decimal('10'), volume=1)
+            for i in range(50)
+        ])
+
+    def history(self):
+        return get_downsampled_history(self.stock, 'day', None, None, 10, 'ohlc')
+
+    def test_new_and_revised_bars_miss_the_cache(self):
+        self.assertEqual(self.history()[-1]['close_price'], '10.00')
+
+        StockPrice.objects.filter(stock=self.stock, date=date(2024, 2, 19)).update(close_price=Decimal('12.5'))
+        self.assertEqual(self.history()[-1]['close_price'], '12.50')
+
+        StockPrice.objects.create(stock=self.stock, date=date(2024, 2, 20), open_price=Decimal('10'),
+                                  high_price=Decimal('11'), low_price=Decimal('9'), close_price=Decimal('13'),
+                                  volume=1)
+        self.assertEqual(self.history()[-1]['close_price'], '13.00')
+
+    def test_revised_high_low_and_volume_miss_the_cache(self):
+        self.assertEqual(self.history()[0]['high_price'], '11.00')
+        StockPrice.objects.filter(stock=self.stock, date=date(2024, 1, 2)).update(high_price=Decimal('15'))
+        self.assertEqual(self.history()[0]['high_price'], '15.00')
+        StockPrice.objects.filter(stock=self.stock, date=date(2024, 1, 3)).update(low_price=Decimal('5'))
+        self.assertEqual(self.history()[0]['low_price'], '5.00')
+        StockPrice.objects.filter(stock=self.stock, date=date(2024, 1, 1)).update(volume=100)
+        self.assertEqual(self.history()[0]['volume'], 104)
+
+
+class DownsampleTests(SimpleTestCase):
+    """LTTB keeps the shape of the line; the OHLC envelope keeps every bucket's extremes."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.close = 100 + np.cumsum(rng.normal(0, 1, size=1000))
+        self.close[300] += 60  # spike
+        self.close[700] -= 60  # dip
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        keep = lttb_indices(self.close, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(300, keep)
+        self.assertIn(700, keep)
+        np.testing.assert_array_equal(lttb_indices(self.close[:50], 100), np.arange(50))
+
+    def test_ohlc_envelope_keeps_each_buckets_extremes(self):
+        n = len(self.close)
+        dates = np.arange(n)
+        open_, high, low = self.close - 0.5, self.close + np.arange(n) % 7, self.close - np.arange(n) % 5
+        volume = np.arange(n, dtype=np.int64)
+        days, o, h, l, c, v = ohlc_envelope(dates, open_, high, low, self.close, volume, 64)
+
+        self.assertEqual(len(days), 64)
+        buckets = np.searchsorted(days, dates, side='right') - 1
+        frame = pd.DataFrame({'bucket': buckets, 'open': open_, 'high': high, 'low': low,
+                              'close': self.close, 'volume': volume}).groupby('bucket')
+        np.testing.assert_array_equal(o, frame['open'].first())
+        np.testing.assert_array_equal(h, frame['high'].max())
+        np.testing.assert_array_equal(l, frame['low'].min())
+        np.testing.assert_array_equal(c, frame['close'].last())
+        np.testing.assert_array_equal(v, frame['volume'].sum())
+        self.assertEqual((h.max(), l.min()), (high.max(), low.min()))
+
+
+class AnalyticsDatabaseTests(TestCase):
+    """The price matrix loader and the endpoint, against real rows with gaps."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='trader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        rng = np.random.default_rng(1)
+        self.start = date(2024, 1, 1)
+        self.closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(40, 2)), axis=0)), 2)
+        self.closes[5:8, 1] = np.nan  # BBB has no bars on these days
+        for column, ticker in enumerate(('AAA', 'BBB')):
+            stock = Stock.objects.create(ticker=ticker, company_name=ticker, sector='Tech')
+            StockPrice.objects.bulk_create([
+                self.bar(stock, day, close) for day, close in enumerate(self.closes[:, column]) if not np.isnan(close)
+            ])
+
+    def bar(self, stock, day, close):
+        return StockPrice(stock=stock, date=self.start + timedelta(days=day), open_price=Decimal('1'),
+                          high_price=Decimal('1'), low_price=Decimal('1'), close_price=Decimal(str(close)), volume=1)
+
+    def test_load_price_matrix_aligns_dates_and_leaves_gaps(self):
+        dates, found, matrix = analytics.load_price_matrix(['BBB', 'ZZZ', 'AAA'])
+        self.assertEqual(found, ['BBB', 'AAA'])
+        self.assertEqual(str(dates[0]), '2024-01-01')
+        self.assertEqual(len(dates), 40)
+        np.testing.assert_array_equal(matrix, self.closes[:, [1, 0]])
+
+        dates, _, matrix = analytics.load_price_matrix(['AAA'], start=self.start + timedelta(days=10))
+        self.assertEqual(len(dates), 30)
+        np.testing.assert_array_equal(matrix[:, 0], self.closes[10:, 0])
+
+    def test_endpoint_matches_pandas_and_sees_new_bars(self):
+        import pandas as pd
+
+        response = self.client.get('/api/apps/analytics/', {'tickers': 'AAA,BBB,ZZZ', 'window': 10, 'beta_window': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tickers'], ['AAA', 'BBB'])
+        self.assertEqual(response.data['missing'], ['ZZZ'])
+        returns = pd.DataFrame(self.closes, columns=['AAA', 'BBB']).pct_change(fill_method=None)
+        self.assertAlmostEqual(response.data['correlation'][0][1], returns.corr().loc['AAA', 'BBB'], places=5)
+        self.assertAlmostEqual(response.data['volatility']['BBB'], returns['BBB'].std() * np.sqrt(252), places=5)
+        self.assertEqual(response.data['observations'], 39)
+
+        # Written without prices_ingested, as by another process: the cached result must not be reused.
+        StockPrice.objects.create(stock=Stock.objects.get(ticker='AAA'), date=self.start + timedelta(days=40),
+                                  open_price=Decimal('1'), high_price=Decimal('1'), low_price=Decimal('1'),
+                                  close_price=Decimal('99'), volume=1)
+        response = self.client.get('/api/apps/analytics/', {'tickers': 'AAA,BBB,ZZZ', 'window': 10, 'beta_window': 20})
+        self.assertEqual(response.data['observations'], 40)
+
+    def test_only_the_benchmark_having_bars_is_a_404(self):
+        self.assertIsNone(analytics.get_analytics(['XXX'], benchmark='AAA'))
+        Stock.objects.create(ticker='CCC', company_name='CCC', sector='Tech')
+        response = self.client.get('/api/apps/analytics/', {'tickers': 'CCC', 'benchmark': 'AAA'})
+        self.assertEqual(response.status_code, 404)
+        # BBB exists but has no bars in the window.
+        start = (self.start + timedelta(days=6)).isoformat()
+        response = self.client.get('/api/apps/analytics/', {'tickers': 'BBB', 'benchmark': 'AAA', 'start': start, 'end': start})
+        self.assertEqual(response.status_code, 404)
+
+    def test_endpoint_rejects_bad_input(self):
+        self.assertEqual(self.client.get('/api/apps/analytics/', {'tickers': 'AAA,BBB', 'weights': '1'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/apps/analytics/', {'tickers': 'ZZZ'}).status_code, 404)
+
+
+class PrecomputeForecastsTests(TransactionTestCase):
+    """precompute_forecasts skips fresh forecasts and keeps going when one ticker fails."""
+
+    def setUp(self):
+        user = User.objects.create(username='trader')
+        self.today = date.today()
+        for ticker in ('AAA', 'BBB'):
+            stock = Stock.objects.create(ticker=ticker, company_name=ticker, sector='Tech')
+            StockPrice.objects.create(stock=stock, date=self.today, open_price=Decimal('1'), high_price=Decimal('1'),
+                                      low_price=Decimal('1'), close_price=Decimal('1'), volume=1)
+            Watchlist.objects.create(user=user, stock=stock)
+        self.calls = []
+        patcher = mock.patch.dict('apps.management.commands.precompute_forecasts.PREDICTORS', {'arima': self.predict})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def predict(self, ticker):
+        self.calls.append(ticker)
+        if ticker == 'BBB':
+            raise RuntimeError('fit did not converge')
+        return {
+            "ticker": ticker,
+            "model_type": "ARIMA",
+            "forecast": [
+                {"date": (self.today + timedelta(days=i)).isoformat(), "predicted_price": 100 + i}
+                for i in range(1, FORECAST_STEPS + 1)
+            ],
+        }
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('precompute_forecasts', '--models', 'arima', '--workers', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_one_failing_ticker_does_not_stop_the_run(self):
+        output = self.run_command()
+        self.assertEqual(sorted(self.calls), ['AAA', 'BBB'])
+        self.assertIn('BBB ARIMA failed', output)
+        self.assertIn('Finished 1/2 forecast(s)', output)
+        self.assertIsNotNone(predictor.get_stored_forecast('AAA', 'ARIMA'))
+        self.assertIsNone(predictor.get_stored_forecast('BBB', 'ARIMA'))
+
+    def test_fresh_forecasts_are_skipped_until_new_bars_arrive(self):
+        self.run_command()
+        self.calls.clear()
+        output = self.run_command()
+        self.assertEqual(self.calls, ['BBB'])
+        self.assertIn('1 skipped as fresh', output)
+
+        self.calls.clear()
+        self.run_command('--force')
+        self.assertEqual(sorted(self.calls), ['AAA', 'BBB'])
+
+        # A newer bar makes the stored forecast stale even though it is recent.
+        self.calls.clear()
+        StockPrice.objects.create(stock=Stock.objects.get(ticker='AAA'), date=self.today + timedelta(days=1),
+                                  open_price=Decimal('1'), high_price=Decimal('1'), low_price=Decimal('1'),
+                                  close_price=Decimal('1'), volume=1)
+        self.run_command()
+        self.assertEqual(sorted(self.calls), ['AAA', 'BBB'])
+
+
+class ArimaOrderSearchTests(SimpleTestCase):
+    """The order search ranks by the requested criterion and stops early."""
+
+    def setUp(self):
+        self.values = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, size=120))
+
+    def test_stops_after_patience_levels_without_improvement(self):
+        # Level 0 (one order) always improves on nothing; level 1 (two orders) cannot gain 1e9.
+        best = arima_search.select_order(self.values, patience=1, min_improvement=1e9)
+        self.assertEqual(best['candidates_evaluated'], 3)
+        full = arima_search.select_order(self.values, patience=100, min_improvement=0)
+        self.assertEqual(full['candidates_evaluated'], (arima_search.MAX_P + 1) * (arima_search.MAX_Q + 1))
+
+    def test_ranks_by_the_requested_criterion(self):
+        for criterion in arima_search.CRITERIA:
+            best = arima_search.select_order(self.values, criterion=criterion)
+            self.assertEqual((best['criterion'], best['score']), (criterion, best[criterion]))
+        with self.assertRaises(ValueError):
+            arima_search.select_order(self.values, criterion='hqic')
+
+    def test_no_budget_means_no_order(self):
+        self.assertIsNone(arima_search.select_order(self.values, timeout=0))
+
+
+class StoredArimaOrderTests(TestCase):
+    """get_arima_order reuses a fresh stored order and searches again when it is stale."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('apps.predictor.get_artifact_store', return_value=ArtifactStore(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.series = pd.Series(np.arange(40, dtype=float))
+
+    def search(self, order=(2, 1, 1), criterion='aic'):
+        best = None if order is None else {
+            'order': order, 'criterion': criterion, 'score': -10.0, 'params': [0.1, 0.2, 0.3, 1.0],
+            'candidates_evaluated': 7,
+        }
+        with mock.patch('apps.predictor.select_order', return_value=best) as select_order:
+            record = predictor.get_arima_order(self.stock, self.series)
+        return record, select_order.call_count
+
+    def test_first_search_is_stored_and_reused(self):
+        record, searches = self.search()
+        self.assertEqual((record.order, record.candidates_evaluated, searches), ((2, 1, 1), 7, 1))
+        record, searches = self.search(order=(1, 1, 0))
+        self.assertEqual((record.order, searches), ((2, 1, 1), 0))
+
+    def test_stale_or_differently_ranked_orders_are_searched_again(self):
+        self.search()
+        ArimaOrder.objects.update(searched_at=timezone.now() - timedelta(days=settings.ARIMA_ORDER_MAX_AGE_DAYS + 1))
+        record, searches = self.search(order=(1, 1, 0))
+        self.assertEqual((record.order, searches), ((1, 1, 0), 1))
+
+        with override_settings(ARIMA_ORDER_CRITERION='bic'):
+            record, searches = self.search(order=(0, 1, 1), criterion='bic')
+        self.assertEqual((record.order, record.criterion, searches), ((0, 1, 1), 'bic', 1))
+
+    def test_failed_search_keeps_the_stale_order(self):
+        record, _ = self.search(order=None)
+        self.assertIsNone(record)
+        self.search()
+        ArimaOrder.objects.update(searched_at=timezone.now() - timedelta(days=settings.ARIMA_ORDER_MAX_AGE_DAYS + 1))
+        record, searches = self.search(order=None)
+        self.assertEqual((record.order, searches), ((2, 1, 1), 1))
+
+
+class ArimaArtifactTests(TransactionTestCase):
+    """Concurrent ARIMA requests fit once under the artifact lock; unchanged data reuses the saved fit."""
+
+    def setUp(self):
+        from statsmodels.tsa.arima.model import ARIMA
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ArtifactStore(tmp.name)
+        self.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        self.closes = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, size=41))
+        self.add_days(range(40))
+        # A fresh stored order, so no order search runs.
+        ArimaOrder.objects.create(stock=self.stock, p=1, d=1, q=0, criterion=settings.ARIMA_ORDER_CRITERION,
+                                  score=0.0, searched_at=timezone.now())
+        self.fits = []
+        original_fit = ARIMA.fit
+
+        def fit(model, *args, **kwargs):
+            self.fits.append(threading.get_ident())
+            time.sleep(0.2)  # long enough for the other request to queue on the lock
+            return original_fit(model, *args, **kwargs)
+
+        for patcher in (mock.patch('apps.predictor.get_artifact_store', return_value=self.store),
+                        mock.patch.object(ARIMA, 'fit', fit)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add_days(self, days):
+        today = date.today()
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=self.stock, date=today - timedelta(days=40 - i), open_price=Decimal('1'),
+                       high_price=Decimal('1'), low_price=Decimal('1'),
+                       close_price=Decimal(str(round(self.closes[i], 2))), volume=1)
+            for i in days
+        ])
+
+    def test_concurrent_requests_fit_once_and_reuse_the_artifact(self):
+        barrier = threading.Barrier(2)
+        results = []
+
+        def request():
+            barrier.wait()
+            try:
+                results.append(predictor.predict_with_arima('AAA'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.fits), 1)
+        self.assertNotIn('error', results[0])
+        # The fitted parameters become the next warm start.
+        self.assertEqual(len(ArimaOrder.objects.get(stock=self.stock).params), 2)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(self.store.versions('arima_AAA'), [1])
+
+        self.assertEqual(predictor.predict_with_arima('AAA'), results[0])
+        self.assertEqual(len(self.fits), 1)
+
+        self.add_days([40])
+        result = predictor.predict_with_arima('AAA')
+        self.assertEqual(len(self.fits), 2)
+        self.assertEqual(self.store.versions('arima_AAA'), [1, 2])
+        self.assertEqual(result['forecast'][0]['date'], (date.today() + timedelta(days=1)).isoformat())
+
+
+def _small_lstm(prediction_days=predictor.PREDICTION_DAYS, n_features=1):
+    """The forecasting architecture with 4 units per layer, so tests train in seconds."""
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    from tensorflow.keras.models import Sequential
+
+    model = Sequential([
+        LSTM(units=4, return_sequences=True, input_shape=(prediction_days, n_features)),
+        Dropout(0.2),
+        LSTM(units=4, return_sequences=False),
+        Dropout(0.2),
+        Dense(units=1),
+    ])
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+@unittest.skipUnless(HAS_TENSORFLOW, "TensorFlow is required to train the LSTM.")
+@override_settings(LSTM_FINE_TUNE=True, LSTM_FEATURES=[], LSTM_GLOBAL_MODEL=False, LSTM_FINE_TUNE_DAYS=40,
+                   LSTM_FINE_TUNE_EPOCHS=2, LSTM_FINE_TUNE_REFIT_EPOCHS=1, LSTM_MAX_FINE_TUNES=30,
+                   LSTM_FINE_TUNE_MAX_DEGRADATION=1.5)
+class LSTMFineTuneTests(TestCase):
+    """New prices fine-tune the previous model version; each fallback leads to a full retrain."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The first, full training run happens once, in setUpTestData.
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.store = ArtifactStore(cls.tmp.name)
+        cls.patchers = [
+            mock.patch('apps.predictor.get_artifact_store', return_value=cls.store),
+            mock.patch('apps.predictor.build_lstm_model', side_effect=_small_lstm),
+        ]
+        for patcher in cls.patchers:
+            patcher.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for patcher in cls.patchers:
+            patcher.stop()
+        cls.tmp.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stock = Stock.objects.create(ticker='AAA', company_name='AAA', sector='Tech')
+        cls.closes = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, size=150))
+        cls.add_days(0, 140)
+        predictor.predict_with_lstm('AAA')
+        cls.previous = cls.store.current('lstm_AAA')
+
+    @classmethod
+    def add_days(cls, first, last):
+        today = date.today()
+        StockPrice.objects.bulk_create([
+            StockPrice(stock=cls.stock, date=today - timedelta(days=150 - i), open_price=Decimal('1'),
+                       high_price=Decimal('1'), low_price=Decimal('1'),
+                       close_price=Decimal(str(round(cls.closes[i], 2))), volume=1)
+            for i in range(first, last)
+        ])
+
+    def values(self):
+        return np.array(
+            StockPrice.objects.filter(stock=self.stock).order_by('date').values_list('close_price', flat=True),
+            dtype=float,
+        )[:, None]
+
+    def with_metadata(self, **changes):
+        from types import SimpleNamespace
+        return SimpleNamespace(name=self.previous.name, metadata={**self.previous.metadata, **changes},
+                               file=self.previous.file)
+
+    def test_new_prices_fine_tune_and_refit_on_every_recent_window(self):
+        import keras
+
+        self.assertEqual(self.previous.metadata['mode'], 'full')
+        self.add_days(140, 150)
+        original_fit = keras.Model.fit
+        calls = []
+
+        def fit(model, X, y, **kwargs):
+            calls.append((len(X), 'validation_data' in kwargs))
+            return original_fit(model, X, y, **kwargs)
+
+        with mock.patch.object(keras.Model, 'fit', fit):
+            self.assertNotIn('error', predictor.predict_with_lstm('AAA'))
+        meta = self.store.current('lstm_AAA').metadata
+        self.assertEqual(meta['mode'], 'fine_tune')
+        self.assertEqual(meta['fine_tunes_since_full'], 1)
+        # 40 days of windows: 32 trained on with 8 held out, then a refit over all 40.
+        self.assertEqual(calls, [(32, True), (40, False)])
+        self.assertEqual(meta['samples'], 40)
+
+    def test_changed_features_retrain_from_scratch(self):
+        self.assertIsNone(predictor._fine_tune_lstm('AAA', self.previous, self.values(), ['rsi_14']))
+
+    def test_too_many_fine_tunes_retrain_from_scratch(self):
+        previous = self.with_metadata(fine_tunes_since_full=30)
+        self.assertIsNone(predictor._fine_tune_lstm('AAA', previous, self.values(), []))
+
+    def test_prices_outside_the_scaler_range_retrain_from_scratch(self):
+        self.assertIsNone(predictor._fine_tune_lstm('AAA', self.previous, self.values() * 3, []))
+
+    def test_degraded_validation_loss_retrains_from_scratch(self):
+        previous = self.with_metadata(reference_val_loss=1e-12)
+        self.assertIsNone(predictor._fine_tune_lstm('AAA', previous, self.values(), []))
+        trained = predictor._fine_tune_lstm('AAA', self.previous, self.values(), [])
+        self.assertEqual(trained[3]['mode'], 'fine_tune')
@@ -1,9 +1,16 @@
 from django.urls import path
 from .views import (
     StockListCreateAPIView,
+    StockSearchAPIView,
+    AnalyticsAPIView,
     WatchlistListCreateAPIView,
     WatchlistDestroyAPIView,
+    WatchlistSnapshotAPIView,
+    AlertRuleListCreateAPIView,
+    AlertRuleDestroyAPIView,
+    AlertEventListAPIView,
     StockHistoryAPIView, # Import the new view
+    StockIndicatorsAPIView,
     ARIMAPredictionAPIView,
     LSTMPredictionAPIView, # Import the LSTM prediction view
     SentimentAnalysisAPIView, # Import the sentiment analysis view
@@ -15,13 +22,27 @@ urlpatterns = [
     # Endpoint for listing and creating stocks
     path('apps/', StockListCreateAPIView.as_view(), name='stock-list-create'),
 
+    # Endpoint for ticker/company autocomplete
+    path('apps/search/', StockSearchAPIView.as_view(), name='stock-search'),
+    # Endpoint for cross-ticker correlation, volatility, beta and portfolio risk
+    path('apps/analytics/', AnalyticsAPIView.as_view(), name='stock-analytics'),
+
     # Endpoint for getting a stock's historical data
     path('apps/<str:ticker>/history/', StockHistoryAPIView.as_view(), name='stock-history'),
 
+    # Endpoint for server-side technical indicators
+    path('apps/<str:ticker>/indicators/', StockIndicatorsAPIView.as_view(), name='stock-indicators'),
+
     # Endpoint for managing the user's watchlist
     path('watchlist/', WatchlistListCreateAPIView.as_view(), name='watchlist-list-create'),
+    path('watchlist/snapshot/', WatchlistSnapshotAPIView.as_view(), name='watchlist-snapshot'),
     path('watchlist/<int:pk>/', WatchlistDestroyAPIView.as_view(), name='watchlist-destroy'),
 
+    # Endpoints for price alert rules and the alerts they raised
+    path('alerts/', AlertRuleListCreateAPIView.as_view(), name='alert-list-create'),
+    path('alerts/events/', AlertEventListAPIView.as_view(), name='alert-events'),
+    path('alerts/<int:pk>/', AlertRuleDestroyAPIView.as_view(), name='alert-destroy'),
+
     path('apps/<str:ticker>/predict/arima/', ARIMAPredictionAPIView.as_view(), name='stock-predict-arima'),
     path('apps/<str:ticker>/predict/lstm/', LSTMPredictionAPIView.as_view(), name='stock-predict-lstm'),
      #  sentiment analysis URL
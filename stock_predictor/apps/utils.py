@@ -1,8 +1,13 @@
+import logging
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 from functools import lru_cache
 
+from .metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
 @lru_cache(maxsize=128)
 def fetch_stock_data(ticker_symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
     """
@@ -18,10 +23,12 @@ def fetch_stock_data(ticker_symbol: str, start_date: str, end_date: str) -> pd.D
         pd.DataFrame: DataFrame containing historical stock data.
     """
     try:
-        stock = yf.Ticker(ticker_symbol)
-        history = stock.history(start=start_date, end=end_date)
+        with stage_timer('ingestion', 'fetch'):
+            stock = yf.Ticker(ticker_symbol)
+            history = stock.history(start=start_date, end=end_date)
 
-        if history.empty:print(f"warning:Nodata found for {ticker_symbol} from {start_date}")
+        if history.empty:
+            logger.warning("No data found for %s from %s", ticker_symbol, start_date)
 
         history.reset_index(inplace=True)
         history.rename(columns={'Date': 'date', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}, inplace=True)
@@ -31,6 +38,6 @@ def fetch_stock_data(ticker_symbol: str, start_date: str, end_date: str) -> pd.D
         return history[required_columns]
 
     except Exception as e:
-        print(f"Error fetching data for {ticker_symbol}: {e}")
+        logger.exception("Error fetching data for %s", ticker_symbol)
         return pd.DataFrame()  # Return empty DataFrame on error
     
\ No newline at end of file
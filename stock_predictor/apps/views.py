@@ -1,34 +1,111 @@
 import os
 import json
+import logging
+import ipaddress
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from django.shortcuts import render
 from rest_framework import generics, permissions , status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import  Stock, StockPrice, Watchlist
-from .serializers import StockSerializer, StockPriceSerializer, WatchlistSerializer
+from rest_framework.pagination import PageNumberPagination
+from .models import  AlertEvent, AlertRule, Stock, StockPrice, Watchlist
+from .serializers import (
+    AlertEventSerializer, AlertRuleSerializer, StockSerializer, StockPriceRollupSerializer,
+    StockPriceSerializer, WatchlistSerializer,
+)
 from .utils import fetch_stock_data
-from datetime import datetime, timedelta   
+from .metrics import INGESTED_ROWS, render_prometheus, stage_timer
+from .signals import prices_ingested
+from .indicators import INDICATORS, get_indicator_series, get_latest_indicators
+from .dashboard import build_watchlist_snapshot, cache_sentiment, get_cached_sentiment
+from .rollups import INTERVALS
+from .downsample import MAX_POINTS_LIMIT, METHODS, get_downsampled_history
+from .search import MAX_LIMIT, get_index
+from .admission import admit
+from .analytics import MAX_TICKERS as MAX_ANALYTICS_TICKERS, get_analytics
+from datetime import date, datetime, timedelta   
 # Create your views here.
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 
 # Import both prediction functions
-from .predictor import predict_with_arima, predict_with_lstm
+from .predictor import get_stored_forecast, predict_with_arima, predict_with_lstm, store_forecast
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 def home(request):
     return HttpResponse("Welcome to Stock Predictor!")
+
+def _metrics_allowed(address: str) -> bool:
+    allowed = settings.METRICS_ALLOWED_IPS
+    if '*' in allowed:
+        return True
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(entry, strict=False) for entry in allowed)
+
+
+# /metrics -> Prometheus scrape endpoint for the in-process metrics registry
+def metrics(request):
+    """Served only to the addresses in settings.METRICS_ALLOWED_IPS."""
+    if not _metrics_allowed(request.META.get('REMOTE_ADDR', '')):
+        return HttpResponseForbidden("Metrics are not available from this address.")
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+class StockPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
 # /api/stocks/ -> List all stocks or create a new one.
 class StockListCreateAPIView(generics.ListCreateAPIView):
     """
     API view to retrieve a list of stocks or create a new stock.
-    - GET: Returns a list of all stocks.
+    - GET: Returns a page of stocks (?page=, ?page_size= up to 1000),
+      optionally filtered with ?sector=.
     - POST: Creates a new stock in the database.
     """
-    queryset = Stock.objects.all()
     serializer_class = StockSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StockPagination
+
+    def get_queryset(self):
+        stocks = Stock.objects.all()
+        sector = self.request.query_params.get('sector')
+        if sector:
+            stocks = stocks.filter(sector__iexact=sector)
+        return stocks
+
+
+# /api/apps/search/ -> Ticker/company autocomplete
+class StockSearchAPIView(APIView):
+    """
+    API view for ticker pickers: prefix matching on ticker and company-name
+    words, with fuzzy (trigram) matches filling the remaining slots.
+    Served from an in-memory index rebuilt when stocks change.
+    - ?q=app (required unless sector is given), ?sector=Technology,
+      ?limit=10 (max 50), ?fuzzy=false to disable fuzzy matching.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        sector = request.query_params.get('sector') or None
+        if not query.strip() and not sector:
+            return Response({"error": "Provide a search query (?q=) or a sector."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        fuzzy = request.query_params.get('fuzzy', 'true').lower() not in ('0', 'false', 'no')
+
+        results = get_index().search(query, sector=sector, limit=limit, fuzzy=fuzzy)
+        return Response({"query": query, "results": results})
 
 
 # /api/stocks/<ticker>/history/ -> Get historical data for a stock
@@ -38,11 +115,61 @@ class StockHistoryAPIView(APIView):
     API view to retrieve historical price data for a given stock ticker.
     It first checks the local database. If no data is found, it falls
     back to fetching from the yfinance API and stores the data.
+    - ?interval=day|week|month selects the bar size (default: day); weekly
+      and monthly bars are read from the pre-aggregated rollups, which
+      ingestion and `build_rollups` maintain (reads never write them).
+    - ?start=YYYY-MM-DD&end=YYYY-MM-DD restricts the date range.
+    - ?max_points=N downsamples to at most N rows for charting, either by
+      merging rows into OHLC bars (method=ohlc, default; keeps every high
+      and low) or by picking rows with LTTB on the close (method=lttb).
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    def parse_options(self, params):
+        """Validates the query parameters; returns (options, error message)."""
+        options = {
+            'interval': params.get('interval', 'day').lower(),
+            'method': params.get('method', 'ohlc').lower(),
+            'max_points': None,
+        }
+        if options['interval'] != 'day' and options['interval'] not in INTERVALS:
+            return None, f"Unknown interval '{options['interval']}'. Use one of: day, {', '.join(INTERVALS)}."
+        if options['method'] not in METHODS:
+            return None, f"Unknown method '{options['method']}'. Use one of: {', '.join(METHODS)}."
+        try:
+            options['start'] = date.fromisoformat(params['start']) if params.get('start') else None
+            options['end'] = date.fromisoformat(params['end']) if params.get('end') else None
+        except ValueError:
+            return None, "start and end must be dates in YYYY-MM-DD format."
+        if params.get('max_points'):
+            try:
+                options['max_points'] = int(params['max_points'])
+            except ValueError:
+                return None, "max_points must be an integer."
+            if not 2 <= options['max_points'] <= MAX_POINTS_LIMIT:
+                return None, f"max_points must be between 2 and {MAX_POINTS_LIMIT}."
+        return options, None
+
+    def serialize(self, stock, options):
+        interval, start, end = options['interval'], options['start'], options['end']
+        if options['max_points']:
+            return get_downsampled_history(stock, interval, start, end, options['max_points'], options['method']) or []
+
+        if interval == 'day':
+            rows, serializer_class, date_field = StockPrice.objects.filter(stock=stock), StockPriceSerializer, 'date'
+        else:
+            rows, serializer_class, date_field = stock.rollups.filter(interval=interval), StockPriceRollupSerializer, 'period_start'
+        if start:
+            rows = rows.filter(**{f'{date_field}__gte': start})
+        if end:
+            rows = rows.filter(**{f'{date_field}__lte': end})
+        return serializer_class(rows, many=True).data
+
     def get(self, request, ticker):
         ticker = ticker.upper()
+        options, error = self.parse_options(request.query_params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             stock = Stock.objects.get(ticker=ticker)
@@ -50,8 +177,7 @@ class StockHistoryAPIView(APIView):
 
             # If we have data in the DB, serve it.
             if prices.exists():
-                serializer = StockPriceSerializer(prices, many=True)
-                return Response(serializer.data)
+                return Response(self.serialize(stock, options))
             
             # If stock exists but no prices, fall through to fetch
             
@@ -60,7 +186,7 @@ class StockHistoryAPIView(APIView):
             pass
 
         # Fallback: Fetch from yfinance
-        print(f"No data for {ticker} in DB, fetching from yfinance...")
+        logger.info("No data for %s in DB, fetching from yfinance...", ticker)
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365) # Fetch last year by default
         
@@ -76,23 +202,136 @@ class StockHistoryAPIView(APIView):
         stock, _ = Stock.objects.get_or_create(ticker=ticker, defaults={'company_name': ticker})
 
         # Bulk create the new price data
-        price_objects = [
-            StockPrice(
-                stock=stock,
-                date=row['date'].date(),
-                open_price=row['open'],
-                high_price=row['high'],
-                low_price=row['low'],
-                close_price=row['close'],
-                volume=row['volume']
-            ) for index, row in history_df.iterrows()
-        ]
-        StockPrice.objects.bulk_create(price_objects, ignore_conflicts=True)
+        with stage_timer('ingestion', 'store'):
+            price_objects = [
+                StockPrice(
+                    stock=stock,
+                    date=row['date'].date(),
+                    open_price=row['open'],
+                    high_price=row['high'],
+                    low_price=row['low'],
+                    close_price=row['close'],
+                    volume=row['volume']
+                ) for index, row in history_df.iterrows()
+            ]
+            StockPrice.objects.bulk_create(price_objects, ignore_conflicts=True)
+        INGESTED_ROWS.inc(len(price_objects), source='history_api')
+        prices_ingested.send(
+            sender=self.__class__, stock=stock, dates=[price.date for price in price_objects], source='history_api'
+        )
 
         # Retrieve the newly created data to serialize and return
-        new_prices = StockPrice.objects.filter(stock=stock)
-        serializer = StockPriceSerializer(new_prices, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(self.serialize(stock, options), status=status.HTTP_200_OK)
+
+# /api/stocks/<ticker>/indicators/ -> Technical indicators computed server-side
+class StockIndicatorsAPIView(APIView):
+    """
+    API view to retrieve technical indicators (SMA/EMA/RSI/MACD/Bollinger/ATR/...)
+    computed from the stored OHLCV history.
+    - ?names=rsi_14,macd restricts the indicators returned (default: all).
+    - ?limit=N returns the N most recent rows (default: 250).
+    - ?latest=true returns only the latest values from the incremental state.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, ticker):
+        ticker = ticker.upper()
+        names = [name for name in request.query_params.get('names', '').split(',') if name] or list(INDICATORS)
+        unknown = sorted(set(names) - set(INDICATORS))
+        if unknown:
+            return Response(
+                {"error": f"Unknown indicator(s): {', '.join(unknown)}", "available": list(INDICATORS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.query_params.get('latest', '').lower() in ('1', 'true', 'yes'):
+            latest = get_latest_indicators(ticker)
+            if not latest:
+                return Response({"error": f"No price data for {ticker}."}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"ticker": ticker, "date": latest['date'], **{name: latest[name] for name in names}})
+
+        try:
+            limit = int(request.query_params.get('limit', 250))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        dates, series = get_indicator_series(ticker)
+        if dates is None:
+            return Response({"error": f"No price data for {ticker}."}, status=status.HTTP_404_NOT_FOUND)
+
+        start = max(len(dates) - limit, 0) if limit > 0 else 0
+        columns = {name: series[name][start:].tolist() for name in names}
+        rows = [
+            {"date": day.isoformat(), **{name: (None if value != value else value) for name, value in zip(names, values)}}
+            for day, *values in zip(dates[start:], *columns.values())
+        ]
+        return Response({"ticker": ticker, "indicators": rows})
+
+
+# /api/apps/analytics/ -> Correlation, volatility, beta and portfolio risk
+class AnalyticsAPIView(APIView):
+    """
+    API view for cross-ticker analytics over one date-aligned price matrix:
+    correlation and (annualized) covariance of daily returns, volatility,
+    rolling volatility and beta, and the risk of a weighted portfolio.
+    Results are cached until the stored prices of one of the tickers change.
+    - ?tickers=AAPL,MSFT (default: the user's watchlist, at most 500).
+    - ?start=YYYY-MM-DD&end=YYYY-MM-DD restricts the date range.
+    - ?window=21 (rolling volatility) and ?beta_window=63, in trading days.
+    - ?benchmark=SPY measures beta against that ticker (default: the
+      equal-weighted average of the tickers).
+    - ?weights=0.6,0.4 portfolio weights in ticker order (default: equal).
+    - ?series=true adds the rolling volatility and beta series.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def parse_options(self, request):
+        """Validates the query parameters; returns (tickers, options, error message)."""
+        params = request.query_params
+        tickers = [t.strip().upper() for t in params.get('tickers', '').split(',') if t.strip()]
+        if not tickers:
+            tickers = list(Watchlist.objects.filter(user=request.user).values_list('stock__ticker', flat=True))
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return None, None, "No tickers given and the watchlist is empty."
+        if len(tickers) > MAX_ANALYTICS_TICKERS:
+            return None, None, f"At most {MAX_ANALYTICS_TICKERS} tickers per request."
+        options = {
+            'benchmark': params.get('benchmark', '').strip().upper() or None,
+            'series': params.get('series', 'false').lower() in ('1', 'true', 'yes'),
+        }
+        try:
+            start = date.fromisoformat(params['start']) if params.get('start') else None
+            end = date.fromisoformat(params['end']) if params.get('end') else None
+        except ValueError:
+            return None, None, "start and end must be dates in YYYY-MM-DD format."
+        try:
+            options['window'] = int(params.get('window', 21))
+            options['beta_window'] = int(params.get('beta_window', 63))
+        except ValueError:
+            return None, None, "window and beta_window must be integers."
+        if not (2 <= options['window'] <= 756 and 2 <= options['beta_window'] <= 756):
+            return None, None, "window and beta_window must be between 2 and 756 trading days."
+        if params.get('weights'):
+            try:
+                weights = [float(w) for w in params['weights'].split(',')]
+            except ValueError:
+                return None, None, "weights must be comma separated numbers."
+            if len(weights) != len(tickers) or sum(weights) <= 0:
+                return None, None, "Give one weight per ticker, with a positive sum."
+            options['weights'] = weights
+        options.update(start=start, end=end)
+        return tickers, options, None
+
+    def get(self, request):
+        tickers, options, error = self.parse_options(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        result = get_analytics(tickers, **options)
+        if result is None:
+            return Response({"error": "No price data for the requested tickers."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+
 
 # /api/watchlist/ -> Manage the user's personal watchlist.
 class WatchlistListCreateAPIView(generics.ListCreateAPIView):
@@ -110,7 +349,7 @@ class WatchlistListCreateAPIView(generics.ListCreateAPIView):
         for the currently authenticated user.
         """
         user = self.request.user
-        return Watchlist.objects.filter(user=user)
+        return Watchlist.objects.filter(user=user).select_related('stock')
 
     def get_serializer_context(self):
         """
@@ -119,6 +358,19 @@ class WatchlistListCreateAPIView(generics.ListCreateAPIView):
         return {'request': self.request}
 
 
+# /api/watchlist/snapshot/ -> Dashboard data for every watched stock in one call
+class WatchlistSnapshotAPIView(APIView):
+    """
+    API view returning, per stock in the user's watchlist, the latest OHLCV
+    bar, day change, latest stored forecasts and cached sentiment.
+    Runs a fixed number of queries regardless of the watchlist size.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(build_watchlist_snapshot(request.user), status=status.HTTP_200_OK)
+
+
 # /api/watchlist/<int:pk>/ -> Delete a stock from the watchlist.
 class WatchlistDestroyAPIView(generics.DestroyAPIView):
     """
@@ -136,39 +388,110 @@ class WatchlistDestroyAPIView(generics.DestroyAPIView):
         return Watchlist.objects.filter(user=user)
 
 
+# /api/alerts/ -> List or create the user's alert rules.
+class AlertRuleListCreateAPIView(generics.ListCreateAPIView):
+    """
+    API view for the user's price alert rules. Rules are evaluated as new
+    prices are ingested, never by polling.
+    - GET: Returns the current user's rules.
+    - POST: Adds a rule for a stock in the user's watchlist: `ticker`,
+      `kind` (price_above, price_below, percent_move, forecast_divergence),
+      `threshold` (a price, or a percentage for the last two) and, for
+      forecast_divergence, `model_type` (ARIMA or LSTM).
+    """
+    serializer_class = AlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return AlertRule.objects.filter(user=self.request.user).select_related('stock').order_by('-created_at')
+
+
+# /api/alerts/<int:pk>/ -> Delete an alert rule.
+class AlertRuleDestroyAPIView(generics.DestroyAPIView):
+    """
+    API view to remove one of the user's alert rules (and its events).
+    - DELETE: Removes the specified rule.
+    """
+    serializer_class = AlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return AlertRule.objects.filter(user=self.request.user)
+
+
+# /api/alerts/events/ -> Alerts that fired for the user, newest first.
+class AlertEventListAPIView(generics.ListAPIView):
+    """
+    API view for the alerts that fired on the user's rules.
+    - GET: Returns the events, newest first, paginated.
+      - ?ticker: only events for this stock
+    """
+    serializer_class = AlertEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StockPagination
+
+    def get_queryset(self):
+        events = AlertEvent.objects.filter(rule__user=self.request.user).select_related('rule__stock')
+        ticker = self.request.query_params.get('ticker')
+        if ticker:
+            events = events.filter(rule__stock__ticker=ticker.upper())
+        return events
+
+
 
 # /api/stocks/<ticker>/predict/arima/ -> Get ARIMA model prediction
 class ARIMAPredictionAPIView(APIView):
     """
     API view to get a 7-day stock price forecast using an ARIMA model.
+    Serves the forecast pre-computed by `precompute_forecasts` when it is
+    fresh, otherwise trains on demand and stores the result. Training is
+    subject to admission control (429 with Retry-After when over quota or busy).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, ticker):
-        forecast_result = predict_with_arima(ticker)
+        stored = get_stored_forecast(ticker, "ARIMA")
+        if stored is not None:
+            return Response(stored, status=status.HTTP_200_OK)
+
+        with admit(request, 'forecast', 'ARIMA') as admission:
+            forecast_result = predict_with_arima(ticker)
+            if "error" in forecast_result:
+                admission.refund()
         if "error" in forecast_result:
             return Response(forecast_result, status=status.HTTP_400_BAD_REQUEST)
+        store_forecast(forecast_result)
         return Response(forecast_result, status=status.HTTP_200_OK)
 
 # /api/stocks/<ticker>/predict/lstm/ -> Get LSTM model prediction
 class LSTMPredictionAPIView(APIView):
     """
     API view to get a 7-day stock price forecast using an LSTM deep learning model.
+    Serves the forecast pre-computed by `precompute_forecasts` when it is
+    fresh, otherwise trains on demand and stores the result. Training is
+    subject to admission control (429 with Retry-After when over quota or busy).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, ticker):
         ticker = ticker.upper()
+
+        stored = get_stored_forecast(ticker, "LSTM")
+        if stored is not None:
+            return Response(stored, status=status.HTTP_200_OK)
         
         # DISCLAIMER: LSTM model training is resource-intensive.
-        # In a real-world application, this would be handled by an asynchronous
-        # background worker (like Celery) and the models would be pre-trained.
-        # Executing this synchronously will result in a long wait time for the user.
+        # Watchlisted tickers are pre-computed nightly by the `precompute_forecasts`
+        # command; anything else is trained synchronously here, which is slow.
         
-        forecast_result = predict_with_lstm(ticker)
+        with admit(request, 'forecast', 'LSTM') as admission:
+            forecast_result = predict_with_lstm(ticker)
+            if "error" in forecast_result:
+                admission.refund()
 
         if "error" in forecast_result:
             return Response(forecast_result, status=status.HTTP_400_BAD_REQUEST)
+        store_forecast(forecast_result)
         
         return Response(forecast_result, status=status.HTTP_200_OK)
 
@@ -176,7 +499,10 @@ class LSTMPredictionAPIView(APIView):
 class SentimentAnalysisAPIView(APIView):
     """
     An API view to get AI-powered sentiment analysis for a stock ticker using LangChain + Google Gemini (langchain-google-genai).
+    LLM calls are subject to admission control; cached analyses are served without one.
     """
+    permission_classes = [permissions.IsAuthenticated]
+
     def get(self, request, ticker, format=None):
         # Get API key
         api_key = os.environ.get('GOOGLE_API_KEY') or os.environ.get('GEMINI_API_KEY')
@@ -194,13 +520,27 @@ class SentimentAnalysisAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Serve a recent analysis from the cache instead of calling the LLM again
+        cached = get_cached_sentiment(ticker)
+        if cached is not None:
+            return Response(cached, status=status.HTTP_200_OK)
+
+        with admit(request, 'sentiment', 'sentiment') as admission:
+            response = self.analyze(ticker, api_key)
+            if response.status_code >= 400:
+                admission.refund()
+            return response
+
+    def analyze(self, ticker, api_key):
+        """Asks the LLM for an analysis of `ticker` and validates the JSON it returns."""
         try:
             # Initialize model
-            llm = ChatGoogleGenerativeAI(
-                model="models/gemini-1.5-flash-latest",  # or whichever model you prefer
-                temperature=0.0,
-                google_api_key=api_key
-            )
+            with stage_timer('sentiment', 'llm_init'):
+                llm = ChatGoogleGenerativeAI(
+                    model="models/gemini-1.5-flash-latest",  # or whichever model you prefer
+                    temperature=0.0,
+                    google_api_key=api_key
+                )
 
             # Build prompts
             system_message = SystemMessage(
@@ -217,12 +557,14 @@ class SentimentAnalysisAPIView(APIView):
             )
 
             # Invoke the model
-            response = llm.invoke([system_message, human_message])
+            with stage_timer('sentiment', 'llm_invoke'):
+                response = llm.invoke([system_message, human_message])
 
             # The content should be JSON string
             content = response.content.strip()
             try:
-                analysis_data = json.loads(content)
+                with stage_timer('sentiment', 'parse'):
+                    analysis_data = json.loads(content)
             except json.JSONDecodeError as e:
                 # If parsing fails
                 return Response(
@@ -246,9 +588,11 @@ class SentimentAnalysisAPIView(APIView):
                     status=status.HTTP_502_BAD_GATEWAY
                 )
 
+            cache_sentiment(ticker, analysis_data)
             return Response(analysis_data, status=status.HTTP_200_OK)
 
         except Exception as e:
+            logger.exception("Sentiment analysis failed for %s", ticker)
             return Response(
                 {"error": f"An error occurred during sentiment analysis: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stock_predictor.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# /api/stream/ (server-sent events) is served next to Django, see apps/stream.py.
+from apps.stream import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
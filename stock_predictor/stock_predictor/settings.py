@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    # Must run before anything that touches the database (sessions, auth).
+    "apps.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +57,10 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+
+    # Per-request latency / DB query metrics and the opt-in slow-request profiler
+    "apps.middleware.RequestMetricsMiddleware",
+    "apps.middleware.SlowRequestProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "stock_predictor.urls"
@@ -81,12 +87,63 @@ WSGI_APPLICATION = "stock_predictor.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+#
+# SQLite by default. Set POSTGRES_DB (with POSTGRES_USER, POSTGRES_PASSWORD,
+# POSTGRES_HOST, POSTGRES_PORT) to use PostgreSQL as the primary, and
+# POSTGRES_REPLICA_HOSTS="replica1:5432,replica2" to add read replicas with
+# the same credentials. With SQLite, SQLITE_REPLICA_PATHS="a.sqlite3,b.sqlite3"
+# adds replica files, which is handy for trying the router locally (keeping
+# the files in sync is up to you). apps.db_router.PrimaryReplicaRouter sends
+# reads to the replicas and writes to the primary; see ReplicaPinningMiddleware.
+#
+# Connections are kept open for DB_CONN_MAX_AGE seconds (default 60 on
+# PostgreSQL, 0 on SQLite) and health-checked before reuse. Behind pgbouncer
+# in transaction mode set DB_PGBOUNCER=1, which disables server-side cursors.
+
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE')
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
+if os.environ.get('POSTGRES_DB'):
+    def _postgres(host_port):
+        host, _, port = host_port.partition(':')
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ['POSTGRES_DB'],
+            "USER": os.environ.get('POSTGRES_USER', ''),
+            "PASSWORD": os.environ.get('POSTGRES_PASSWORD', ''),
+            "HOST": host,
+            "PORT": port or os.environ.get('POSTGRES_PORT', '5432'),
+            "CONN_MAX_AGE": int(DB_CONN_MAX_AGE or 60),
+            "CONN_HEALTH_CHECKS": True,
+            "DISABLE_SERVER_SIDE_CURSORS": DB_PGBOUNCER,
+        }
+
+    DATABASES = {"default": _postgres(os.environ.get('POSTGRES_HOST', 'localhost'))}
+    _replicas = [_postgres(host) for host in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',') if host]
+else:
+    def _sqlite(path):
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": path,
+            "CONN_MAX_AGE": int(DB_CONN_MAX_AGE or 0),
+            "CONN_HEALTH_CHECKS": True,
+        }
+
+    DATABASES = {"default": _sqlite(BASE_DIR / "db.sqlite3")}
+    _replicas = [_sqlite(path) for path in os.environ.get('SQLITE_REPLICA_PATHS', '').split(',') if path]
+
+for _number, _replica in enumerate(_replicas, start=1):
+    # Tests read the replicas through the primary's test database.
+    _replica["TEST"] = {"MIRROR": "default"}
+    DATABASES[f"replica{_number}"] = _replica
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["apps.db_router.PrimaryReplicaRouter"]
+# After a write (by this client, or an ingestion of the ticker) reads stay on
+# the primary this long, to cover replication lag. Ticker pins are ReplicaPin
+# rows on the primary, so they need no shared cache.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+# Replicas are probed at most this often per thread; a failing one is skipped this long.
+REPLICA_HEALTH_CHECK_SECONDS = 10
 
 
 # Password validation
@@ -143,4 +200,131 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
-CORS_ALLOW_ALL_ORIGINS = True  
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Forecasts stored in Prediction (see the precompute_forecasts command) are served
+# by the predict endpoints until they are older than this.
+FORECAST_MAX_AGE_HOURS = float(os.environ.get('FORECAST_MAX_AGE_HOURS', 24))
+
+# Serve LSTM forecasts from one shared cross-ticker model (trained with
+# `python manage.py train_global_lstm`) instead of a model per ticker.
+LSTM_GLOBAL_MODEL = os.environ.get('LSTM_GLOBAL_MODEL', '').lower() in ('1', 'true', 'yes')
+
+# ARIMA order search: candidate (p,d,q) orders are fitted in parallel in a
+# process pool and ranked by ARIMA_ORDER_CRITERION. The chosen order is stored
+# per ticker and only searched again once it is older than ARIMA_ORDER_MAX_AGE_DAYS.
+ARIMA_ORDER_CRITERION = os.environ.get('ARIMA_ORDER_CRITERION', 'aic').lower()
+ARIMA_ORDER_MAX_AGE_DAYS = float(os.environ.get('ARIMA_ORDER_MAX_AGE_DAYS', 7))
+ARIMA_SEARCH_WORKERS = int(os.environ.get('ARIMA_SEARCH_WORKERS', os.cpu_count() or 1))
+
+# Successful sentiment analyses are cached per ticker for this long, so repeat
+# requests and the watchlist snapshot do not call the LLM again.
+SENTIMENT_CACHE_SECONDS = int(os.environ.get('SENTIMENT_CACHE_SECONDS', 6 * 60 * 60))
+
+# Push channel (/api/stream/). "memory" fans out within one process; "redis"
+# relays events through Redis so every ASGI worker receives them. Prices
+# ingested by fetch_history (a separate process) only reach streams via Redis.
+STREAM_BACKEND = os.environ.get('STREAM_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'memory').lower()
+STREAM_REDIS_URL = os.environ.get('STREAM_REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+# Events buffered per connection before the oldest are dropped, and how many
+# drops a connection may accumulate before it is closed as a slow consumer.
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', 100))
+STREAM_MAX_DROPPED_EVENTS = int(os.environ.get('STREAM_MAX_DROPPED_EVENTS', 1000))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15))
+
+# Admission control for the expensive endpoints (apps/admission.py).
+# Every client has a token bucket per scope holding `capacity` tokens and
+# refilled at `refill_per_minute`; a computation spends ADMISSION_COSTS[kind]
+# tokens (an LSTM training run is far dearer than an ARIMA fit) and gets them
+# back if it ends in an error response. Capacities, refill rates and costs must
+# be positive, and costs must not exceed the capacity of their scope
+# (ImproperlyConfigured otherwise). Stored forecasts and cached sentiment are
+# free. ADMISSION_MAX_CONCURRENT caps simultaneous computations of each kind
+# across all workers; excess requests get a 429 with Retry-After right away.
+ADMISSION_BACKEND = os.environ.get('ADMISSION_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'memory').lower()
+ADMISSION_REDIS_URL = os.environ.get('ADMISSION_REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+ADMISSION_QUOTAS = {
+    'forecast': {'capacity': 60, 'refill_per_minute': 1},
+    'sentiment': {'capacity': 10, 'refill_per_minute': 0.2},
+}
+ADMISSION_COSTS = {'ARIMA': 2, 'LSTM': 20, 'sentiment': 1}
+ADMISSION_MAX_CONCURRENT = {
+    'ARIMA': int(os.environ.get('ADMISSION_MAX_CONCURRENT_ARIMA', 4)),
+    'LSTM': int(os.environ.get('ADMISSION_MAX_CONCURRENT_LSTM', 2)),
+    'sentiment': int(os.environ.get('ADMISSION_MAX_CONCURRENT_SENTIMENT', 8)),
+}
+# Retry-After sent when every slot is busy, and how long a slot survives a crashed worker.
+ADMISSION_BUSY_RETRY_SECONDS = 10
+ADMISSION_LEASE_SECONDS = 15 * 60
+
+# Trained models are saved as numbered versions under apps/ml_models/<name>/;
+# only the newest ARTIFACT_KEEP_VERSIONS of each model are kept on disk.
+ARTIFACT_KEEP_VERSIONS = int(os.environ.get('ARTIFACT_KEEP_VERSIONS', 3))
+
+# Warm-start LSTM training: when new prices arrive, the ticker's previous model
+# is fine-tuned on the windows of the last LSTM_FINE_TUNE_DAYS days (newest
+# LSTM_FINE_TUNE_VALIDATION share held out, early stopping after
+# LSTM_FINE_TUNE_PATIENCE epochs without improvement) instead of being trained
+# from scratch. The kept weights are then refit for LSTM_FINE_TUNE_REFIT_EPOCHS
+# over all recent windows, held-out ones included, so the newest days are
+# learned too. It falls back to a full retrain when validation loss exceeds
+# LSTM_FINE_TUNE_MAX_DEGRADATION times the loss measured after the last full
+# retrain, after LSTM_MAX_FINE_TUNES fine-tunes in a row, or when prices move
+# more than LSTM_FINE_TUNE_RANGE_MARGIN outside the scaler's [0, 1] range.
+LSTM_FINE_TUNE = os.environ.get('LSTM_FINE_TUNE', '1').lower() in ('1', 'true', 'yes')
+LSTM_FINE_TUNE_DAYS = int(os.environ.get('LSTM_FINE_TUNE_DAYS', 90))
+LSTM_FINE_TUNE_EPOCHS = int(os.environ.get('LSTM_FINE_TUNE_EPOCHS', 10))
+LSTM_FINE_TUNE_PATIENCE = 2
+LSTM_FINE_TUNE_REFIT_EPOCHS = int(os.environ.get('LSTM_FINE_TUNE_REFIT_EPOCHS', 1))
+LSTM_FINE_TUNE_VALIDATION = 0.2
+LSTM_FINE_TUNE_MAX_DEGRADATION = float(os.environ.get('LSTM_FINE_TUNE_MAX_DEGRADATION', 1.5))
+LSTM_MAX_FINE_TUNES = int(os.environ.get('LSTM_MAX_FINE_TUNES', 30))
+LSTM_FINE_TUNE_RANGE_MARGIN = 0.2
+
+# Extra LSTM input features, e.g. "rsi_14,macd,bb_width" (see apps/indicators.py).
+# Empty means the model sees the close price only.
+LSTM_FEATURES = [name for name in os.environ.get('LSTM_FEATURES', '').split(',') if name]
+
+# Cache: Redis when REDIS_URL is set, otherwise per-process memory.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        }
+    }
+
+# Instrumentation
+# Requests slower than this many seconds get their cProfile stats dumped to
+# SLOW_REQUEST_PROFILE_DIR. Unset (the default) disables profiling entirely.
+SLOW_REQUEST_PROFILE_SECONDS = (
+    float(os.environ['SLOW_REQUEST_PROFILE_SECONDS']) if os.environ.get('SLOW_REQUEST_PROFILE_SECONDS') else None
+)
+SLOW_REQUEST_PROFILE_DIR = BASE_DIR / "profiles"
+# Client addresses (IPs or CIDR networks, comma separated) allowed to scrape
+# /metrics; everyone else gets a 403. "*" allows any address. The check uses
+# REMOTE_ADDR, so behind a proxy list the proxy's address.
+METRICS_ALLOWED_IPS = [
+    entry.strip() for entry in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if entry.strip()
+]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "apps": {
+            "handlers": ["console"],
+            "level": os.environ.get("APPS_LOG_LEVEL", "INFO"),
+        },
+    },
+}  
\ No newline at end of file
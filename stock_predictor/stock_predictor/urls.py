@@ -16,12 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from apps.views import home
+from apps.views import home, metrics
 
 urlpatterns = [
     path("", home, name="home"),  # Home page at the
       # root URL
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/', include('apps.urls')),
     
 ]
\ No newline at end of file